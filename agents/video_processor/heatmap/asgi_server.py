@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+ASGI mode of the heatmap and flow dashboards.
+
+Serves the same routes as heatmap_server.py and enhanced_flow_server.py on
+asyncio, so an idle websocket viewer costs a coroutine instead of an OS
+thread. Run with `python heatmap_server.py --asgi` and
+`python enhanced_flow_server.py --asgi`, or directly with
+`uvicorn asgi_server:heatmap_app --port 5002` and
+`uvicorn asgi_server:flow_app --port 5001`.
+"""
+import os
+import json
+import asyncio
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, JSONResponse
+
+from playback import AnalysisLibrary, AsyncPlaybackHub, DeltaSender, SinglePass, SUBSCRIBER_BACKLOG, parse_control_message
+from frame_codec import ENCODINGS
+from point_lod import parse_lod
+from enhanced_flow_server import ENHANCED_FLOW_TEMPLATE, load_flow_data
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+library = AnalysisLibrary()
+hub = AsyncPlaybackHub(library)
+
+heatmap_app = FastAPI(title="Multi-CCTV Heatmap Dashboard")
+flow_app = FastAPI(title="Enhanced Flow Prediction Dashboard")
+
+
+async def wait_for_disconnect(websocket):
+    """Drain client messages until the socket closes"""
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+
+async def send_payload(websocket, payload):
+    if isinstance(payload, bytes):
+        await websocket.send_bytes(payload)
+    else:
+        await websocket.send_text(payload)
+
+
+async def negotiate_sender(websocket, tagged):
+    """
+    Frame sender for the ?encoding=json|binary, ?delta=1 and ?lod=32|8 options
+    of a socket, None after replying with an error
+    """
+    encoding = websocket.query_params.get('encoding', 'json')
+    error = None
+    if encoding not in ENCODINGS:
+        error = f"encoding must be one of {', '.join(ENCODINGS)}"
+    try:
+        lod = parse_lod(websocket.query_params.get('lod'))
+    except ValueError as e:
+        error = error or str(e)
+    if error:
+        await websocket.send_json({'error': error})
+        await websocket.close()
+        return None
+    return DeltaSender(websocket.query_params.get('delta', '').lower() in ('1', 'true'), encoding, tagged, lod)
+
+
+async def stream_frames(websocket, subscription, sender):
+    """Send one pass over the recording from the shared playback position"""
+    single_pass = SinglePass()
+    while True:
+        cctv_id, timeline, index = await subscription.get()
+        if not single_pass.includes(index):
+            return
+        await send_payload(websocket, sender.payload(cctv_id, timeline, index))
+        if single_pass.completed_by(timeline, index):
+            return
+
+
+@heatmap_app.get('/', response_class=HTMLResponse)
+async def index():
+    with open(os.path.join(TEMPLATE_DIR, 'index.html'), 'r') as f:
+        return f.read()
+
+
+@heatmap_app.get('/api/cctv-feeds')
+async def get_cctv_feeds():
+    """Returns a list of available CCTV feeds that have analysis data."""
+    cctv_ids = await asyncio.to_thread(library.camera_ids)
+    return [cctv_id for cctv_id in cctv_ids if await asyncio.to_thread(library.get, cctv_id)]
+
+
+@heatmap_app.websocket('/ws/{cctv_id}')
+async def heatmap_socket(websocket: WebSocket, cctv_id: str):
+    await websocket.accept()
+    sender = await negotiate_sender(websocket, tagged=False)
+    if sender is None:
+        return
+    if await asyncio.to_thread(library.get, cctv_id) is None:
+        await websocket.send_json({'error': f'Data for {cctv_id} not found.'})
+        await websocket.close()
+        return
+
+    subscription = hub.subscribe(cctv_id)
+    tasks = [asyncio.create_task(stream_frames(websocket, subscription, sender)),
+             asyncio.create_task(wait_for_disconnect(websocket))]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not task.cancelled() and task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                print(f"WebSocket for {cctv_id} ended: {task.exception()}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        hub.unsubscribe(cctv_id, subscription)
+        try:
+            await websocket.close()
+        except RuntimeError:
+            # Already closed by the client
+            pass
+
+
+async def apply_control_messages(websocket, subscription, subscribed, sender):
+    """Apply subscribe/unsubscribe messages until the socket closes"""
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                action, cctv_ids = parse_control_message(message)
+            except ValueError as e:
+                await websocket.send_text(json.dumps({'error': str(e)}))
+                continue
+
+            for cctv_id in cctv_ids:
+                if action == 'subscribe' and cctv_id not in subscribed:
+                    if await asyncio.to_thread(library.get, cctv_id) is None:
+                        await websocket.send_text(json.dumps({'cctv_id': cctv_id, 'error': f'Data for {cctv_id} not found.'}))
+                        continue
+                    subscribed.add(cctv_id)
+                    hub.subscribe(cctv_id, subscription)
+                elif action == 'unsubscribe' and cctv_id in subscribed:
+                    subscribed.discard(cctv_id)
+                    sender.forget(cctv_id)
+                    hub.unsubscribe(cctv_id, subscription)
+    except WebSocketDisconnect:
+        pass
+
+
+async def stream_tagged_frames(websocket, subscription, subscribed, sender):
+    while True:
+        cctv_id, timeline, index = await subscription.get()
+        # Frames queued before an unsubscribe are dropped
+        if cctv_id in subscribed:
+            await send_payload(websocket, sender.payload(cctv_id, timeline, index))
+
+
+@heatmap_app.websocket('/ws')
+async def multiplexed_socket(websocket: WebSocket):
+    """
+    One socket for any number of cameras. Clients send
+    {"action": "subscribe" | "unsubscribe", "cctv_ids": [...]} and receive
+    frames tagged as {"cctv_id": ..., "frame": {...}}, or binary frames
+    tagged with the camera id when connected with ?encoding=binary. With
+    ?delta=1 frames following the previous one are sent as deltas, and
+    ?lod=32 or ?lod=8 merges the heatmap points on a coarser grid.
+    """
+    await websocket.accept()
+    sender = await negotiate_sender(websocket, tagged=True)
+    if sender is None:
+        return
+    camera_count = len(await asyncio.to_thread(library.camera_ids))
+    subscription = asyncio.Queue(maxsize=SUBSCRIBER_BACKLOG * max(camera_count, 1))
+    subscribed = set()
+    tasks = [asyncio.create_task(stream_tagged_frames(websocket, subscription, subscribed, sender)),
+             asyncio.create_task(apply_control_messages(websocket, subscription, subscribed, sender))]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not task.cancelled() and task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                print(f"Multiplexed WebSocket ended: {task.exception()}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        for cctv_id in subscribed:
+            hub.unsubscribe(cctv_id, subscription)
+
+
+@flow_app.get('/', response_class=HTMLResponse)
+async def dashboard():
+    return ENHANCED_FLOW_TEMPLATE
+
+
+@flow_app.get('/flow_data/{cctv_id}')
+async def get_flow_data(cctv_id: str):
+    """Serve flow analysis data for a specific CCTV"""
+    body, status_code = await asyncio.to_thread(load_flow_data, cctv_id)
+    return JSONResponse(body, status_code=status_code)
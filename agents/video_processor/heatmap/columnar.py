@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Columnar on-disk format of a camera's analysis frames.
+
+A camera's frames are stored in a `{cctv_id}_analysis.columns` directory
+next to its video, one NumPy array per column so readers can memory-map
+them instead of parsing JSON:
+
+    timestamps.npy      int64, one entry per frame in timestamp order
+    people_count.npy    int32
+    density.npy         uint8 index into meta.json "density_levels"
+    flags.npy           uint8 bitfield, bit i set when FLAG_FIELDS[i] is true
+    point_offsets.npy   int64, frame i's heatmap points are entries
+                        point_offsets[i]:point_offsets[i + 1] of the point arrays
+    point_x.npy         float32
+    point_y.npy         float32
+    point_value.npy     uint8
+    lod{N}_*.npy        offsets/x/y/value arrays like the point_* ones, the
+                        points merged on an N x N grid for each of LOD_GRIDS
+    attributes.json     every other field of each frame (demographics,
+                        sentiment, ...), a list aligned with timestamps
+    meta.json           format version, the columns present and the field order
+
+The `.columns` path itself is a symlink to a versioned directory
+`{cctv_id}_analysis.columns.v<id>`. A write fills a new version and then
+atomically replaces the symlink, so readers always open a complete version.
+
+A field only gets a column when every frame has it with a type the column
+can hold exactly, otherwise it stays in attributes.json, so reading a
+directory back gives the same frames as the JSON it was written from.
+Point coordinates are float32 and read back rounded to 6 decimals.
+
+The backend reads the same format with backend/app/utils/columnar.py; keep
+the two in step, backend/app/utils/test_heatmap_formats.py checks they agree.
+
+Usage:
+    python columnar.py convert cctv_1_analysis.json [...]
+    python columnar.py export cctv_1_analysis.columns [output.json]
+"""
+import os
+import sys
+import json
+import shutil
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+
+from frame_codec import FLAG_FIELDS
+from point_lod import LOD_GRIDS, MERGED_VALUE, aggregate_points
+
+FORMAT_VERSION = 1
+COLUMNS_SUFFIX = '.columns'
+META_FILE = 'meta.json'
+ATTRIBUTES_FILE = 'attributes.json'
+POINT_FIELDS = ('x', 'y', 'value')
+COORDINATE_DECIMALS = 6
+
+# Assembled frames kept per directory
+FRAME_CACHE_SIZE = 256
+
+
+def columns_path_for(json_path):
+    """Columnar directory written alongside an `*_analysis.json` file"""
+    return os.path.splitext(json_path)[0] + COLUMNS_SUFFIX
+
+
+def columns_signature(path):
+    """Identity of the current version of a columnar directory, None if there is none"""
+    try:
+        stat = os.stat(os.path.join(path, META_FILE))
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_point_list(points):
+    return isinstance(points, list) and all(
+        isinstance(point, dict) and set(point) == set(POINT_FIELDS)
+        and all(isinstance(point[axis], (int, float)) and not isinstance(point[axis], bool) for axis in ('x', 'y'))
+        and _is_int(point['value']) and 0 <= point['value'] <= 255
+        for point in points)
+
+
+def _is_frame_entry(key, frame):
+    """Whether an entry is a frame keyed by a canonical integer timestamp string"""
+    return (isinstance(key, str) and key.isascii() and key.isdigit() and str(int(key)) == key
+            and isinstance(frame, dict))
+
+
+def _point_arrays(prefix, frame_points):
+    """Ragged offsets/x/y/value arrays of each frame's points"""
+    points = [point for frame in frame_points for point in frame]
+    return {
+        f'{prefix}_offsets': np.cumsum([0] + [len(frame) for frame in frame_points], dtype=np.int64),
+        f'{prefix}_x': np.array([point['x'] for point in points], dtype=np.float32),
+        f'{prefix}_y': np.array([point['y'] for point in points], dtype=np.float32),
+        f'{prefix}_value': np.array([point['value'] for point in points], dtype=np.uint8)
+    }
+
+
+def write_columns(frames, path):
+    """
+    Write analysis frames in the columnar format.
+
+    The frames go to a new version directory, and the symlink at `path` is
+    then atomically replaced to point at it, so readers see either the
+    previous version or the new one, never a partial write. The previous
+    version is kept for readers still opening it, older ones are removed.
+    Entries that are not keyed by an integer timestamp or are not objects
+    cannot be stored and are skipped with a warning.
+
+    Args:
+        frames (dict): Frames keyed by timestamp string, as written to `*_analysis.json`
+        path (str): Columnar directory to write
+
+    Returns:
+        list: Keys of the skipped entries
+    """
+    skipped = [key for key, frame in frames.items() if not _is_frame_entry(key, frame)]
+    if skipped:
+        print(f"⚠️ {path}: skipping {len(skipped)} entries that are not frames keyed by an integer timestamp: "
+              f"{', '.join(map(str, skipped[:5]))}{', ...' if len(skipped) > 5 else ''}")
+    timestamps = sorted(int(key) for key, frame in frames.items() if _is_frame_entry(key, frame))
+    ordered = [frames[str(timestamp)] for timestamp in timestamps]
+
+    field_order = []
+    for frame in ordered:
+        field_order.extend(field for field in frame if field not in field_order)
+
+    def in_every_frame(field, check):
+        return bool(ordered) and all(field in frame and check(frame[field]) for frame in ordered)
+
+    columns = []
+    lod_grids = []
+    arrays = {'timestamps': np.array(timestamps, dtype=np.int64)}
+
+    if in_every_frame('people_count', lambda value: _is_int(value) and 0 <= value < 2 ** 31):
+        columns.append('people_count')
+        arrays['people_count'] = np.array([frame['people_count'] for frame in ordered], dtype=np.int32)
+
+    density_levels = []
+    if in_every_frame('crowd_density', lambda value: isinstance(value, str)):
+        for frame in ordered:
+            if frame['crowd_density'] not in density_levels:
+                density_levels.append(frame['crowd_density'])
+        if len(density_levels) <= 256:
+            columns.append('crowd_density')
+            arrays['density'] = np.array([density_levels.index(frame['crowd_density']) for frame in ordered],
+                                         dtype=np.uint8)
+
+    flag_fields = [field for field in FLAG_FIELDS if in_every_frame(field, lambda value: isinstance(value, bool))]
+    if flag_fields:
+        columns.extend(flag_fields)
+        arrays['flags'] = np.array([sum(1 << bit for bit, field in enumerate(flag_fields) if frame[field])
+                                    for frame in ordered], dtype=np.uint8)
+
+    if in_every_frame('heatmap_points', _is_point_list):
+        columns.append('heatmap_points')
+        arrays.update(_point_arrays('point', [frame['heatmap_points'] for frame in ordered]))
+        # Level-of-detail pyramids are built here, once per write, rather than by every reader
+        lod_grids = list(LOD_GRIDS)
+        for grid in lod_grids:
+            arrays.update(_point_arrays(f'lod{grid}', [aggregate_points(frame['heatmap_points'], grid)
+                                                       for frame in ordered]))
+
+    attributes = [{field: value for field, value in frame.items() if field not in columns} for frame in ordered]
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'columns': columns,
+        'field_order': field_order,
+        'density_levels': density_levels,
+        'flag_fields': flag_fields,
+        'point_fields': list(POINT_FIELDS),
+        'lod_grids': lod_grids,
+        'lod_value': MERGED_VALUE
+    }
+
+    path = os.path.abspath(path.rstrip(os.sep))
+    previous = os.path.realpath(path) if os.path.islink(path) else None
+    version = f'{path}.v{time.time_ns():x}-{os.getpid()}-{threading.get_ident():x}'
+    link = f'{version}.link'
+    os.makedirs(version)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(version, f'{name}.npy'), array)
+        with open(os.path.join(version, ATTRIBUTES_FILE), 'w') as f:
+            json.dump(attributes, f, separators=(',', ':'))
+        with open(os.path.join(version, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=4)
+
+        os.symlink(os.path.basename(version), link)
+        if os.path.isdir(path) and not os.path.islink(path):
+            # Written before versioned directories, a directory cannot be replaced
+            # atomically so it is moved aside once and removed with the old versions
+            os.rename(path, f'{version}.legacy')
+        os.replace(link, path)
+    except Exception:
+        shutil.rmtree(version, ignore_errors=True)
+        if os.path.lexists(link):
+            os.remove(link)
+        raise
+    _remove_old_versions(path, keep={version, previous})
+    return skipped
+
+
+def _remove_old_versions(path, keep):
+    """Remove the version directories of `path` other than `keep`"""
+    parent, name = os.path.split(path)
+    for entry in os.listdir(parent):
+        candidate = os.path.join(parent, entry)
+        # Versions still being written have no meta.json yet
+        if (entry.startswith(f'{name}.v') and candidate not in keep and os.path.isdir(candidate)
+                and not os.path.islink(candidate) and os.path.exists(os.path.join(candidate, META_FILE))):
+            # Readers holding the old arrays memory-mapped keep them until they reload
+            shutil.rmtree(candidate, ignore_errors=True)
+
+
+class ColumnarFrames(Mapping):
+    """
+    Read-only mapping of timestamp string to frame over a columnar directory.
+
+    Columns are memory-mapped, so loading costs a few small reads however
+    long the recording. Frames are assembled on access and only the most
+    recently used FRAME_CACHE_SIZE are kept, so reading every frame does not
+    rebuild the whole JSON-sized structure in memory.
+    """
+
+    def __init__(self, path):
+        # Resolved once so every file comes from the same version
+        self.path = os.path.realpath(path)
+        with open(os.path.join(path, META_FILE), 'r') as f:
+            self.meta = json.load(f)
+        if self.meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar format version {self.meta.get('format_version')} in {path}")
+        with open(os.path.join(path, ATTRIBUTES_FILE), 'r') as f:
+            self.attributes = json.load(f)
+
+        self.columns = self.meta['columns']
+        self.timestamps = self._load('timestamps')
+        self.people_count = self._load('people_count') if 'people_count' in self.columns else None
+        self.density = self._load('density') if 'crowd_density' in self.columns else None
+        self.flags = self._load('flags') if self.meta['flag_fields'] else None
+        # Ragged (offsets, x, y, value) point arrays by level of detail, None for the full points
+        self.point_levels = {}
+        if 'heatmap_points' in self.columns:
+            # Levels merged under another value rule are left out and rebuilt by the readers
+            stored = self.meta.get('lod_grids', []) if self.meta.get('lod_value') == MERGED_VALUE else []
+            levels = [(None, 'point')] + [(grid, f'lod{grid}') for grid in stored]
+            for grid, prefix in levels:
+                self.point_levels[grid] = tuple(self._load(f'{prefix}_{name}') for name in ('offsets', 'x', 'y', 'value'))
+
+        self._index = {str(int(timestamp)): i for i, timestamp in enumerate(self.timestamps)}
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, name):
+        return np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+
+    def __getitem__(self, key):
+        index = self._index[key]
+        with self._lock:
+            frame = self._frames.get(index)
+            if frame is not None:
+                self._frames.move_to_end(index)
+                return frame
+        frame = self.frame(index)
+        with self._lock:
+            self._frames[index] = frame
+            while len(self._frames) > FRAME_CACHE_SIZE:
+                self._frames.popitem(last=False)
+        return frame
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def points(self, index, lod=None):
+        """
+        Heatmap points of the frame at an index, as the JSON dicts.
+
+        Args:
+            index (int): Frame index in timestamp order
+            lod (int): Grid size of a stored level of detail, None for the full points
+
+        Returns:
+            list: The points, None if the level is not stored
+        """
+        if lod not in self.point_levels:
+            return None
+        offsets, point_x, point_y, point_value = self.point_levels[lod]
+        start, end = int(offsets[index]), int(offsets[index + 1])
+        xs = point_x[start:end].tolist()
+        ys = point_y[start:end].tolist()
+        values = point_value[start:end].tolist()
+        return [{'x': round(x, COORDINATE_DECIMALS), 'y': round(y, COORDINATE_DECIMALS), 'value': value}
+                for x, y, value in zip(xs, ys, values)]
+
+    def frame(self, index):
+        """Assemble the frame at an index, fields in their original order"""
+        values = dict(self.attributes[index])
+        if self.people_count is not None:
+            values['people_count'] = int(self.people_count[index])
+        if self.density is not None:
+            values['crowd_density'] = self.meta['density_levels'][self.density[index]]
+        if self.flags is not None:
+            bits = int(self.flags[index])
+            for bit, field in enumerate(self.meta['flag_fields']):
+                values[field] = bool(bits >> bit & 1)
+        if 'heatmap_points' in self.columns:
+            values['heatmap_points'] = self.points(index)
+
+        frame = {field: values.pop(field) for field in self.meta['field_order'] if field in values}
+        frame.update(values)
+        return frame
+
+
+def load_columns(path):
+    """Open a columnar directory as a mapping of timestamp string to frame"""
+    return ColumnarFrames(path)
+
+
+def export_json(path, output_file):
+    """Write a columnar directory back out as an `*_analysis.json` file"""
+    frames = load_columns(path)
+    with open(output_file, 'w') as f:
+        json.dump({key: frames[key] for key in frames}, f, indent=4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert CCTV analysis files to and from the columnar format')
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert = commands.add_parser('convert', help='Write the columnar directory of *_analysis.json files')
+    convert.add_argument('json_files', nargs='+')
+    export = commands.add_parser('export', help='Write a columnar directory back out as JSON')
+    export.add_argument('columns_dir')
+    export.add_argument('output_file', nargs='?')
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        for json_file in args.json_files:
+            with open(json_file, 'r') as f:
+                frames = json.load(f)
+            columns_dir = columns_path_for(json_file)
+            write_columns(frames, columns_dir)
+            print(f"✅ {json_file} -> {columns_dir}")
+    else:
+        output_file = args.output_file or os.path.splitext(args.columns_dir.rstrip(os.sep))[0] + '.json'
+        export_json(args.columns_dir, output_file)
+        print(f"✅ {args.columns_dir} -> {output_file}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
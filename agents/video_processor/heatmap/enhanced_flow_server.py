@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import os
+import sys
 import json
 import time
 import asyncio
@@ -749,30 +750,39 @@ ENHANCED_FLOW_TEMPLATE = """
 def dashboard():
     return render_template_string(ENHANCED_FLOW_TEMPLATE)
 
-@app.route('/flow_data/<cctv_id>')
-def get_flow_data(cctv_id):
-    """Serve flow analysis data for a specific CCTV"""
+def load_flow_data(cctv_id):
+    """Load the flow analysis of a CCTV, returns (body, status code)"""
     try:
         # Look for flow analysis file
         flow_file = Path(__file__).parent.parent / "videos" / "static_video" / cctv_id / f"{cctv_id}_flow_analysis.json"
         
         if flow_file.exists():
             with open(flow_file, 'r') as f:
-                return json.load(f)
+                return json.load(f), 200
         else:
             # Return default data if no flow analysis available
             return {
                 "cctv_id": cctv_id,
                 "total_timestamps": 0,
                 "predictions": {}
-            }
+            }, 200
     except Exception as e:
         return {"error": str(e)}, 500
 
+@app.route('/flow_data/<cctv_id>')
+def get_flow_data(cctv_id):
+    """Serve flow analysis data for a specific CCTV"""
+    return load_flow_data(cctv_id)
+
 if __name__ == '__main__':
     print("🚀 Starting Enhanced Flow Prediction Dashboard...")
     print("🎯 Features: Real-time Flow Analysis + Vertex AI Forecasting")
     print("📊 URL: http://localhost:5001")
     print("💡 Press Ctrl+C to stop")
     
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    if '--asgi' in sys.argv:
+        import uvicorn
+        from asgi_server import flow_app
+        uvicorn.run(flow_app, host='0.0.0.0', port=5001)
+    else:
+        app.run(host='0.0.0.0', port=5001, debug=True)
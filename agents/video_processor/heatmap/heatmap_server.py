@@ -1,27 +1,21 @@
-import os
+import sys
 import json
-import time
-import glob
-from flask import Flask, render_template, jsonify
+import queue
+from flask import Flask, render_template, jsonify, request
 from flask_sock import Sock
 
+from playback import AnalysisLibrary, PlaybackHub, DeltaSender, SinglePass, SUBSCRIBER_BACKLOG, parse_control_message
+from frame_codec import ENCODINGS
+from point_lod import parse_lod
+
 app = Flask(__name__, template_folder='templates')
 sock = Sock(app)
 
-BASE_CCTV_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'videos', 'static_video'))
+library = AnalysisLibrary()
+hub = PlaybackHub(library)
 
-def load_all_analysis_data():
-    all_data = {}
-    analysis_files = glob.glob(os.path.join(BASE_CCTV_DIR, 'cctv_*', '*_analysis.json'))
-    for file_path in sorted(analysis_files):
-        try:
-            cctv_id = os.path.basename(os.path.dirname(file_path))
-            with open(file_path, 'r') as f:
-                all_data[cctv_id] = json.load(f)
-            print(f"Successfully loaded analysis data for {cctv_id}")
-        except Exception as e:
-            print(f"Error loading or parsing {file_path}: {e}")
-    return all_data
+# Longest a multiplexed socket waits for a frame before checking for control messages
+CONTROL_POLL_SECONDS = 0.25
 
 @app.route('/')
 def index():
@@ -30,44 +24,122 @@ def index():
 @app.route('/api/cctv-feeds')
 def get_cctv_feeds():
     """Returns a list of available CCTV feeds that have analysis data."""
-    all_data = load_all_analysis_data()
-    return jsonify(list(all_data.keys()))
+    return jsonify([cctv_id for cctv_id in library.camera_ids() if library.get(cctv_id)])
+
+def negotiate_sender(ws, tagged):
+    """
+    Frame sender for the ?encoding=json|binary, ?delta=1 and ?lod=32|8 options
+    of a socket, None after replying with an error
+    """
+    encoding = request.args.get('encoding', 'json')
+    error = None
+    if encoding not in ENCODINGS:
+        error = f"encoding must be one of {', '.join(ENCODINGS)}"
+    try:
+        lod = parse_lod(request.args.get('lod'))
+    except ValueError as e:
+        error = error or str(e)
+    if error:
+        ws.send(json.dumps({'error': error}))
+        ws.close()
+        return None
+    return DeltaSender(request.args.get('delta', '').lower() in ('1', 'true'), encoding, tagged, lod)
 
 @sock.route('/ws/<cctv_id>')
 def heatmap_socket(ws, cctv_id):
     print(f"Client connected for CCTV feed: {cctv_id}")
+    sender = negotiate_sender(ws, tagged=False)
+    if sender is None:
+        return
+    if library.get(cctv_id) is None:
+        ws.send(json.dumps({'error': f'Data for {cctv_id} not found.'}))
+        ws.close()
+        return
+
+    # Frames come from the camera's shared playback thread, starting at its current
+    # position, and the socket closes after one pass over the recording
+    subscription = hub.subscribe(cctv_id)
+    single_pass = SinglePass()
     try:
-        all_data = load_all_analysis_data()
-        cctv_data = all_data.get(cctv_id)
+        while True:
+            _, timeline, index = subscription.get()
+            if not single_pass.includes(index):
+                break
+            ws.send(sender.payload(cctv_id, timeline, index))
+            if single_pass.completed_by(timeline, index):
+                break
+    except Exception as e:
+        print(f"WebSocket for {cctv_id} ended: {e}")
+    finally:
+        hub.unsubscribe(cctv_id, subscription)
+        if ws.connected:
+            ws.close()
+        print(f"WebSocket connection closed for {cctv_id}.")
 
-        if not cctv_data:
-            ws.send(json.dumps({'error': f'Data for {cctv_id} not found.'}))
-            return
+def handle_control_message(ws, message, subscription, subscribed, sender):
+    """Apply a subscribe/unsubscribe message from a multiplexed socket"""
+    try:
+        action, cctv_ids = parse_control_message(message)
+    except ValueError as e:
+        ws.send(json.dumps({'error': str(e)}))
+        return
 
-        sorted_timestamps = sorted([int(k) for k in cctv_data.keys()])
-        if not sorted_timestamps:
-            return
+    for cctv_id in cctv_ids:
+        if action == 'subscribe' and cctv_id not in subscribed:
+            if library.get(cctv_id) is None:
+                ws.send(json.dumps({'cctv_id': cctv_id, 'error': f'Data for {cctv_id} not found.'}))
+                continue
+            subscribed.add(cctv_id)
+            hub.subscribe(cctv_id, subscription)
+        elif action == 'unsubscribe' and cctv_id in subscribed:
+            subscribed.discard(cctv_id)
+            sender.forget(cctv_id)
+            hub.unsubscribe(cctv_id, subscription)
 
-        for i, timestamp in enumerate(sorted_timestamps):
-            timestamp_str = str(timestamp)
-            data_to_send = cctv_data.get(timestamp_str, {})
-            # Add timestamp to the payload for the UI
-            data_to_send['timestamp'] = timestamp
-            ws.send(json.dumps(data_to_send))
-            
-            if i + 1 < len(sorted_timestamps):
-                sleep_duration = sorted_timestamps[i+1] - timestamp
-                if sleep_duration > 0:
-                    time.sleep(sleep_duration)
+@sock.route('/ws')
+def multiplexed_socket(ws):
+    """
+    One socket for any number of cameras. Clients send
+    {"action": "subscribe" | "unsubscribe", "cctv_ids": [...]} and receive
+    frames tagged as {"cctv_id": ..., "frame": {...}}, or binary frames
+    tagged with the camera id when connected with ?encoding=binary. With
+    ?delta=1 frames following the previous one are sent as deltas, and
+    ?lod=32 or ?lod=8 merges the heatmap points on a coarser grid.
+    """
+    sender = negotiate_sender(ws, tagged=True)
+    if sender is None:
+        return
+    subscription = queue.Queue(maxsize=SUBSCRIBER_BACKLOG * max(len(library.camera_ids()), 1))
+    subscribed = set()
+    try:
+        while True:
+            message = ws.receive(timeout=0)
+            while message is not None:
+                handle_control_message(ws, message, subscription, subscribed, sender)
+                message = ws.receive(timeout=0)
 
+            try:
+                cctv_id, timeline, index = subscription.get(timeout=CONTROL_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            # Frames queued before an unsubscribe are dropped
+            if cctv_id in subscribed:
+                ws.send(sender.payload(cctv_id, timeline, index))
     except Exception as e:
-        print(f"An error occurred for {cctv_id}: {e}")
+        print(f"Multiplexed WebSocket ended: {e}")
     finally:
-        if not ws.closed:
+        for cctv_id in subscribed:
+            hub.unsubscribe(cctv_id, subscription)
+        if ws.connected:
             ws.close()
-        print(f"WebSocket connection closed for {cctv_id}.")
 
 def main():
+    if '--asgi' in sys.argv:
+        import uvicorn
+        from asgi_server import heatmap_app
+        print("Starting ASGI server for multi-CCTV analysis dashboard...")
+        uvicorn.run(heatmap_app, host='0.0.0.0', port=5002)
+        return
     print("Starting Flask server for multi-CCTV analysis dashboard...")
     app.run(host='0.0.0.0', port=5002, debug=True, use_reloader=False)
 
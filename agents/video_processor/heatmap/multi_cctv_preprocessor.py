@@ -8,6 +8,7 @@ import glob
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from video_analyzer import VideoAnalyzer
+from columnar import columns_path_for, export_json, write_columns
 
 VIDEOS_BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'videos', 'static_video'))
 
@@ -32,12 +33,18 @@ def analyze_and_save(cctv_id, analyzer):
         timestamp_data = analyzer.analyze_video_comprehensive(video_path, cctv_id)
         print(f"Comprehensive analysis complete for CCTV {cctv_id}.")
 
-        # Save the data to the final JSON file
+        # Save the data in the columnar format the servers read, plus a JSON export
         output_file = os.path.join(os.path.dirname(video_path), f'cctv_{cctv_id}_analysis.json')
-        with open(output_file, 'w') as f:
-            json.dump(timestamp_data, f, indent=4)
+        columns_dir = columns_path_for(output_file)
+        skipped = write_columns(timestamp_data, columns_dir)
+        if skipped:
+            # The columns could not hold every entry, keep them all in the JSON
+            with open(output_file, 'w') as f:
+                json.dump(timestamp_data, f, indent=4)
+        else:
+            export_json(columns_dir, output_file)
         
-        print(f"✅ CCTV {cctv_id}: Analysis saved to {output_file}")
+        print(f"✅ CCTV {cctv_id}: Analysis saved to {columns_dir} and exported to {output_file}")
         return {'cctv_id': cctv_id, 'status': 'success'}
 
     except Exception as e:
@@ -0,0 +1,447 @@
+import os
+import json
+import glob
+import time
+import queue
+import bisect
+import asyncio
+import threading
+from collections import OrderedDict
+
+from frame_codec import diff_frames, encode_delta, encode_frame
+from columnar import COLUMNS_SUFFIX, ColumnarFrames, columns_signature, load_columns
+from point_lod import aggregate_points
+
+BASE_CCTV_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'videos', 'static_video'))
+
+# Pause after the last timestamp before a camera's playback loops back to the start
+LOOP_GAP_SECONDS = 1
+
+# Frames a slow viewer may have pending before the oldest is dropped
+SUBSCRIBER_BACKLOG = 4
+
+# Every frame at a multiple of this playback index is sent whole to delta viewers
+KEYFRAME_INTERVAL = 10
+
+# Serialized payloads kept per camera, enough for every variant of the
+# current and the previous frame
+PAYLOAD_CACHE_SIZE = 64
+
+
+class CameraTimeline:
+    """
+    One camera's analysis frames in playback order.
+
+    Frames are serialized lazily, once per encoding and level of detail
+    whatever the number of viewers, and the most recently used
+    PAYLOAD_CACHE_SIZE payloads are kept.
+    A level of detail of the heatmap points is built on its first request,
+    or read from the columnar files when the preprocessor stored it.
+    """
+
+    def __init__(self, cctv_id, frames):
+        self.cctv_id = cctv_id
+        self.frames = frames
+        self.timestamps = sorted(int(k) for k in frames.keys() if k.isdigit())
+        start = self.timestamps[0] if self.timestamps else 0
+        self.offsets = [timestamp - start for timestamp in self.timestamps]
+        self.duration = (self.offsets[-1] if self.offsets else 0) + LOOP_GAP_SECONDS
+        self._levels = {}
+        self._payloads = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lod_points(self, grid):
+        """Merged heatmap points of every frame on a grid, in playback order, built on first request"""
+        with self._lock:
+            level = self._levels.get(grid)
+        if level is None:
+            level = [self._level_points(index, grid) for index in range(len(self.timestamps))]
+            with self._lock:
+                level = self._levels.setdefault(grid, level)
+        return level
+
+    def _level_points(self, index, grid):
+        if isinstance(self.frames, ColumnarFrames):
+            points = self.frames.points(index, grid)
+            if points is not None:
+                return points
+            # Level not stored, merge the full points without assembling the frame
+            full = self.frames.points(index)
+            if full is None:
+                full = self.frames.attributes[index].get('heatmap_points', [])
+            return aggregate_points(full, grid)
+        return aggregate_points(self.frames.get(str(self.timestamps[index]), {}).get('heatmap_points', []), grid)
+
+    def frame(self, index, lod=None):
+        """Frame at a playback index, with its timestamp added for the UI and points at a level of detail"""
+        timestamp = self.timestamps[index]
+        frame = {**self.frames.get(str(timestamp), {}), 'timestamp': timestamp}
+        if lod is not None and 'heatmap_points' in frame:
+            frame['heatmap_points'] = self.lod_points(lod)[index]
+        return frame
+
+    def _memo(self, key, build):
+        """Get a payload from the LRU cache, building it outside the lock on a miss"""
+        with self._lock:
+            if key in self._payloads:
+                self._payloads.move_to_end(key)
+                return self._payloads[key]
+        payload = build()
+        with self._lock:
+            self._payloads[key] = payload
+            self._payloads.move_to_end(key)
+            while len(self._payloads) > PAYLOAD_CACHE_SIZE:
+                self._payloads.popitem(last=False)
+        return payload
+
+    def payload(self, index, encoding='json', lod=None):
+        """Frame at a playback index as JSON text, or bytes for the binary encoding"""
+        def build():
+            if encoding == 'binary':
+                return encode_frame(self.frame(index, lod))
+            return json.dumps(self.frame(index, lod))
+        return self._memo((encoding, lod, index), build)
+
+    def tagged_payload(self, index, encoding='json', lod=None):
+        """Frame tagged with its camera, for the multiplexed socket"""
+        def build():
+            if encoding == 'binary':
+                return encode_frame(self.frame(index, lod), self.cctv_id)
+            return f'{{"cctv_id": {json.dumps(self.cctv_id)}, "frame": {self.payload(index, lod=lod)}}}'
+        return self._memo(('tagged', encoding, lod, index), build)
+
+    def delta_payload(self, index, encoding='json', tagged=False, lod=None):
+        """
+        Changes from the previous frame to the frame at a playback index.
+
+        Returns:
+            JSON text or bytes, None when the delta would not be smaller than the full frame
+        """
+        def build():
+            delta = diff_frames(self.frame(index - 1, lod), self.frame(index, lod))
+            cctv_id = self.cctv_id if tagged else ''
+            if encoding == 'binary':
+                payload = encode_delta(delta, cctv_id)
+            elif tagged:
+                payload = json.dumps({'cctv_id': cctv_id, 'delta': delta})
+            else:
+                payload = json.dumps({'delta': delta})
+            full = self.tagged_payload(index, encoding, lod) if tagged else self.payload(index, encoding, lod)
+            return payload if len(payload) < len(full) else None
+        return self._memo(('delta', encoding, tagged, lod, index), build)
+
+    def position(self, elapsed):
+        """
+        Find the frame showing after `elapsed` seconds of looping playback.
+
+        Returns:
+            tuple: (frame index, seconds until the next frame)
+        """
+        cycle_position = elapsed % self.duration
+        index = max(bisect.bisect_right(self.offsets, cycle_position) - 1, 0)
+        next_offset = self.offsets[index + 1] if index + 1 < len(self.offsets) else self.duration
+        return index, next_offset - cycle_position
+
+
+class DeltaSender:
+    """
+    Picks full frames or deltas for one connection.
+
+    A delta is only sent when the connection received the frame right before
+    it; after a drop, a loop back to the start or a (re)subscribe the next
+    frame goes out whole. Frames at every KEYFRAME_INTERVAL index are always
+    whole so clients can resynchronise.
+    """
+
+    def __init__(self, enabled, encoding='json', tagged=False, lod=None):
+        self.enabled = enabled
+        self.encoding = encoding
+        self.tagged = tagged
+        self.lod = lod
+        self._sent = {}
+
+    def payload(self, cctv_id, timeline, index):
+        previous = self._sent.get(cctv_id)
+        self._sent[cctv_id] = (timeline, index)
+        if self.enabled and previous == (timeline, index - 1) and index % KEYFRAME_INTERVAL:
+            delta = timeline.delta_payload(index, self.encoding, self.tagged, self.lod)
+            if delta is not None:
+                return delta
+        if self.tagged:
+            return timeline.tagged_payload(index, self.encoding, self.lod)
+        return timeline.payload(index, self.encoding, self.lod)
+
+    def forget(self, cctv_id):
+        """Send the camera's next frame whole, e.g. after it was unsubscribed"""
+        self._sent.pop(cctv_id, None)
+
+
+class SinglePass:
+    """
+    Ends a per-camera socket after one pass over the recording, as before
+    playback was shared.
+
+    Viewers join the shared playback at its current frame, so the pass runs
+    from there to the frame before it; for a viewer joining at the start
+    that is the last frame of the recording.
+    """
+
+    def __init__(self):
+        self._first = None
+        self._previous = None
+        self._wrapped = False
+
+    def includes(self, index):
+        """Whether the frame at a playback index still belongs to the pass"""
+        if self._first is None:
+            self._first = index
+        elif index <= self._previous:
+            self._wrapped = True
+        if self._wrapped and index >= self._first:
+            return False
+        self._previous = index
+        return True
+
+    def completed_by(self, timeline, index):
+        """Whether the frame just sent at a playback index was the last of the pass"""
+        return (index + 1) % len(timeline.timestamps) == self._first
+
+
+def parse_control_message(message):
+    """
+    Parse a multiplexed socket control message such as
+    {"action": "subscribe", "cctv_ids": ["cctv_1", "cctv_2"]}.
+
+    Returns:
+        tuple: (action, list of cctv_ids)
+
+    Raises:
+        ValueError: If the message is not a subscribe or unsubscribe request
+    """
+    try:
+        data = json.loads(message)
+    except (TypeError, ValueError):
+        raise ValueError('Control messages must be JSON')
+    if not isinstance(data, dict):
+        raise ValueError('Control messages must be JSON objects')
+    action = data.get('action')
+    if action not in ('subscribe', 'unsubscribe'):
+        raise ValueError("action must be 'subscribe' or 'unsubscribe'")
+    cctv_ids = data.get('cctv_ids', [])
+    if isinstance(cctv_ids, str):
+        cctv_ids = [cctv_ids]
+    if not isinstance(cctv_ids, list) or not all(isinstance(cctv_id, str) for cctv_id in cctv_ids):
+        raise ValueError('cctv_ids must be a list of camera ids')
+    return action, cctv_ids
+
+
+class AnalysisLibrary:
+    """
+    Per-camera analysis timelines, loaded once and reloaded when a preprocessor rewrites them.
+
+    A camera's columnar `{cctv_id}_analysis.columns` directory is preferred,
+    memory-mapped rather than parsed; its `{cctv_id}_analysis.json` is read
+    when there is no columnar copy.
+    """
+
+    def __init__(self, base_dir=BASE_CCTV_DIR):
+        self.base_dir = base_dir
+        self._timelines = {}
+        self._lock = threading.Lock()
+
+    def camera_ids(self):
+        analysis_files = glob.glob(os.path.join(self.base_dir, 'cctv_*', '*_analysis.json'))
+        analysis_files += glob.glob(os.path.join(self.base_dir, 'cctv_*', f'*_analysis{COLUMNS_SUFFIX}'))
+        return sorted({os.path.basename(os.path.dirname(path)) for path in analysis_files
+                       if not path.endswith('_flow_analysis.json')})
+
+    def _source(self, cctv_id):
+        """(path, signature, loader) of the camera's analysis data, None if it has none"""
+        base_path = os.path.join(self.base_dir, cctv_id, f'{cctv_id}_analysis')
+        if os.path.dirname(os.path.dirname(base_path)) != self.base_dir:
+            return None
+
+        columns_path = base_path + COLUMNS_SUFFIX
+        signature = columns_signature(columns_path)
+        if signature is not None:
+            return columns_path, signature, load_columns
+
+        file_path = base_path + '.json'
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+
+        def load_json(path):
+            with open(path, 'r') as f:
+                return json.load(f)
+        return file_path, (stat.st_mtime_ns, stat.st_size), load_json
+
+    def get(self, cctv_id):
+        """Timeline of a camera, None if it has no analysis data"""
+        source = self._source(cctv_id)
+        if source is None:
+            return None
+
+        path, signature, load = source
+        with self._lock:
+            cached = self._timelines.get(cctv_id)
+            if cached and cached[0] == (path, signature):
+                return cached[1]
+            try:
+                timeline = CameraTimeline(cctv_id, load(path))
+                print(f"Successfully loaded analysis data for {cctv_id}")
+            except Exception as e:
+                print(f"Error loading or parsing {path}: {e}")
+                return cached[1] if cached else None
+            if not timeline.timestamps:
+                return None
+            self._timelines[cctv_id] = ((path, signature), timeline)
+            return timeline
+
+
+class PlaybackHub:
+    """
+    One playback thread per camera, driven by a clock shared by every camera.
+
+    The thread starts with the first viewer of a camera and stops with the
+    last one. Each frame is published once to every viewer's queue as a
+    (cctv_id, timeline, index) tuple; because playback position is derived
+    from the shared clock, new viewers join at the current frame.
+    """
+
+    def __init__(self, library):
+        self.library = library
+        self.epoch = time.monotonic()
+        self._subscribers = {}
+        self._current = {}
+        self._stops = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, cctv_id, subscription=None):
+        """
+        Subscribe to a camera's frames.
+
+        Args:
+            cctv_id (str): Camera to follow
+            subscription (queue.Queue): Existing queue of a viewer following several cameras
+
+        Returns:
+            queue.Queue: The queue receiving the camera's frames
+        """
+        if subscription is None:
+            subscription = queue.Queue(maxsize=SUBSCRIBER_BACKLOG)
+        with self._lock:
+            self._subscribers.setdefault(cctv_id, set()).add(subscription)
+            if cctv_id in self._current:
+                self._offer(subscription, self._current[cctv_id])
+            if cctv_id not in self._stops:
+                stop = self._stops[cctv_id] = threading.Event()
+                threading.Thread(target=self._play, args=(cctv_id, stop), daemon=True).start()
+        return subscription
+
+    def unsubscribe(self, cctv_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(cctv_id, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(cctv_id, None)
+                self._current.pop(cctv_id, None)
+                stop = self._stops.pop(cctv_id, None)
+                if stop:
+                    stop.set()
+
+    def _offer(self, subscription, item):
+        try:
+            subscription.put_nowait(item)
+        except queue.Full:
+            try:
+                subscription.get_nowait()
+            except queue.Empty:
+                pass
+            subscription.put_nowait(item)
+
+    def _play(self, cctv_id, stop):
+        published = None
+        while not stop.is_set():
+            timeline = self.library.get(cctv_id)
+            if timeline is None:
+                stop.wait(LOOP_GAP_SECONDS)
+                continue
+
+            elapsed = time.monotonic() - self.epoch
+            index, wait = timeline.position(elapsed)
+            # Waking a hair early must not publish the same frame twice
+            frame_key = (timeline, int(elapsed // timeline.duration), index)
+            if frame_key != published:
+                published = frame_key
+                item = (cctv_id, timeline, index)
+                with self._lock:
+                    if stop.is_set():
+                        break
+                    self._current[cctv_id] = item
+                    for subscription in self._subscribers.get(cctv_id, ()):
+                        self._offer(subscription, item)
+            stop.wait(wait)
+
+
+class AsyncPlaybackHub:
+    """
+    asyncio counterpart of PlaybackHub for the ASGI server mode.
+
+    Same shared clock and (cctv_id, timeline, index) items, but each camera
+    is played by a task and viewers wait on asyncio queues, so idle
+    connections cost no thread.
+    """
+
+    def __init__(self, library):
+        self.library = library
+        self.epoch = time.monotonic()
+        self._subscribers = {}
+        self._current = {}
+        self._tasks = {}
+
+    def subscribe(self, cctv_id, subscription=None):
+        """Subscribe to a camera's frames, see PlaybackHub.subscribe"""
+        if subscription is None:
+            subscription = asyncio.Queue(maxsize=SUBSCRIBER_BACKLOG)
+        self._subscribers.setdefault(cctv_id, set()).add(subscription)
+        if cctv_id in self._current:
+            self._offer(subscription, self._current[cctv_id])
+        if cctv_id not in self._tasks:
+            self._tasks[cctv_id] = asyncio.create_task(self._play(cctv_id))
+        return subscription
+
+    def unsubscribe(self, cctv_id, subscription):
+        subscribers = self._subscribers.get(cctv_id, set())
+        subscribers.discard(subscription)
+        if not subscribers:
+            self._subscribers.pop(cctv_id, None)
+            self._current.pop(cctv_id, None)
+            task = self._tasks.pop(cctv_id, None)
+            if task:
+                task.cancel()
+
+    def _offer(self, subscription, item):
+        if subscription.full():
+            subscription.get_nowait()
+        subscription.put_nowait(item)
+
+    async def _play(self, cctv_id):
+        published = None
+        while True:
+            # Only stats the file unless a preprocessor rewrote it
+            timeline = await asyncio.to_thread(self.library.get, cctv_id)
+            if timeline is None:
+                await asyncio.sleep(LOOP_GAP_SECONDS)
+                continue
+
+            elapsed = time.monotonic() - self.epoch
+            index, wait = timeline.position(elapsed)
+            frame_key = (timeline, int(elapsed // timeline.duration), index)
+            if frame_key != published:
+                published = frame_key
+                item = self._current[cctv_id] = (cctv_id, timeline, index)
+                for subscription in self._subscribers.get(cctv_id, ()):
+                    self._offer(subscription, item)
+            await asyncio.sleep(wait)
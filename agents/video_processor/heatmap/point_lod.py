@@ -0,0 +1,80 @@
+"""
+Level-of-detail pyramids of heatmap points.
+
+Dense frames carry one heatmap point per person. Views showing many cameras
+at once render each one small, so besides the full points every frame gets
+coarser levels where the points falling in the same cell of an N x N grid
+over the frame are merged into one.
+
+The backend builds the same levels with backend/app/utils/point_lod.py;
+keep the two in step, backend/app/utils/test_heatmap_formats.py checks they agree.
+"""
+
+# Grid sizes of the aggregated levels, finest first. Full points are level None
+LOD_GRIDS = (32, 8)
+
+# How a merged point's value is derived from its points. Columnar files record
+# it, and levels they stored under another rule are rebuilt instead of read
+MERGED_VALUE = 'max'
+
+COORDINATE_DECIMALS = 4
+
+
+def parse_lod(value):
+    """
+    Parse a requested level of detail.
+
+    Returns:
+        int: Grid size of the level, None for full points
+
+    Raises:
+        ValueError: If the level is not 'full' or one of LOD_GRIDS
+    """
+    if value in (None, '', 'full'):
+        return None
+    try:
+        grid = int(value)
+    except (TypeError, ValueError):
+        grid = None
+    if grid not in LOD_GRIDS:
+        raise ValueError(f"lod must be full or one of {', '.join(str(grid) for grid in LOD_GRIDS)}")
+    return grid
+
+
+def aggregate_points(points, grid):
+    """
+    Merge the heatmap points falling in the same cell of a grid x grid partition.
+
+    Each occupied cell becomes one point at the value-weighted centroid of its
+    points, carrying the largest of their values. Intensity stays on the scale
+    of the full points, so the dashboards' fixed heatmap maximum still shows
+    dense cells as hot rather than saturating every cell.
+
+    Args:
+        points (list): Heatmap points with x, y in 0..1 and a value
+        grid (int): Cells per side
+
+    Returns:
+        list: One point per occupied cell, in row-major cell order
+    """
+    cells = {}
+    for point in points:
+        x, y, value = point.get('x', 0), point.get('y', 0), point.get('value', 0)
+        cell = (min(max(int(y * grid), 0), grid - 1), min(max(int(x * grid), 0), grid - 1))
+        sum_x, sum_y, sum_value, weighted_x, weighted_y, count, max_value = cells.get(cell, (0, 0, 0, 0, 0, 0, 0))
+        cells[cell] = (sum_x + x, sum_y + y, sum_value + value,
+                       weighted_x + x * value, weighted_y + y * value, count + 1, max(max_value, value))
+
+    merged = []
+    for cell in sorted(cells):
+        sum_x, sum_y, sum_value, weighted_x, weighted_y, count, max_value = cells[cell]
+        if sum_value > 0:
+            x, y = weighted_x / sum_value, weighted_y / sum_value
+        else:
+            x, y = sum_x / count, sum_y / count
+        merged.append({
+            'x': round(x, COORDINATE_DECIMALS),
+            'y': round(y, COORDINATE_DECIMALS),
+            'value': max_value
+        })
+    return merged
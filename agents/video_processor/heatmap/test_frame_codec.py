@@ -0,0 +1,59 @@
+import pytest
+
+from frame_codec import COORDINATE_SCALE, apply_delta, decode_delta, diff_frames, encode_delta
+
+
+def point(x, y, value):
+    # On the wire grid, so points survive encoding unchanged
+    return {'x': x / COORDINATE_SCALE, 'y': y / COORDINATE_SCALE, 'value': value}
+
+
+BASE = {
+    'timestamp': 10,
+    'people_count': 12,
+    'crowd_density': 'medium',
+    'fire_flag': False,
+    'sentiment': 'calm',
+    'heatmap_points': [point(100 * i, 50 * i, 10 + i) for i in range(20)],
+}
+
+CHANGES = [
+    # Nothing but the timestamp
+    {**BASE, 'timestamp': 11},
+    # Fields changed, added and removed
+    {**{key: value for key, value in BASE.items() if key != 'sentiment'},
+     'timestamp': 11, 'people_count': 15, 'fire_flag': True, 'demographics': {'adults': 3}},
+    # Points inserted, replaced and dropped in the middle
+    {**BASE, 'timestamp': 12,
+     'heatmap_points': BASE['heatmap_points'][:5] + [point(7, 7, 200)] + BASE['heatmap_points'][8:18]},
+    # Every point new, and none at all
+    {**BASE, 'timestamp': 13, 'heatmap_points': [point(1, 2, 3), point(4, 5, 6)]},
+    {**BASE, 'timestamp': 14, 'heatmap_points': []},
+]
+
+
+@pytest.mark.parametrize('current', CHANGES)
+def test_apply_delta_rebuilds_the_frame(current):
+    assert apply_delta(BASE, diff_frames(BASE, current)) == current
+
+
+@pytest.mark.parametrize('current', CHANGES)
+def test_encoded_delta_round_trips(current):
+    cctv_id, delta = decode_delta(encode_delta(diff_frames(BASE, current), 'cctv_1'))
+    assert cctv_id == 'cctv_1'
+    assert delta['base'] == BASE['timestamp']
+    assert apply_delta(BASE, delta) == current
+
+
+def test_unchanged_points_are_copied():
+    current = {**BASE, 'timestamp': 11, 'heatmap_points': BASE['heatmap_points'] + [point(9, 9, 9)]}
+    delta = diff_frames(BASE, current)
+    assert delta['points'] == [[0, 20], point(9, 9, 9)]
+    assert delta['set'] == {} and delta['unset'] == []
+
+
+def test_chained_deltas():
+    frame = BASE
+    for current in CHANGES:
+        frame = apply_delta(frame, decode_delta(encode_delta(diff_frames(frame, current)))[1])
+        assert frame == current
@@ -5,5 +5,8 @@ class Settings:
     debug: bool = os.getenv("DEBUG", "True").lower() == "true"
     host: str = os.getenv("HOST", "0.0.0.0")
     port: int = int(os.getenv("PORT", "8000"))
+    # Repository backend: "json" (files under app/repo) or "sqlite"
+    storage_backend: str = os.getenv("STORAGE_BACKEND", "json").lower()
+    sqlite_path: str = os.getenv("SQLITE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "repo", "crowd.db"))
 
-settings = Settings() 
\ No newline at end of file
+settings = Settings()
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules import each other relative to app/, as when the server is run from here
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
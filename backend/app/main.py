@@ -1,4 +1,6 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
@@ -8,8 +10,14 @@ from routers.zones import router as zones_router
 from routers.events import router as events_router
 from routers.emergency import router as emergency_router
 from routers.incidents import router as incidents_router
-from routers.cctv import router as cctv_router
+from routers.cctv import router as cctv_router, cctv_playback
 from routers.assistant import router as assistant_router
+from config import settings
+from repo.incidents.incident import incident_journal, incident_store
+from repo.cctv.cctv import cctv_videos
+
+# Seconds between consistency checks of the incident counters
+COUNTS_CHECK_INTERVAL = 300
 
 app = FastAPI(
     title="Crowd Management API",
@@ -24,6 +32,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Raster-Width", "X-Raster-Height", "X-Timestamp"],  # Pagination cursor, heatmap raster size
 )
 
 # Mount static files for serving uploaded images
@@ -41,6 +50,43 @@ app.include_router(incidents_router)
 app.include_router(cctv_router)
 app.include_router(assistant_router)
 
+@app.on_event("startup")
+async def load_repositories():
+    """Rebuild in-memory repository state before serving requests"""
+    if settings.storage_backend == "sqlite":
+        # Opens the database and creates the schema
+        from repo.sqlite_store import unmigrated_json_files
+        unmigrated = unmigrated_json_files()
+        if unmigrated:
+            # Serving an empty database would hide the JSON data and diverge from it
+            raise RuntimeError(
+                f"STORAGE_BACKEND=sqlite but {settings.sqlite_path} holds no documents while "
+                f"{', '.join(unmigrated)} exist; run `python -m repo.sqlite_store` from backend/app to migrate them"
+            )
+    else:
+        # Replays the incident snapshot and mutation log
+        incident_journal.view()
+    # Index the camera videos served by /cctv/videos
+    videos = await run_in_threadpool(cctv_videos.refresh)
+    print(f"Indexed {len(videos)} CCTV video files")
+    app.state.counts_check = asyncio.create_task(check_incident_counts())
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    """Cancel background tasks started on startup"""
+    app.state.counts_check.cancel()
+    await cctv_playback.close()
+
+async def check_incident_counts():
+    """Periodically compare the maintained incident counters against a full recount from storage"""
+    while True:
+        try:
+            if not await run_in_threadpool(incident_store.check_counts):
+                print("Warning: incident counters drifted from a full recount and were rebuilt")
+        except Exception as e:
+            print(f"Error checking incident counters: {str(e)}")
+        await asyncio.sleep(COUNTS_CHECK_INTERVAL)
+
 @app.get("/")
 async def root():
     return {"message": "Crowd Management API is running"}
@@ -0,0 +1,488 @@
+import bisect
+import glob
+import hashlib
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.columnar import COLUMNS_SUFFIX, ColumnarFrames, columns_signature, load_columns
+from utils.point_lod import aggregate_points
+
+# Path to the CCTV analysis data, one cctv_<n> directory per camera
+CCTV_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "videos")
+
+CCTV_ID_PATTERN = re.compile(r"^cctv_[A-Za-z0-9_-]+$")
+
+# Frame flags that count as a security alert
+ALERT_FLAGS = ('violence_flag', 'weapon_detected', 'fire_flag', 'smoke_flag')
+HIGH_DENSITY_LEVELS = ('high', 'very_high')
+
+def has_security_alert(frame: dict) -> bool:
+    """Check whether a frame raised any security alert flag"""
+    return any(frame.get(flag, False) for flag in ALERT_FLAGS)
+
+def summarize_frames(frames: dict) -> dict:
+    """Calculate summary statistics over every timestamp of a camera"""
+    people_counts = []
+    high_density_count = 0
+    security_alerts = 0
+    
+    for frame in frames.values():
+        if isinstance(frame, dict):
+            people_counts.append(frame.get('people_count', 0))
+            if frame.get('crowd_density', 'low') in HIGH_DENSITY_LEVELS:
+                high_density_count += 1
+            if has_security_alert(frame):
+                security_alerts += 1
+    
+    return {
+        "avg_people_count": round(sum(people_counts) / len(people_counts), 1) if people_counts else 0,
+        "max_people_count": max(people_counts) if people_counts else 0,
+        "total_timestamps": len(people_counts),
+        "high_density_periods": high_density_count,
+        "security_alerts": security_alerts
+    }
+
+def summarize_columns(frames: ColumnarFrames) -> dict:
+    """
+    Calculate the same statistics as summarize_frames() from the columns of a columnar directory.
+
+    Works on the memory-mapped arrays, plus attributes.json for the fields
+    that had no column, so no frame is assembled.
+    """
+    attributes = frames.attributes
+    if frames.people_count is not None:
+        people_counts = frames.people_count
+    else:
+        people_counts = np.array([attribute.get('people_count', 0) for attribute in attributes])
+
+    if frames.density is not None:
+        high_codes = [code for code, level in enumerate(frames.meta['density_levels']) if level in HIGH_DENSITY_LEVELS]
+        high_density = np.isin(frames.density, high_codes)
+    else:
+        high_density = np.array([attribute.get('crowd_density', 'low') in HIGH_DENSITY_LEVELS
+                                 for attribute in attributes], dtype=bool)
+
+    flag_fields = frames.meta['flag_fields']
+    alerts = np.zeros(len(attributes), dtype=bool)
+    if frames.flags is not None:
+        mask = sum(1 << bit for bit, field in enumerate(flag_fields) if field in ALERT_FLAGS)
+        alerts |= (frames.flags & mask) != 0
+    other_flags = [flag for flag in ALERT_FLAGS if flag not in flag_fields]
+    if other_flags:
+        alerts |= np.array([any(attribute.get(flag, False) for flag in other_flags) for attribute in attributes],
+                           dtype=bool)
+
+    total = len(attributes)
+    return {
+        "avg_people_count": round(int(people_counts.sum()) / total, 1) if total else 0,
+        "max_people_count": people_counts.max().item() if total else 0,
+        "total_timestamps": total,
+        "high_density_periods": int(high_density.sum()),
+        "security_alerts": int(alerts.sum())
+    }
+
+def frame_timestamps(frames: Mapping[str, dict]) -> List[int]:
+    """Sorted integer timestamps of a camera's frames"""
+    if isinstance(frames, ColumnarFrames):
+        return frames.timestamps.tolist()
+    return sorted(int(key) for key in frames.keys() if key.isdigit())
+
+class PointPyramid:
+    """
+    Level-of-detail heatmap points of one analysis document.
+
+    A level is built on its first request, or read from the columnar files
+    when the preprocessor stored it, and then kept. The AnalysisBlobStore
+    keeps one pyramid per document, so cameras with identical content share
+    their levels like they share their frames.
+    """
+
+    def __init__(self, frames: Mapping[str, dict]):
+        self.frames = frames
+        self._levels: Dict[int, Dict[int, List[dict]]] = {}
+        self._lock = threading.Lock()
+
+    def level(self, grid: int) -> Dict[int, List[dict]]:
+        """
+        Get the merged points of every frame on a grid.
+
+        Returns:
+            dict: Points by integer timestamp
+        """
+        with self._lock:
+            level = self._levels.get(grid)
+        if level is None:
+            level = self._build(grid)
+            with self._lock:
+                level = self._levels.setdefault(grid, level)
+        return level
+
+    def _build(self, grid: int) -> Dict[int, List[dict]]:
+        level = {}
+        for index, timestamp in enumerate(frame_timestamps(self.frames)):
+            if isinstance(self.frames, ColumnarFrames):
+                points = self.frames.points(index, grid)
+                if points is None:
+                    # Level not stored, merge the full points without assembling the frame
+                    full = self.frames.points(index)
+                    if full is None:
+                        full = self.frames.attributes[index].get('heatmap_points', [])
+                    points = aggregate_points(full, grid)
+            else:
+                frame = self.frames.get(str(timestamp))
+                points = aggregate_points(frame.get('heatmap_points', []) if isinstance(frame, dict) else [], grid)
+            level[timestamp] = points
+        return level
+
+class CameraAnalysis:
+    """
+    One camera's analysis frames, keyed by timestamp string.
+
+    Built once per version of the camera's analysis file and shared by every
+    request, so it must be treated as read-only. The timeline is kept as a
+    sorted list of integer timestamps so lookups never re-sort the keys, and
+    the summary statistics and latest frame status are computed once here
+    instead of on every analytics request. Levels of detail of the heatmap
+    points come from the document's PointPyramid.
+    """
+
+    def __init__(self, cctv_id: str, frames: Mapping[str, dict], version: int = 0,
+                 pyramid: Optional[PointPyramid] = None):
+        self.cctv_id = cctv_id
+        self.frames = frames
+        self.version = version
+        self.pyramid = pyramid if pyramid is not None else PointPyramid(frames)
+        self.timestamps: List[int] = frame_timestamps(frames)
+        if isinstance(frames, ColumnarFrames):
+            # Straight from the memory-mapped columns, without assembling the frames
+            self.summary = summarize_columns(frames)
+        else:
+            self.summary = summarize_frames(frames)
+
+        latest = self.latest()
+        self.people_count = latest.get('people_count', 0)
+        self.density = latest.get('crowd_density', 'low')
+        self.has_alerts = has_security_alert(latest)
+        self.high_density = self.density in HIGH_DENSITY_LEVELS
+
+    def frame(self, timestamp: int, lod: Optional[int] = None) -> dict:
+        """
+        Get the frame recorded at a timestamp.
+
+        Args:
+            timestamp (int): Timestamp of the frame
+            lod (int): Grid size of the heatmap point level of detail, None for the full points
+
+        Returns:
+            dict: The shared frame, or a copy carrying the merged points for a level of detail
+        """
+        frame = self.frames.get(str(timestamp), {})
+        if lod is None or 'heatmap_points' not in frame:
+            return frame
+        return {**frame, 'heatmap_points': self.pyramid.level(lod).get(timestamp, [])}
+
+    def latest(self, lod: Optional[int] = None) -> dict:
+        """Get the frame with the latest timestamp"""
+        return self.frame(self.timestamps[-1], lod) if self.timestamps else {}
+
+    def window(self, start: Optional[int] = None, end: Optional[int] = None) -> List[int]:
+        """
+        Get the timestamps within an inclusive range by binary search.
+
+        Args:
+            start (int): First timestamp to include, None starts at the beginning
+            end (int): Last timestamp to include, None runs to the end
+
+        Returns:
+            list: The sorted timestamps in the range
+        """
+        low = 0 if start is None else bisect.bisect_left(self.timestamps, start)
+        high = len(self.timestamps) if end is None else bisect.bisect_right(self.timestamps, end)
+        return self.timestamps[low:high]
+
+class AnalysisBlobStore:
+    """
+    Content-addressed store of the CCTV analysis content.
+
+    Camera documents are keyed by the SHA-256 of their bytes and frames by
+    the SHA-256 of their compact JSON, so cameras whose preprocessor output
+    is identical share one parsed document, and identical frames within or
+    across documents share one dict. A document whose hash is already stored
+    is not parsed again, so memory and parse time follow unique content
+    rather than camera count. Each document's PointPyramid is kept with it,
+    so its levels of detail are built once per content too.
+    """
+
+    def __init__(self):
+        self._documents: Dict[str, Tuple[Mapping[str, dict], Set[str], PointPyramid]] = {}
+        self._frames: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def document(self, digest: str, load: Callable[[], Mapping[str, dict]]) -> Tuple[Mapping[str, dict], PointPyramid]:
+        """
+        Get the frames of a document by content hash, loading them on a miss.
+
+        Args:
+            digest (str): SHA-256 of the document content
+            load (callable): Loads the document's frames on a miss
+
+        Returns:
+            tuple: (frames, the document's PointPyramid)
+        """
+        with self._lock:
+            if digest in self._documents:
+                frames, _, pyramid = self._documents[digest]
+                return frames, pyramid
+
+        frames = load()
+        frame_digests = set()
+        if isinstance(frames, dict):
+            # Parsed JSON, intern each frame. Columnar frames are assembled lazily and kept per document
+            frames, frame_digests = self._intern_frames(frames)
+        with self._lock:
+            frames, _, pyramid = self._documents.setdefault(digest, (frames, frame_digests, PointPyramid(frames)))
+            return frames, pyramid
+
+    def _intern_frames(self, frames: dict) -> Tuple[dict, Set[str]]:
+        interned = {}
+        digests = set()
+        for key, frame in frames.items():
+            digest = hashlib.sha256(json.dumps(frame, separators=(',', ':')).encode()).hexdigest()
+            digests.add(digest)
+            with self._lock:
+                interned[key] = self._frames.setdefault(digest, frame)
+        return interned, digests
+
+    def prune(self, in_use: Set[str]):
+        """Drop the documents no camera references anymore, and frames only they used"""
+        with self._lock:
+            for digest in set(self._documents) - in_use:
+                del self._documents[digest]
+            live_frames = set().union(*(frame_digests for _, frame_digests, _ in self._documents.values()))
+            for digest in set(self._frames) - live_frames:
+                del self._frames[digest]
+
+    def stats(self) -> Dict[str, int]:
+        """Number of unique documents and interned frames held"""
+        with self._lock:
+            return {"documents": len(self._documents), "frames": len(self._frames)}
+
+def hash_file(path: str) -> Tuple[str, bytes, tuple]:
+    """
+    Read a file and hash its content.
+
+    Returns:
+        tuple: (SHA-256 hex digest, content, (mtime_ns, size) of the version read)
+    """
+    with open(path, 'rb') as file:
+        stat = os.fstat(file.fileno())
+        data = file.read()
+    return hashlib.sha256(data).hexdigest(), data, (stat.st_mtime_ns, stat.st_size)
+
+def hash_columns(path: str) -> str:
+    """SHA-256 over the names and bytes of the files of a columnar directory"""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(path)):
+        digest.update(name.encode() + b'\0')
+        with open(os.path.join(path, name), 'rb') as file:
+            digest.update(hashlib.sha256(file.read()).digest())
+    return digest.hexdigest()
+
+class CctvAnalysisCache:
+    """
+    Resident per-camera cache of the CCTV analysis files.
+
+    Each camera's analysis is loaded once and kept in memory. A camera's
+    columnar `*_analysis.columns` directory is preferred and memory-mapped;
+    its `*_analysis.json` is parsed when there is none. Every access stats
+    the source and reloads it only when a preprocessor rewrote it, so polling
+    endpoints never re-read unchanged files. Single-camera lookups only touch
+    that camera's files. Content is deduplicated across cameras by the
+    AnalysisBlobStore.
+    """
+
+    def __init__(self, data_dir: str = CCTV_DATA_DIR):
+        self.data_dir = data_dir
+        self.blobs = AnalysisBlobStore()
+        self._cameras: Dict[str, Tuple[Any, str, CameraAnalysis]] = {}
+        self._versions = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _analysis_path(self, cctv_id: str, suffix: str = '.json') -> Optional[str]:
+        if not CCTV_ID_PATTERN.match(cctv_id):
+            return None
+        paths = sorted(glob.glob(os.path.join(self.data_dir, cctv_id, f'*_analysis{suffix}')))
+        return paths[-1] if paths else None
+
+    def camera_ids(self) -> List[str]:
+        """Get the ids of the cameras that have an analysis file, sorted"""
+        paths = glob.glob(os.path.join(self.data_dir, 'cctv_*', '*_analysis.json'))
+        paths += glob.glob(os.path.join(self.data_dir, 'cctv_*', f'*_analysis{COLUMNS_SUFFIX}'))
+        return sorted({os.path.basename(os.path.dirname(path)) for path in paths})
+
+    def _cached(self, cctv_id: str, source: Any) -> Optional[CameraAnalysis]:
+        with self._lock:
+            cached = self._cameras.get(cctv_id)
+            return cached[2] if cached is not None and cached[0] == source else None
+
+    def _store(self, cctv_id: str, source: Any, digest: str,
+               document: Tuple[Mapping[str, dict], PointPyramid]) -> CameraAnalysis:
+        with self._lock:
+            cached = self._cameras.get(cctv_id)
+            if cached is not None and cached[0] == source:
+                return cached[2]
+            # Versions are unique per load, whichever file the frames came from
+            frames, pyramid = document
+            camera = CameraAnalysis(cctv_id, frames, next(self._versions), pyramid)
+            self._cameras[cctv_id] = (source, digest, camera)
+            in_use = {digest for _, digest, _ in self._cameras.values()}
+        if cached is not None and cached[1] not in in_use:
+            self.blobs.prune(in_use)
+        return camera
+
+    def _forget(self, cctv_id: str):
+        with self._lock:
+            cached = self._cameras.pop(cctv_id, None)
+            in_use = {digest for _, digest, _ in self._cameras.values()}
+        if cached is not None and cached[1] not in in_use:
+            self.blobs.prune(in_use)
+
+    def get(self, cctv_id: str) -> Optional[CameraAnalysis]:
+        """
+        Get a camera's analysis, reloading it if its files changed.
+
+        Returns:
+            CameraAnalysis: The shared analysis or None if the camera has no analysis file
+        """
+        columns_path = self._analysis_path(cctv_id, COLUMNS_SUFFIX)
+        if columns_path is not None:
+            source = (columns_path, columns_signature(columns_path))
+            camera = self._cached(cctv_id, source)
+            if camera is not None:
+                return camera
+            try:
+                # The path is a symlink a writer swaps atomically, hash and load one version
+                version_path = os.path.realpath(columns_path)
+                digest = 'columns:' + hash_columns(version_path)
+                document = self.blobs.document(digest, lambda: load_columns(version_path))
+                return self._store(cctv_id, source, digest, document)
+            except Exception as e:
+                print(f"Error loading columnar CCTV data {columns_path}, falling back to JSON: {e}")
+
+        path = self._analysis_path(cctv_id)
+        if path is None:
+            self._forget(cctv_id)
+            return None
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._forget(cctv_id)
+            return None
+        camera = self._cached(cctv_id, (path, (stat.st_mtime_ns, stat.st_size)))
+        if camera is not None:
+            return camera
+
+        try:
+            content_hash, data, signature = hash_file(path)
+        except FileNotFoundError:
+            self._forget(cctv_id)
+            return None
+        digest = 'json:' + content_hash
+        document = self.blobs.document(digest, lambda: json.loads(data))
+        return self._store(cctv_id, (path, signature), digest, document)
+
+    def all(self) -> Dict[str, CameraAnalysis]:
+        """Get every camera's analysis, keyed by camera id in sorted order"""
+        cameras = {}
+        for cctv_id in self.camera_ids():
+            try:
+                camera = self.get(cctv_id)
+            except Exception as e:
+                print(f"Error loading CCTV data for {cctv_id}: {e}")
+                continue
+            if camera is not None:
+                cameras[cctv_id] = camera
+        return cameras
+
+cctv_cache = CctvAnalysisCache()
+
+class CctvVideoIndex:
+    """
+    Index of the camera video files under the CCTV data directory.
+
+    Built once at startup by refresh(). A lookup for a camera that is not
+    indexed, or whose file went away, rescans the directory so videos added
+    later are still found, but only when a camera directory was added or
+    removed since the last scan or rescan_interval seconds have passed, so
+    requests for ids that do not exist cannot force a scan each.
+    """
+
+    def __init__(self, data_dir: str = CCTV_DATA_DIR, extensions: Tuple[str, ...] = ('.mp4',),
+                 rescan_interval: float = 10.0):
+        self.data_dir = data_dir
+        self.extensions = extensions
+        self.rescan_interval = rescan_interval
+        self._videos: Dict[str, str] = {}
+        self._scanned_at: Optional[float] = None
+        self._data_dir_mtime: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _data_dir_signature(self) -> Optional[int]:
+        try:
+            return os.stat(self.data_dir).st_mtime_ns
+        except OSError:
+            return None
+
+    def refresh(self) -> Dict[str, str]:
+        """
+        Rescan the data directory.
+
+        A camera directory's {cctv_id}.mp4 is preferred, otherwise its first
+        video file in name order is used.
+
+        Returns:
+            dict: Video file path by camera id
+        """
+        videos = {}
+        data_dir_mtime = self._data_dir_signature()
+        scanned_at = time.monotonic()
+        for camera_dir in sorted(glob.glob(os.path.join(self.data_dir, 'cctv_*'))):
+            cctv_id = os.path.basename(camera_dir)
+            if not CCTV_ID_PATTERN.match(cctv_id) or not os.path.isdir(camera_dir):
+                continue
+            names = sorted(name for name in os.listdir(camera_dir) if name.lower().endswith(self.extensions))
+            preferred = [name for name in names if os.path.splitext(name)[0] == cctv_id]
+            if preferred or names:
+                videos[cctv_id] = os.path.join(camera_dir, (preferred or names)[0])
+        with self._lock:
+            self._videos = videos
+            self._scanned_at = scanned_at
+            self._data_dir_mtime = data_dir_mtime
+        return videos
+
+    def _rescan_due(self) -> bool:
+        with self._lock:
+            scanned_at, data_dir_mtime = self._scanned_at, self._data_dir_mtime
+        return (scanned_at is None or time.monotonic() - scanned_at >= self.rescan_interval
+                or self._data_dir_signature() != data_dir_mtime)
+
+    def get(self, cctv_id: str) -> Optional[str]:
+        """Get the path of a camera's video file, None if it has none"""
+        if not CCTV_ID_PATTERN.match(cctv_id):
+            return None
+        path = self._videos.get(cctv_id)
+        if path is not None and os.path.isfile(path):
+            return path
+        if not self._rescan_due():
+            return None
+        return self.refresh().get(cctv_id)
+
+cctv_videos = CctvVideoIndex()
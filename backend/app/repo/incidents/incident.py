@@ -0,0 +1,387 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import settings
+from repo.json_store import JsonDocument, get_document
+from utils.pagination import paginate
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+INCIDENTS_DIR = os.path.dirname(os.path.abspath(__file__))
+# Snapshot of every incident, rewritten when the log is compacted
+INCIDENTS_FILE = os.path.join(INCIDENTS_DIR, "incidents.json")
+# Append-only log of mutations made since the snapshot, one JSON line each
+INCIDENTS_LOG_FILE = os.path.join(INCIDENTS_DIR, "incidents.log")
+# Number of logged mutations after which the log is folded into the snapshot
+COMPACT_AFTER = 500
+
+# Number of distinct query() results kept between changes
+QUERY_CACHE_SIZE = 64
+
+# Incident lists in the order they are returned
+STATUSES = ("reported", "assigned", "resolved")
+
+class IncidentJournal:
+    """
+    Incident storage built from a snapshot plus an append-only mutation log.
+
+    Every create/update/delete appends a single JSON line to the log, so the
+    cost of a mutation does not grow with the incident history. Incidents are
+    kept in memory, indexed by id, by status (in stored order), by priority
+    and by zone, and rebuilt from the snapshot and the log on first use. Once
+    the log holds COMPACT_AFTER records it is folded into a new snapshot and
+    truncated. Counts per status, priority and type, and per zone and
+    status, are maintained on every mutation so statistics never rescan.
+
+    Other worker processes appending to the same log are picked up by
+    replaying the log from the last offset read. Appends and compaction hold
+    an exclusive lock on the log file so they never interleave.
+
+    Incident dicts are replaced rather than mutated, so callers must treat
+    everything returned by the journal as read-only.
+    """
+
+    def __init__(self, snapshot_path: str, log_path: str, compact_after: int = COMPACT_AFTER):
+        self.snapshot = get_document(snapshot_path)
+        self.log_path = log_path
+        self.compact_after = compact_after
+        self._snapshot_generation = None
+        self._log_offset = 0
+        self._log_records = 0
+        self._lock = threading.RLock()
+        # Bumped on every change, query results are reused until it moves
+        self._generation = 0
+        self._queries: Dict[tuple, List[dict]] = {}
+        self._queries_generation = 0
+        self._reset()
+
+    def _reset(self):
+        self._generation += 1
+        self._by_id: Dict[int, dict] = {}
+        # status -> ids in stored order, dicts are used as ordered sets
+        self._by_status: Dict[str, Dict[int, None]] = {status: {} for status in STATUSES}
+        self._by_priority: Dict[Optional[str], Set[int]] = {}
+        self._by_zone: Dict[Optional[int], Set[int]] = {}
+        # (status, priority, type) -> count and (zone_id, status) -> count
+        self._counts: Dict[Tuple[str, Optional[str], Optional[str]], int] = {}
+        self._zone_counts: Dict[Tuple[Optional[int], str], int] = {}
+        # id -> when the incident entered its current status, to merge indexes in stored order
+        self._order: Dict[int, int] = {}
+        self._order_counter = 0
+        # Ids are never reused, even after the highest incident is deleted
+        self._next_id = 1
+
+    @contextmanager
+    def _open_log(self, exclusive: bool):
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        with open(self.log_path, 'a+b') as log:
+            if fcntl is not None:
+                fcntl.flock(log.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield log
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(log.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _count_keys(incident: dict) -> Tuple[tuple, tuple]:
+        status = incident["status"].lower()
+        return ((status, incident.get("incident_priority"), incident.get("incident_type")),
+                (incident.get("zone_id"), status))
+
+    @staticmethod
+    def _bump(counts: dict, key: tuple, delta: int):
+        count = counts.get(key, 0) + delta
+        if count:
+            counts[key] = count
+        else:
+            del counts[key]
+
+    def _index(self, incident: dict):
+        self._by_priority.setdefault(incident.get("incident_priority"), set()).add(incident["id"])
+        self._by_zone.setdefault(incident.get("zone_id"), set()).add(incident["id"])
+        key, zone_key = self._count_keys(incident)
+        self._bump(self._counts, key, 1)
+        self._bump(self._zone_counts, zone_key, 1)
+
+    def _unindex(self, incident: dict):
+        self._by_priority.get(incident.get("incident_priority"), set()).discard(incident["id"])
+        self._by_zone.get(incident.get("zone_id"), set()).discard(incident["id"])
+        key, zone_key = self._count_keys(incident)
+        self._bump(self._counts, key, -1)
+        self._bump(self._zone_counts, zone_key, -1)
+
+    def _apply(self, record: dict):
+        self._generation += 1
+        if record["op"] == "put":
+            incident = record["incident"]
+            incident_id = incident["id"]
+            status = incident["status"].lower()
+            current = self._by_id.get(incident_id)
+            current_status = None
+            if current is not None:
+                self._unindex(current)
+                current_status = current["status"].lower()
+            if current_status != status:
+                if current_status is not None:
+                    del self._by_status[current_status][incident_id]
+                # Moved incidents go to the end of their new status list
+                self._by_status[status][incident_id] = None
+                self._order_counter += 1
+                self._order[incident_id] = self._order_counter
+            self._by_id[incident_id] = incident
+            self._index(incident)
+            self._next_id = max(self._next_id, incident_id + 1)
+        elif record["op"] == "delete":
+            current = self._by_id.pop(record["id"], None)
+            if current is not None:
+                self._unindex(current)
+                del self._by_status[current["status"].lower()][record["id"]]
+                del self._order[record["id"]]
+
+    def _replay(self, log):
+        log.seek(self._log_offset)
+        chunk = log.read()
+        # Only consume complete lines, another writer may be mid-append
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+                self._log_records += 1
+        self._log_offset += end
+
+    def _load(self, log):
+        data = self.snapshot.read()
+        if data is None:
+            data = {status: [] for status in STATUSES}
+            self.snapshot.write(data)
+        self._reset()
+        for status in STATUSES:
+            for incident in data.get(status, []):
+                self._apply({"op": "put", "incident": incident})
+        self._next_id = max(self._next_id, data.get("next_id", 1))
+        self._snapshot_generation = self.snapshot.generation
+        self._log_offset = 0
+        self._log_records = 0
+        self._replay(log)
+
+    def _sync(self, log):
+        self.snapshot.read()
+        if self._snapshot_generation != self.snapshot.generation:
+            self._load(log)
+            return
+        size = os.fstat(log.fileno()).st_size
+        if size < self._log_offset:
+            self._load(log)
+        elif size > self._log_offset:
+            self._replay(log)
+
+    def _is_stale(self) -> bool:
+        self.snapshot.read()
+        if self._snapshot_generation != self.snapshot.generation:
+            return True
+        try:
+            return os.stat(self.log_path).st_size != self._log_offset
+        except FileNotFoundError:
+            return self._log_offset != 0
+
+    def _refresh(self):
+        if self._snapshot_generation is None or self._is_stale():
+            with self._open_log(exclusive=False) as log:
+                self._sync(log)
+
+    def _append(self, record: dict, assign_id: bool = False) -> dict:
+        with self._lock, self._open_log(exclusive=True) as log:
+            self._sync(log)
+            if assign_id:
+                # Under the exclusive lock and after replaying other writers, so the id is unique
+                incident = {key: value for key, value in record["incident"].items() if key != "id"}
+                record = {**record, "incident": {"id": self._next_id, **incident}}
+            line = (json.dumps(record) + "\n").encode()
+            log.write(line)
+            log.flush()
+            self._apply(record)
+            self._log_offset += len(line)
+            self._log_records += 1
+            if self._log_records >= self.compact_after:
+                self._compact(log)
+            return record
+
+    def _list(self, status: str) -> List[dict]:
+        return [self._by_id[incident_id] for incident_id in self._by_status[status]]
+
+    def _compact(self, log):
+        snapshot = {status: self._list(status) for status in STATUSES}
+        snapshot["next_id"] = self._next_id
+        self.snapshot.write(snapshot)
+        log.truncate(0)
+        self._snapshot_generation = self.snapshot.generation
+        self._log_offset = 0
+        self._log_records = 0
+
+    def view(self) -> Dict[str, List[dict]]:
+        """
+        Get the current incidents grouped by status.
+
+        Returns:
+            dict: status -> list of incidents, read-only
+        """
+        with self._lock:
+            self._refresh()
+            return {status: self._list(status) for status in STATUSES}
+
+    def query(self, status: Optional[str] = None, priority: Optional[str] = None,
+              incident_type: Optional[str] = None, zone_id: Optional[int] = None) -> List[dict]:
+        """
+        Get incidents matching the given status, priority, type and zone.
+
+        The smallest matching status, priority or zone index is scanned, so
+        selective queries do not touch every incident. Results are kept until
+        the next change, so paging through a query reuses the same list.
+
+        Returns:
+            list: Matching incidents, reported first, then assigned, then resolved
+        """
+        with self._lock:
+            self._refresh()
+            if self._queries_generation != self._generation or len(self._queries) >= QUERY_CACHE_SIZE:
+                self._queries.clear()
+                self._queries_generation = self._generation
+            query = (status, priority, incident_type, zone_id)
+            matches = self._queries.get(query)
+            if matches is None:
+                matches = self._queries[query] = self._query(*query)
+            return matches
+
+    def page(self, status: Optional[str] = None, priority: Optional[str] = None,
+             zone_id: Optional[int] = None, limit: Optional[int] = None,
+             after: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Get a page of query() results.
+
+        Returns:
+            tuple: (incidents, cursor of the next page or None on the last page)
+        """
+        return paginate(self.query(status, priority, zone_id=zone_id), limit, after)
+
+    def _query(self, status: Optional[str], priority: Optional[str],
+               incident_type: Optional[str], zone_id: Optional[int]) -> List[dict]:
+        candidates = None
+        if status is not None:
+            candidates = self._by_status.get(status, {})
+        for index, key in ((self._by_priority, priority), (self._by_zone, zone_id)):
+            if key is not None:
+                ids = index.get(key, set())
+                if candidates is None or len(ids) < len(candidates):
+                    candidates = ids
+
+        if candidates is None:
+            ordered = [incident_id for status_key in STATUSES for incident_id in self._by_status[status_key]]
+        elif status is not None and candidates is self._by_status.get(status):
+            ordered = list(candidates)
+        else:
+            rank = {status_key: position for position, status_key in enumerate(STATUSES)}
+            ordered = sorted(candidates, key=lambda incident_id: (
+                rank[self._by_id[incident_id]["status"].lower()], self._order[incident_id]))
+
+        matches = []
+        for incident_id in ordered:
+            incident = self._by_id[incident_id]
+            if status is not None and incident["status"].lower() != status:
+                continue
+            if priority is not None and incident.get("incident_priority") != priority:
+                continue
+            if incident_type is not None and incident.get("incident_type") != incident_type:
+                continue
+            if zone_id is not None and incident.get("zone_id") != zone_id:
+                continue
+            matches.append(incident)
+        return matches
+
+    def get(self, incident_id: int) -> Optional[dict]:
+        """Get an incident by id"""
+        with self._lock:
+            self._refresh()
+            return self._by_id.get(incident_id)
+
+    def next_id(self) -> int:
+        """Get the next incident id from the monotonic id sequence, use create() to take it"""
+        with self._lock:
+            self._refresh()
+            return self._next_id
+
+    def counts(self) -> Dict[Tuple[str, Optional[str], Optional[str]], int]:
+        """Get the maintained number of incidents per (status, priority, type)"""
+        with self._lock:
+            self._refresh()
+            return dict(self._counts)
+
+    def zone_counts(self) -> Dict[Tuple[Optional[int], str], int]:
+        """Get the maintained number of incidents per (zone_id, status)"""
+        with self._lock:
+            self._refresh()
+            return dict(self._zone_counts)
+
+    def check_counts(self) -> bool:
+        """
+        Compare the maintained state against a rebuild from the files, reloading it on a mismatch.
+
+        The snapshot is parsed again from disk and the whole log replayed into
+        a separate journal, so drift between the in-memory indexes and what
+        the snapshot and log actually hold is detected.
+
+        Returns:
+            bool: True if the counts and incidents matched the files
+        """
+        with self._lock, self._open_log(exclusive=False) as log:
+            self._sync(log)
+            rebuilt = IncidentJournal(self.snapshot.path, self.log_path, self.compact_after)
+            # A private document, the shared one may hold a parsed copy that drifted from the file
+            rebuilt.snapshot = JsonDocument(self.snapshot.path)
+            rebuilt._load(log)
+            consistent = (rebuilt._counts == self._counts and rebuilt._zone_counts == self._zone_counts
+                          and rebuilt._by_id == self._by_id)
+            if not consistent:
+                self._load(log)
+            return consistent
+
+    def create(self, incident: dict) -> dict:
+        """
+        Store a new incident under the next id of the monotonic id sequence.
+
+        The id is taken while the log is exclusively locked, after replaying
+        what other workers appended, so concurrent creators never share an id.
+
+        Returns:
+            dict: The stored incident with its id
+        """
+        return self._append({"op": "put", "incident": incident}, assign_id=True)["incident"]
+
+    def put(self, incident: dict):
+        """Create or replace an incident, moving it if its status changed"""
+        self._append({"op": "put", "incident": incident})
+
+    def delete(self, incident_id: int):
+        """Delete an incident"""
+        self._append({"op": "delete", "id": incident_id})
+
+    def compact(self):
+        """Fold the log into a new snapshot now"""
+        with self._lock, self._open_log(exclusive=True) as log:
+            self._sync(log)
+            self._compact(log)
+
+incident_journal = IncidentJournal(INCIDENTS_FILE, INCIDENTS_LOG_FILE)
+
+# Incident storage used by the routers, selected by STORAGE_BACKEND
+if settings.storage_backend == "sqlite":
+    from repo.sqlite_store import SqliteIncidentStore
+    incident_store = SqliteIncidentStore()
+else:
+    incident_store = incident_journal
@@ -0,0 +1,66 @@
+import multiprocessing
+
+import pytest
+
+from repo.incidents.incident import STATUSES, IncidentJournal, fcntl
+
+
+def make_journal(tmp_path, compact_after=3) -> IncidentJournal:
+    return IncidentJournal(str(tmp_path / "incidents.json"), str(tmp_path / "incidents.log"), compact_after)
+
+def make_incident(status="REPORTED", priority="CRITICAL", zone_id=1) -> dict:
+    return {"status": status, "incident_priority": priority, "incident_type": "CROWD OVERFLOW", "zone_id": zone_id}
+
+def test_replay_after_compaction(tmp_path):
+    journal = make_journal(tmp_path)
+    created = [journal.create(make_incident(zone_id=i % 2)) for i in range(5)]
+    journal.put({**created[1], "status": "ASSIGNED"})
+    journal.delete(created[4]["id"])
+    journal.put({**created[2], "status": "RESOLVED"})
+
+    # Eight records with compaction every three leave two in the log
+    with open(tmp_path / "incidents.log") as log:
+        assert len(log.read().splitlines()) == 2
+
+    reopened = make_journal(tmp_path)
+    assert reopened.view() == journal.view()
+    assert [incident["id"] for incident in reopened.view()["reported"]] == [1, 4]
+    assert reopened.counts() == journal.counts()
+    assert reopened.zone_counts() == journal.zone_counts()
+    assert reopened.check_counts()
+
+def test_ids_are_not_reused_after_compaction(tmp_path):
+    journal = make_journal(tmp_path)
+    for _ in range(3):
+        journal.create(make_incident())
+    journal.delete(3)
+    journal.compact()
+
+    assert make_journal(tmp_path).create(make_incident())["id"] == 4
+
+def test_replays_writes_of_another_journal(tmp_path):
+    first, second = make_journal(tmp_path), make_journal(tmp_path)
+    first.create(make_incident())
+    assert second.get(1) is not None
+
+    # Enough writes from the other journal to compact the log under the first one
+    for _ in range(4):
+        second.create(make_incident(priority="GENERAL"))
+    assert first.view() == second.view()
+    assert first.create(make_incident())["id"] == 6
+
+def create_many(args):
+    directory, count = args
+    journal = IncidentJournal(f"{directory}/incidents.json", f"{directory}/incidents.log", 7)
+    return [journal.create(make_incident())["id"] for _ in range(count)]
+
+@pytest.mark.skipif(fcntl is None, reason="the log is only locked across processes where fcntl exists")
+def test_concurrent_creates_get_distinct_ids(tmp_path):
+    make_journal(tmp_path).view()
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        ids = [incident_id for batch in pool.map(create_many, [(str(tmp_path), 25)] * 4) for incident_id in batch]
+
+    assert sorted(ids) == list(range(1, 101))
+    journal = make_journal(tmp_path)
+    assert sum(len(journal.view()[status]) for status in STATUSES) == 100
+    assert journal.next_id() == 101
@@ -0,0 +1,110 @@
+import copy
+import json
+import os
+import stat
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+class JsonDocument:
+    """
+    A JSON file kept parsed in memory.
+
+    The file is only re-read when its mtime or size changes, so polling
+    endpoints are served from memory instead of re-parsing the file on every
+    request. read() hands out the shared parsed document, which callers must
+    treat as read-only; read-modify-write cycles should start from copy().
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self.generation = 0
+        self._data = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def _stat(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def read(self) -> Any:
+        """
+        Get the parsed document, reloading it if the file changed on disk.
+
+        Returns:
+            Any: The shared parsed document or None if the file does not exist
+        """
+        signature = self._stat()
+        if signature is not None and signature == self._signature:
+            return self._data
+
+        with self._lock:
+            try:
+                with open(self.path, 'r') as file:
+                    stat = os.fstat(file.fileno())
+                    signature = (stat.st_mtime_ns, stat.st_size)
+                    if signature != self._signature:
+                        self._data = json.load(file)
+                        self._signature = signature
+                        self.generation += 1
+            except FileNotFoundError:
+                self._data = None
+                self._signature = None
+                return None
+            return self._data
+
+    def copy(self) -> Any:
+        """Get a private deep copy of the document for read-modify-write cycles"""
+        return copy.deepcopy(self.read())
+
+    def write(self, data: Any):
+        """
+        Persist the document and make it the cached version.
+
+        The file is written to a uniquely named temporary sibling and moved
+        into place, so concurrent readers never observe a half-written file
+        and writers in other processes never share a temporary file.
+        """
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(self.path)}.tmp-")
+            try:
+                with os.fdopen(fd, 'w') as file:
+                    json.dump(data, file, indent=2)
+                # mkstemp creates the file private, keep the document's permissions
+                try:
+                    mode = stat.S_IMODE(os.stat(self.path).st_mode)
+                except FileNotFoundError:
+                    mode = 0o644
+                os.chmod(tmp_path, mode)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except FileNotFoundError:
+                    pass
+                raise
+            self._data = data
+            self._signature = self._stat()
+            self.generation += 1
+
+_documents: Dict[str, JsonDocument] = {}
+_documents_lock = threading.Lock()
+
+def get_document(path: str) -> JsonDocument:
+    """
+    Get the shared document for a JSON file.
+
+    Every caller asking for the same file gets the same JsonDocument, so a
+    file used by several routers is parsed once per change.
+    """
+    key = os.path.abspath(path)
+    with _documents_lock:
+        document = _documents.get(key)
+        if document is None:
+            document = _documents[key] = JsonDocument(key)
+        return document
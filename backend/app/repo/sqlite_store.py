@@ -0,0 +1,551 @@
+import copy
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+from utils.pagination import decode_cursor, encode_cursor
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# JSON documents stored whole in the documents table, keyed by name
+DOCUMENT_FILES = {
+    "zones": os.path.join(REPO_DIR, "zones", "zones.json"),
+    "events": os.path.join(REPO_DIR, "events", "events.json"),
+    "emergency": os.path.join(REPO_DIR, "emergency", "emergency.json"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    user_type TEXT NOT NULL,
+    role TEXT,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_type_seq ON users (user_type, seq);
+CREATE INDEX IF NOT EXISTS users_role ON users (role);
+-- Staff are matched to zones by name in StaffZoneIndex, older databases carry an unused zone column
+DROP INDEX IF EXISTS users_zone;
+CREATE TABLE IF NOT EXISTS incidents (
+    id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL,
+    priority TEXT,
+    type TEXT,
+    zone_id INTEGER,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS incidents_status_seq ON incidents (status, seq);
+CREATE INDEX IF NOT EXISTS incidents_priority ON incidents (priority);
+CREATE INDEX IF NOT EXISTS incidents_zone ON incidents (zone_id);
+CREATE INDEX IF NOT EXISTS incidents_seq ON incidents (seq);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS incident_counts (
+    status TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    type TEXT NOT NULL,
+    zone_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (status, priority, type, zone_id)
+);
+"""
+
+# Keep incident_counts in step with the incidents table. NULL priorities,
+# types and zones are stored as '' and -1 so they can be part of the key.
+_COUNT_DELTA = """
+    INSERT INTO incident_counts (status, priority, type, zone_id, count)
+    VALUES ({row}.status, COALESCE({row}.priority, ''), COALESCE({row}.type, ''), COALESCE({row}.zone_id, -1), {delta})
+    ON CONFLICT (status, priority, type, zone_id) DO UPDATE SET count = count + {delta};
+"""
+SCHEMA += f"""
+CREATE TRIGGER IF NOT EXISTS incidents_count_insert AFTER INSERT ON incidents BEGIN
+{_COUNT_DELTA.format(row="NEW", delta=1)}
+END;
+CREATE TRIGGER IF NOT EXISTS incidents_count_delete AFTER DELETE ON incidents BEGIN
+{_COUNT_DELTA.format(row="OLD", delta=-1)}
+END;
+CREATE TRIGGER IF NOT EXISTS incidents_count_update AFTER UPDATE OF status, priority, type, zone_id ON incidents BEGIN
+{_COUNT_DELTA.format(row="OLD", delta=-1)}
+{_COUNT_DELTA.format(row="NEW", delta=1)}
+END;
+"""
+
+_RECOUNT = (
+    "SELECT status, COALESCE(priority, ''), COALESCE(type, ''), COALESCE(zone_id, -1), COUNT(*) "
+    "FROM incidents GROUP BY 1, 2, 3, 4"
+)
+
+# Next incident id, past both the highest id ever handed out and the highest stored
+_NEXT_INCIDENT_ID = (
+    "SELECT MAX(COALESCE((SELECT value FROM counters WHERE name = 'incident_id'), 0), "
+    "COALESCE((SELECT MAX(id) FROM incidents), 0)) + 1"
+)
+
+# Incidents are listed reported, assigned, resolved, then in stored order
+INCIDENT_ORDER = "CASE status WHEN 'reported' THEN 0 WHEN 'assigned' THEN 1 ELSE 2 END, seq"
+
+_local = threading.local()
+
+def get_connection(path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Get this thread's connection to the SQLite database.
+
+    Connections are opened in WAL mode so readers never block the writer,
+    and the schema is created on first use.
+    """
+    path = os.path.abspath(path or settings.sqlite_path)
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    connection = connections.get(path)
+    if connection is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Autocommit, writes open their own transactions via _transaction()
+        connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        connections[path] = connection
+    return connection
+
+@contextmanager
+def _transaction(connection: sqlite3.Connection):
+    # Take the write lock up front so read-then-write sequences never race
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+def _upsert_document(connection: sqlite3.Connection, name: str, data: Any):
+    connection.execute(
+        "INSERT INTO documents (name, version, data) VALUES (?, 1, ?) "
+        "ON CONFLICT(name) DO UPDATE SET version = documents.version + 1, data = excluded.data",
+        (name, json.dumps(data)),
+    )
+
+class SqliteDocument:
+    """
+    A JSON document stored in the documents table.
+
+    Drop-in replacement for JsonDocument: the parsed document is cached and
+    only re-read when its version in the database changes.
+    """
+
+    def __init__(self, name: str, path: Optional[str] = None):
+        self.name = name
+        self.path = path
+        self.generation = 0
+        self._data = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def read(self) -> Any:
+        """
+        Get the parsed document, reloading it if another writer changed it.
+
+        Returns:
+            Any: The shared parsed document or None if it does not exist
+        """
+        connection = get_connection(self.path)
+        row = connection.execute("SELECT version FROM documents WHERE name = ?", (self.name,)).fetchone()
+        if row is None:
+            self._data = None
+            self._version = None
+            return None
+        if row[0] == self._version:
+            return self._data
+
+        with self._lock:
+            row = connection.execute("SELECT version, data FROM documents WHERE name = ?", (self.name,)).fetchone()
+            if row is None:
+                return None
+            if row[0] != self._version:
+                self._data = json.loads(row[1])
+                self._version = row[0]
+                self.generation += 1
+            return self._data
+
+    def copy(self) -> Any:
+        """Get a private deep copy of the document for read-modify-write cycles"""
+        return copy.deepcopy(self.read())
+
+    def write(self, data: Any):
+        """Persist the document and make it the cached version"""
+        connection = get_connection(self.path)
+        with self._lock:
+            with _transaction(connection):
+                _upsert_document(connection, self.name, data)
+                version = connection.execute("SELECT version FROM documents WHERE name = ?", (self.name,)).fetchone()[0]
+            self._data = data
+            self._version = version
+            self.generation += 1
+
+_documents: Dict[str, SqliteDocument] = {}
+_documents_lock = threading.Lock()
+
+def get_sqlite_document(name: str) -> SqliteDocument:
+    """Get the shared SqliteDocument for a document name"""
+    with _documents_lock:
+        document = _documents.get(name)
+        if document is None:
+            document = _documents[name] = SqliteDocument(name)
+        return document
+
+def _advance_counter(connection: sqlite3.Connection, name: str, value: int):
+    connection.execute(
+        "INSERT INTO counters (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = MAX(counters.value, excluded.value)",
+        (name, value),
+    )
+
+def _bump_counter(connection: sqlite3.Connection, name: str):
+    connection.execute(
+        "INSERT INTO counters (name, value) VALUES (?, 1) "
+        "ON CONFLICT(name) DO UPDATE SET value = counters.value + 1",
+        (name,),
+    )
+
+def _incident_row(incident: dict) -> tuple:
+    return (
+        incident["id"],
+        incident["status"].lower(),
+        incident.get("incident_priority"),
+        incident.get("incident_type"),
+        incident.get("zone_id"),
+        json.dumps(incident),
+    )
+
+def _page(connection: sqlite3.Connection, table: str, key_column: str, order: str, clauses: List[str],
+          params: List[Any], limit: Optional[int], after: Optional[str]) -> Tuple[List[dict], Optional[str]]:
+    """
+    Keyset page of a table's rows in `order`, with cursors like utils.pagination.paginate().
+
+    The page resumes after the cursor's row with a `(order) > (order of that
+    row)` condition, so the database seeks straight to it; only when that row
+    was deleted does it fall back to the cursor's position as an offset.
+    """
+    clauses, params = list(clauses), list(params)
+    start = 0
+    offset = 0
+    if after:
+        position, last_key = decode_cursor(after)
+        last = connection.execute(f"SELECT {order} FROM {table} WHERE {key_column} = ?", (last_key,)).fetchone()
+        if last is not None:
+            start = position + 1
+            clauses.append(f"({order}) > ({', '.join('?' * len(last))})")
+            params.extend(last)
+        else:
+            start = offset = max(position, 0)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    # One row past the page tells whether there is a next one
+    rows = connection.execute(
+        f"SELECT {key_column}, data FROM {table} {where} ORDER BY {order} LIMIT ? OFFSET ?",
+        params + [-1 if limit is None else limit + 1, offset]
+    ).fetchall()
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(start + limit - 1, rows[-1][0])
+    else:
+        next_cursor = None
+    return [json.loads(row[1]) for row in rows], next_cursor
+
+class SqliteIncidentStore:
+    """
+    Incident storage in the incidents table.
+
+    Same interface as IncidentJournal; filters and counts run as indexed
+    SQL queries instead of scans over every incident.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+
+    @staticmethod
+    def _filters(status, priority, incident_type, zone_id) -> Tuple[List[str], List[Any]]:
+        clauses, params = [], []
+        for column, value in (("status", status), ("priority", priority), ("type", incident_type), ("zone_id", zone_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return clauses, params
+
+    def query(self, status: Optional[str] = None, priority: Optional[str] = None,
+              incident_type: Optional[str] = None, zone_id: Optional[int] = None) -> List[dict]:
+        """Get incidents matching the given status, priority, type and zone"""
+        clauses, params = self._filters(status, priority, incident_type, zone_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = get_connection(self.path).execute(
+            f"SELECT data FROM incidents {where} ORDER BY {INCIDENT_ORDER}", params
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def page(self, status: Optional[str] = None, priority: Optional[str] = None,
+             zone_id: Optional[int] = None, limit: Optional[int] = None,
+             after: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Get a page of query() results, paged by the database with a keyset query.
+
+        Returns:
+            tuple: (incidents, cursor of the next page or None on the last page)
+        """
+        clauses, params = self._filters(status, priority, None, zone_id)
+        return _page(get_connection(self.path), "incidents", "id", INCIDENT_ORDER, clauses, params, limit, after)
+
+    def get(self, incident_id: int) -> Optional[dict]:
+        """Get an incident by id"""
+        row = get_connection(self.path).execute(
+            "SELECT data FROM incidents WHERE id = ?", (incident_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def next_id(self) -> int:
+        """Get the next incident id, ids are never reused even after deletes; use create() to take it"""
+        return get_connection(self.path).execute(_NEXT_INCIDENT_ID).fetchone()[0]
+
+    def _counts(self, key) -> dict:
+        counts = {}
+        rows = get_connection(self.path).execute(
+            "SELECT status, priority, type, zone_id, count FROM incident_counts WHERE count != 0"
+        )
+        for status, priority, incident_type, zone_id, count in rows:
+            group = key(status, priority or None, incident_type or None, None if zone_id == -1 else zone_id)
+            counts[group] = counts.get(group, 0) + count
+        return counts
+
+    def counts(self) -> Dict[Tuple[str, Optional[str], Optional[str]], int]:
+        """Get the maintained number of incidents per (status, priority, type)"""
+        return self._counts(lambda status, priority, incident_type, zone_id: (status, priority, incident_type))
+
+    def zone_counts(self) -> Dict[Tuple[Optional[int], str], int]:
+        """Get the maintained number of incidents per (zone_id, status)"""
+        return self._counts(lambda status, priority, incident_type, zone_id: (zone_id, status))
+
+    def check_counts(self) -> bool:
+        """
+        Compare the maintained counts against a full recount, repairing them on a mismatch.
+
+        Returns:
+            bool: True if the counts were consistent
+        """
+        connection = get_connection(self.path)
+        with _transaction(connection):
+            recount = {row[:4]: row[4] for row in connection.execute(_RECOUNT)}
+            counts = {row[:4]: row[4] for row in connection.execute(
+                "SELECT status, priority, type, zone_id, count FROM incident_counts WHERE count != 0"
+            )}
+            if counts == recount:
+                return True
+            connection.execute("DELETE FROM incident_counts")
+            connection.execute(f"INSERT INTO incident_counts (status, priority, type, zone_id, count) {_RECOUNT}")
+            return False
+
+    @staticmethod
+    def _put(connection: sqlite3.Connection, incident: dict):
+        seq = connection.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM incidents").fetchone()[0]
+        connection.execute(
+            "INSERT INTO incidents (id, status, priority, type, zone_id, data, seq) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET "
+            "seq = CASE WHEN incidents.status = excluded.status THEN incidents.seq ELSE excluded.seq END, "
+            "status = excluded.status, priority = excluded.priority, type = excluded.type, "
+            "zone_id = excluded.zone_id, data = excluded.data",
+            _incident_row(incident) + (seq,),
+        )
+        _advance_counter(connection, "incident_id", incident["id"])
+
+    def create(self, incident: dict) -> dict:
+        """
+        Store a new incident under the next id, taken in the same transaction as the insert.
+
+        Returns:
+            dict: The stored incident with its id
+        """
+        connection = get_connection(self.path)
+        with _transaction(connection):
+            incident_id = connection.execute(_NEXT_INCIDENT_ID).fetchone()[0]
+            incident = {"id": incident_id, **{key: value for key, value in incident.items() if key != "id"}}
+            self._put(connection, incident)
+        return incident
+
+    def put(self, incident: dict):
+        """Create or replace an incident, moving it to the end if its status changed"""
+        connection = get_connection(self.path)
+        with _transaction(connection):
+            self._put(connection, incident)
+
+    def delete(self, incident_id: int):
+        """Delete an incident"""
+        connection = get_connection(self.path)
+        with _transaction(connection):
+            connection.execute("DELETE FROM incidents WHERE id = ?", (incident_id,))
+
+def _user_row(record: dict) -> tuple:
+    return (
+        record.get("username"),
+        record.get("role"),
+        json.dumps(record),
+    )
+
+class SqliteUserStore:
+    """
+    User storage in the users table.
+
+    Same interface as JsonUserStore, with lookups by username, type and
+    role answered by indexed SQL queries.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+
+    def get(self, username: str) -> Optional[Tuple[str, dict]]:
+        """Get (user_type, record) for a username"""
+        row = get_connection(self.path).execute(
+            "SELECT user_type, data FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def query(self, user_type: str, role: Optional[str] = None) -> List[dict]:
+        """Get the users of a type, optionally only those with a role"""
+        sql = "SELECT data FROM users WHERE user_type = ?"
+        params = [user_type]
+        if role is not None:
+            sql += " AND role = ?"
+            params.append(role)
+        rows = get_connection(self.path).execute(f"{sql} ORDER BY seq", params)
+        return [json.loads(row[0]) for row in rows]
+
+    def page(self, user_type: str, limit: Optional[int] = None,
+             after: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Get a page of the users of a type, paged by the database with a keyset query.
+
+        Returns:
+            tuple: (users, cursor of the next page or None on the last page)
+        """
+        return _page(get_connection(self.path), "users", "username", "seq",
+                     ["user_type = ?"], [user_type], limit, after)
+
+    def version(self) -> int:
+        """Get a number that changes whenever the users are written"""
+        row = get_connection(self.path).execute("SELECT value FROM counters WHERE name = 'users'").fetchone()
+        return row[0] if row else 0
+
+    def add(self, user_type: str, record: dict):
+        """Add a user at the end of its type's list"""
+        connection = get_connection(self.path)
+        with _transaction(connection):
+            seq = connection.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM users").fetchone()[0]
+            username, role, data = _user_row(record)
+            connection.execute(
+                "INSERT INTO users (username, user_type, role, seq, data) VALUES (?, ?, ?, ?, ?)",
+                (username, user_type, role, seq, data),
+            )
+            _bump_counter(connection, "users")
+
+    def update(self, username: str, record: dict):
+        """Replace a user's record in place, the record may carry a new username"""
+        connection = get_connection(self.path)
+        with _transaction(connection):
+            cursor = connection.execute(
+                "UPDATE users SET username = ?, role = ?, data = ? WHERE username = ?",
+                _user_row(record) + (username,),
+            )
+            if cursor.rowcount == 0:
+                raise KeyError(username)
+            _bump_counter(connection, "users")
+
+    def remove(self, username: str):
+        """Remove a user"""
+        connection = get_connection(self.path)
+        with _transaction(connection):
+            connection.execute("DELETE FROM users WHERE username = ?", (username,))
+            _bump_counter(connection, "users")
+
+def unmigrated_json_files(path: Optional[str] = None) -> List[str]:
+    """
+    Find JSON repository files that were never migrated into the database.
+
+    Returns:
+        list: Paths of existing JSON documents when the documents table is empty
+    """
+    if get_connection(path).execute("SELECT 1 FROM documents LIMIT 1").fetchone():
+        return []
+    return [file_path for file_path in DOCUMENT_FILES.values() if os.path.exists(file_path)]
+
+def migrate_from_json(path: Optional[str] = None) -> Dict[str, int]:
+    """
+    Copy the JSON repository into the SQLite database.
+
+    Users and incidents already in the database are replaced; documents are
+    overwritten. Safe to run again, e.g. after editing the JSON files by hand.
+
+    Returns:
+        dict: Number of migrated rows per table
+    """
+    from repo.json_store import get_document
+    from repo.users.user import USERS_FILE, USER_TYPES
+    from repo.incidents.incident import IncidentJournal, INCIDENTS_FILE, INCIDENTS_LOG_FILE, STATUSES
+
+    users = get_document(USERS_FILE).read() or {}
+    # Read the incident snapshot together with any unfolded log entries
+    journal = IncidentJournal(INCIDENTS_FILE, INCIDENTS_LOG_FILE)
+    incidents = journal.view()
+    migrated = {"documents": 0, "users": 0, "incidents": 0}
+
+    connection = get_connection(path)
+    with _transaction(connection):
+        for name, file_path in DOCUMENT_FILES.items():
+            data = get_document(file_path).read()
+            if data is not None:
+                _upsert_document(connection, name, data)
+                migrated["documents"] += 1
+
+        connection.execute("DELETE FROM users")
+        _bump_counter(connection, "users")
+        seq = 0
+        for user_type in USER_TYPES:
+            for record in users.get(user_type, []):
+                seq += 1
+                username, role, data = _user_row(record)
+                # Earlier user types win on duplicate usernames, as in lookups
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO users (username, user_type, role, seq, data) VALUES (?, ?, ?, ?, ?)",
+                    (username, user_type, role, seq, data),
+                )
+                migrated["users"] += cursor.rowcount
+
+        connection.execute("DELETE FROM incidents")
+        connection.execute("DELETE FROM incident_counts")
+        seq = 0
+        for status in STATUSES:
+            for incident in incidents[status]:
+                seq += 1
+                connection.execute(
+                    "INSERT OR REPLACE INTO incidents (id, status, priority, type, zone_id, data, seq) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    _incident_row(incident) + (seq,),
+                )
+                migrated["incidents"] += 1
+        connection.execute("DELETE FROM counters WHERE name = 'incident_id'")
+        _advance_counter(connection, "incident_id", journal.next_id() - 1)
+
+    return migrated
+
+if __name__ == "__main__":
+    # Run from backend/app: python -m repo.sqlite_store
+    counts = migrate_from_json()
+    print(f"Migrated {counts['documents']} documents, {counts['users']} users and "
+          f"{counts['incidents']} incidents into {os.path.abspath(settings.sqlite_path)}")
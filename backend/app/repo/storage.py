@@ -0,0 +1,19 @@
+import os
+
+from config import settings
+from repo.json_store import get_document
+
+def open_document(path: str):
+    """
+    Get the shared document for a repository JSON file in the configured backend.
+
+    With the SQLite backend the document lives in the documents table under
+    the file's base name, e.g. "zones" for zones/zones.json.
+
+    Returns:
+        JsonDocument or SqliteDocument: Both expose read(), copy() and write()
+    """
+    if settings.storage_backend == "sqlite":
+        from repo.sqlite_store import get_sqlite_document
+        return get_sqlite_document(os.path.splitext(os.path.basename(path))[0])
+    return get_document(path)
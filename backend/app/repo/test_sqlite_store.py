@@ -0,0 +1,73 @@
+import itertools
+
+import pytest
+
+from repo.incidents.incident import IncidentJournal
+from repo.sqlite_store import SqliteIncidentStore
+
+PRIORITIES = ("CRITICAL", "MODERATE", "GENERAL")
+TYPES = ("CROWD OVERFLOW", "MEDICAL")
+
+@pytest.fixture
+def stores(tmp_path):
+    """A JSON journal and a SQLite store that went through the same mutations"""
+    journal = IncidentJournal(str(tmp_path / "incidents.json"), str(tmp_path / "incidents.log"), compact_after=5)
+    database = SqliteIncidentStore(str(tmp_path / "crowd.db"))
+    for store in (journal, database):
+        for i in range(12):
+            store.create({
+                "status": "REPORTED",
+                "incident_priority": PRIORITIES[i % 3],
+                "incident_type": TYPES[i % 2],
+                "zone_id": None if i % 4 == 3 else i % 3,
+                "incident_summary": f"incident {i}",
+            })
+        store.put({**store.get(2), "status": "ASSIGNED", "resolver": "staff_1"})
+        store.put({**store.get(5), "status": "RESOLVED"})
+        store.put({**store.get(2), "status": "RESOLVED"})
+        # An update that keeps the status keeps the incident's place
+        store.put({**store.get(7), "incident_priority": "GENERAL"})
+        store.delete(9)
+        store.delete(12)
+    return journal, database
+
+FILTERS = list(itertools.product(
+    (None, "reported", "assigned", "resolved"),
+    (None,) + PRIORITIES,
+    (None,) + TYPES,
+    (None, 0, 1, 2),
+))
+
+@pytest.mark.parametrize("status, priority, incident_type, zone_id", FILTERS)
+def test_query_matches(stores, status, priority, incident_type, zone_id):
+    journal, database = stores
+    assert journal.query(status, priority, incident_type, zone_id) == database.query(status, priority, incident_type, zone_id)
+
+@pytest.mark.parametrize("limit", [1, 2, 5, 100])
+@pytest.mark.parametrize("status, priority, zone_id", [(None, None, None), ("reported", None, None),
+                                                       (None, "GENERAL", None), ("resolved", None, 2)])
+def test_pages_match(stores, limit, status, priority, zone_id):
+    for store in stores:
+        pages, after = [], None
+        while True:
+            page, after = store.page(status, priority, zone_id, limit, after)
+            pages.append(page)
+            if after is None:
+                break
+        assert [incident for page in pages for incident in page] == store.query(status, priority, zone_id=zone_id)
+        assert all(len(page) == limit for page in pages[:-1])
+
+    journal, database = stores
+    assert journal.page(status, priority, zone_id, limit) == database.page(status, priority, zone_id, limit)
+
+def test_counts_match(stores):
+    journal, database = stores
+    assert journal.counts() == database.counts()
+    assert journal.zone_counts() == database.zone_counts()
+    assert sum(journal.counts().values()) == 10
+    assert journal.check_counts() and database.check_counts()
+
+def test_ids_match(stores):
+    journal, database = stores
+    assert journal.next_id() == database.next_id() == 13
+    assert journal.create({"status": "REPORTED"}) == database.create({"status": "REPORTED"})
@@ -1,6 +1,283 @@
 import json
 import os
+import threading
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from repo.json_store import JsonDocument, get_document
+from repo.storage import open_document
+from utils.pagination import paginate
+
+# Path to the users.json file
+USERS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "users.json")
+users_document = get_document(USERS_FILE)
+# Zones are read to resolve staff zone assignments
+ZONES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "zones", "zones.json")
+
+# User lists in users.json, in lookup precedence order
+USER_TYPES = ("admins", "staff", "attendees")
+
+class UserIndex:
+    """
+    Persistent username index over the users document.
+
+    Maps every username to its (user_type, position) in users.json so login
+    and user lookups are O(1) instead of concatenating and scanning all user
+    lists. Positions rather than records are stored so the index stays valid
+    for private copies of the document. It is rebuilt when users.json is
+    reloaded, and writers going through write() keep it in step without a
+    rebuild.
+    """
+
+    def __init__(self, document: JsonDocument):
+        self.document = document
+        self._positions: Dict[str, Tuple[str, int]] = {}
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def _rebuild(self, data: dict):
+        positions = {}
+        for user_type in USER_TYPES:
+            for position, user in enumerate(data.get(user_type, [])):
+                positions.setdefault(user.get("username"), (user_type, position))
+        self._positions = positions
+        self._generation = self.document.generation
+
+    def locate(self, username: str, data: Optional[dict] = None) -> Optional[Tuple[str, int]]:
+        """
+        Find where a user is stored.
+
+        Args:
+            username (str): The username to look up
+            data (dict): Users data to resolve against, defaults to the shared
+                document; pass a copy from users_document.copy() to edit it
+
+        Returns:
+            tuple: (user_type, position) or None if the user does not exist
+        """
+        current = self.document.read()
+        if current is None:
+            return None
+        with self._lock:
+            if self._generation != self.document.generation:
+                self._rebuild(current)
+            entry = self._positions.get(username)
+        if entry is None:
+            return None
+
+        if data is None:
+            data = current
+        user_type, position = entry
+        users = data.get(user_type, [])
+        if position < len(users) and users[position].get("username") == username:
+            return entry
+
+        # The data predates the index, fall back to scanning it
+        for user_type in USER_TYPES:
+            for position, user in enumerate(data.get(user_type, [])):
+                if user.get("username") == username:
+                    return user_type, position
+        return None
+
+    def get(self, username: str) -> Optional[Tuple[str, dict]]:
+        """Get (user_type, record) for a username from the shared document"""
+        data = self.document.read()
+        entry = self.locate(username, data) if data is not None else None
+        if entry is None:
+            return None
+        user_type, position = entry
+        return user_type, data[user_type][position]
+
+    def write(self, data: dict, changes: Optional[Dict[str, Optional[Tuple[str, int]]]] = None):
+        """
+        Write the users document and keep the index in step.
+
+        Args:
+            data (dict): The updated users data
+            changes (dict): username -> new (user_type, position), or None for
+                removed users. Pass {} when no username moved; leave as None
+                when positions shifted and the index has to be rebuilt.
+        """
+        with self._lock:
+            in_sync = self._generation == self.document.generation
+            self.document.write(data)
+            if in_sync and changes is not None:
+                for username, entry in changes.items():
+                    if entry is None:
+                        self._positions.pop(username, None)
+                    else:
+                        self._positions[username] = entry
+                self._generation = self.document.generation
+
+class JsonUserStore:
+    """
+    User storage over users.json.
+
+    Lookups go through the UserIndex. Mutations rebuild only the affected
+    user list and share the others with the cached document, so records
+    handed out by get() and query() are read-only.
+    """
+
+    def __init__(self, document: JsonDocument):
+        self.document = document
+        self.index = UserIndex(document)
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> Optional[Tuple[str, dict]]:
+        """Get (user_type, record) for a username"""
+        return self.index.get(username)
+
+    def query(self, user_type: str, role: Optional[str] = None) -> List[dict]:
+        """Get the users of a type, optionally only those with a role"""
+        users = (self.document.read() or {}).get(user_type, [])
+        if role is not None:
+            users = [user for user in users if user.get("role") == role]
+        return users
+
+    def page(self, user_type: str, limit: Optional[int] = None,
+             after: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Get a page of the users of a type.
+
+        Returns:
+            tuple: (users, cursor of the next page or None on the last page)
+        """
+        return paginate(self.query(user_type), limit, after, key=lambda user: user.get("username"))
+
+    def version(self) -> int:
+        """Get a number that changes whenever the users are written"""
+        self.document.read()
+        return self.document.generation
+
+    def _current(self) -> dict:
+        data = self.document.read()
+        if data is None:
+            raise FileNotFoundError(USERS_FILE)
+        return data
+
+    def add(self, user_type: str, record: dict):
+        """Add a user at the end of its type's list"""
+        with self._lock:
+            data = self._current()
+            users = data.get(user_type, []) + [record]
+            self.index.write({**data, user_type: users}, {record["username"]: (user_type, len(users) - 1)})
+
+    def update(self, username: str, record: dict):
+        """Replace a user's record in place, the record may carry a new username"""
+        with self._lock:
+            data = self._current()
+            entry = self.index.locate(username, data)
+            if entry is None:
+                raise KeyError(username)
+            user_type, position = entry
+            users = list(data[user_type])
+            users[position] = record
+            changes = {}
+            if record["username"] != username:
+                changes = {username: None, record["username"]: entry}
+            self.index.write({**data, user_type: users}, changes)
+
+    def remove(self, username: str):
+        """Remove a user"""
+        with self._lock:
+            data = self._current()
+            entry = self.index.locate(username, data)
+            if entry is None:
+                return
+            user_type, position = entry
+            users = list(data[user_type])
+            users.pop(position)
+            # Positions after the removed user shifted, so the index rebuilds
+            self.index.write({**data, user_type: users})
+
+# User storage used by the routers, selected by STORAGE_BACKEND
+if settings.storage_backend == "sqlite":
+    from repo.sqlite_store import SqliteUserStore
+    user_store = SqliteUserStore()
+else:
+    user_store = JsonUserStore(users_document)
+
+def match_zone_names(assigned_zone: str, zones: List[dict]) -> List[int]:
+    """
+    Get the ids of the zones a free-text assigned zone refers to.
+
+    A zone matches when its name, or "Zone <id>", contains the assigned zone
+    or is contained in it, ignoring case.
+    """
+    assigned_zone = (assigned_zone or "").lower()
+    matches = []
+    for zone in zones:
+        names = (zone.get("name", "").lower(), f"zone {zone.get('id')}")
+        if any(name in assigned_zone or assigned_zone in name for name in names):
+            matches.append(zone.get("id"))
+    return matches
+
+def resolve_zone_id(assigned_zone: str, zones: List[dict]) -> Optional[int]:
+    """
+    Normalize a free-text assigned zone to a zone id.
+
+    Returns:
+        int: The zone with exactly that name, or the only matching zone;
+            None if no zone or several zones match
+    """
+    for zone in zones:
+        if zone.get("name", "").lower() == (assigned_zone or "").lower():
+            return zone.get("id")
+    matches = match_zone_names(assigned_zone, zones)
+    return matches[0] if len(matches) == 1 else None
+
+class StaffZoneIndex:
+    """
+    zone_id -> staff index used to dispatch staff to incidents.
+
+    Staff written through the API carry a normalized assigned_zone_id when
+    their free-text assigned_zone resolved to one zone. Zones are matched
+    with match_zone_names() once per rebuild rather than on every lookup;
+    the stored id picks among the matches, and is ignored when its zone no
+    longer matches, e.g. after the zone was deleted and its id reused. The
+    index is rebuilt when the users or the zones change.
+    """
+
+    def __init__(self, store, zones_document):
+        self.store = store
+        self.zones_document = zones_document
+        self._staff: Dict[int, List[dict]] = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _rebuild(self, zones: List[dict]):
+        index = {zone.get("id"): [] for zone in zones}
+        for staff in self.store.query("staff"):
+            zone_ids = match_zone_names(staff.get("assigned_zone", ""), zones)
+            if staff.get("assigned_zone_id") in zone_ids:
+                zone_ids = [staff["assigned_zone_id"]]
+            for zone_id in zone_ids:
+                if zone_id in index:
+                    index[zone_id].append(staff)
+        self._staff = index
+
+    def staff_for_zone(self, zone_id: int) -> Optional[List[dict]]:
+        """
+        Get the staff assigned to a zone.
+
+        Returns:
+            list: The assigned staff, read-only, or None if the zone does not exist
+        """
+        with self._lock:
+            zones_data = self.zones_document.read()
+            version = (self.store.version(), self.zones_document.generation)
+            if version != self._version:
+                self._rebuild((zones_data or {}).get("zones", []))
+                self._version = version
+            return self._staff.get(zone_id)
+
+zones_document = open_document(ZONES_FILE)
+staff_zone_index = StaffZoneIndex(user_store, zones_document)
+
+def get_zones() -> List[dict]:
+    """Get the current zones used to resolve staff zone assignments"""
+    return (zones_document.read() or {}).get("zones", [])
 
 def validate(username: str, password: str) -> bool:
     """
@@ -14,28 +291,12 @@ def validate(username: str, password: str) -> bool:
         bool: True if credentials are valid, False otherwise
     """
     try:
-        # Get the path to the users.json file
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        json_file_path = os.path.join(current_dir, "users.json")
-        
-        # Read the JSON file
-        with open(json_file_path, 'r') as file:
-            data = json.load(file)
-        
-        # Check all user types for username and password match
-        all_users = []
-        all_users.extend(data.get("admins", []))
-        all_users.extend(data.get("staff", []))
-        all_users.extend(data.get("attendees", []))
-        
-        for user in all_users:
-            if user.get("username") == username and user.get("password") == password:
-                return True
-                
-        return False
+        # Look the user up in the user store
+        entry = user_store.get(username)
+        return entry is not None and entry[1].get("password") == password
         
     except FileNotFoundError:
-        print(f"Error: users.json file not found at {json_file_path}")
+        print(f"Error: users.json file not found at {USERS_FILE}")
         return False
     except json.JSONDecodeError:
         print("Error: Invalid JSON format in users.json")
@@ -55,25 +316,9 @@ def get_user_info(username: str) -> dict:
         dict: User information or None if not found
     """
     try:
-        # Get the path to the users.json file
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        json_file_path = os.path.join(current_dir, "users.json")
-        
-        # Read the JSON file
-        with open(json_file_path, 'r') as file:
-            data = json.load(file)
-        
-        # Find user by username across all user types
-        all_users = []
-        all_users.extend(data.get("admins", []))
-        all_users.extend(data.get("staff", []))
-        all_users.extend(data.get("attendees", []))
-        
-        for user in all_users:
-            if user.get("username") == username:
-                return user
-                
-        return None
+        # Find user by username in the user store
+        entry = user_store.get(username)
+        return entry[1] if entry else None
         
     except Exception as e:
         print(f"Error reading user info: {str(e)}")
@@ -90,23 +335,9 @@ def create_attendee(attendee_data: dict) -> dict:
         dict: Created attendee data or None if failed
     """
     try:
-        # Get the path to the users.json file
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        json_file_path = os.path.join(current_dir, "users.json")
-        
-        # Read the JSON file
-        with open(json_file_path, 'r') as file:
-            data = json.load(file)
-        
         # Check if username already exists
-        all_users = []
-        all_users.extend(data.get("admins", []))
-        all_users.extend(data.get("staff", []))
-        all_users.extend(data.get("attendees", []))
-        
-        for user in all_users:
-            if user.get("username") == attendee_data.get("username"):
-                return {"error": "Username already exists"}
+        if user_store.get(attendee_data.get("username")) is not None:
+            return {"error": "Username already exists"}
         
         # Generate timestamp
         current_time = datetime.utcnow().isoformat() + "Z"
@@ -137,11 +368,7 @@ def create_attendee(attendee_data: dict) -> dict:
         }
         
         # Add to attendees list
-        data["attendees"].append(new_attendee)
-        
-        # Write back to file
-        with open(json_file_path, 'w') as file:
-            json.dump(data, file, indent=2)
+        user_store.add("attendees", new_attendee)
         
         return new_attendee
         
@@ -160,22 +387,7 @@ def username_exists(username: str) -> bool:
         bool: True if username exists, False otherwise
     """
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        json_file_path = os.path.join(current_dir, "users.json")
-        
-        with open(json_file_path, 'r') as file:
-            data = json.load(file)
-        
-        all_users = []
-        all_users.extend(data.get("admins", []))
-        all_users.extend(data.get("staff", []))
-        all_users.extend(data.get("attendees", []))
-        
-        for user in all_users:
-            if user.get("username") == username:
-                return True
-                
-        return False
+        return user_store.get(username) is not None
         
     except Exception as e:
         print(f"Error checking username: {str(e)}")
@@ -2,10 +2,15 @@ import json
 import os
 from typing import Dict, Any, List, Optional
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import httpx
 from pathlib import Path
 
+from repo.storage import open_document
+from repo.incidents.incident import incident_store
+from repo.users.user import user_store
+
 router = APIRouter(prefix="/assistant", tags=["Assistant"])
 
 class AssistantQuery(BaseModel):
@@ -110,10 +115,12 @@ TOOLS = [
 ]
 
 def load_json_file(file_path: Path) -> Dict[str, Any]:
-    """Load JSON data from file."""
+    """Load a JSON document through the shared repository."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        data = open_document(str(file_path)).read()
+        if data is None:
+            raise FileNotFoundError(str(file_path))
+        return data
     except Exception as e:
         return {"error": f"Failed to load {file_path}: {str(e)}"}
 
@@ -123,27 +130,16 @@ def get_event_details(**kwargs) -> Dict[str, Any]:
     return load_json_file(file_path)
 
 def get_incidents(status: str = "all", priority: Optional[str] = None, type: Optional[str] = None, **kwargs) -> Dict[str, Any]:
-    """Get incidents from JSON file with optional filtering."""
-    file_path = REPO_PATH / "incidents" / "incidents.json"
-    data = load_json_file(file_path)
-    
-    if "error" in data:
-        return data
-    
-    # Filter incidents based on parameters
+    """Get incidents from the incident store with optional filtering."""
+    # Filter incidents based on parameters, the store applies the filters
     filtered_data = {}
     
-    for status_key in ["reported", "assigned", "resolved"]:
-        if status == "all" or status == status_key:
-            incidents = data.get(status_key, [])
-            
-            # Apply filters
-            if priority:
-                incidents = [inc for inc in incidents if inc.get("incident_priority") == priority]
-            if type:
-                incidents = [inc for inc in incidents if inc.get("incident_type") == type]
-            
-            filtered_data[status_key] = incidents
+    try:
+        for status_key in ["reported", "assigned", "resolved"]:
+            if status == "all" or status == status_key:
+                filtered_data[status_key] = incident_store.query(status_key, priority or None, type or None)
+    except Exception as e:
+        return {"error": f"Failed to load incidents: {str(e)}"}
     
     return filtered_data
 
@@ -163,28 +159,23 @@ def get_zones(zone_type: Optional[str] = None, **kwargs) -> Dict[str, Any]:
     return {"zones": zones}
 
 def get_users(user_type: Optional[str] = None, role: Optional[str] = None, **kwargs) -> Dict[str, Any]:
-    """Get users from JSON file with optional filtering."""
-    file_path = REPO_PATH / "users" / "users.json"
-    data = load_json_file(file_path)
-    
-    if "error" in data:
-        return data
-    
+    """Get users from the user store with optional filtering."""
     filtered_data = {}
     
-    for user_key in ["admins", "staff", "attendees"]:
-        users = data.get(user_key, [])
-        
-        # Apply filters
-        if user_type:
-            if user_key == user_type + "s":  # Convert singular to plural
-                filtered_data[user_key] = users
-        elif role:
-            users = [user for user in users if user.get("role") == role]
-            if users:
-                filtered_data[user_key] = users
-        else:
-            filtered_data[user_key] = users
+    try:
+        for user_key in ["admins", "staff", "attendees"]:
+            # Apply filters
+            if user_type:
+                if user_key == user_type + "s":  # Convert singular to plural
+                    filtered_data[user_key] = user_store.query(user_key)
+            elif role:
+                users = user_store.query(user_key, role)
+                if users:
+                    filtered_data[user_key] = users
+            else:
+                filtered_data[user_key] = user_store.query(user_key)
+    except Exception as e:
+        return {"error": f"Failed to load users: {str(e)}"}
     
     return filtered_data
 
@@ -275,7 +266,7 @@ async def call_gemini_api_with_tools(query: str) -> str:
                             
                             # Execute the tool function
                             if function_name in TOOL_FUNCTIONS:
-                                tool_result = TOOL_FUNCTIONS[function_name](**args)
+                                tool_result = await run_in_threadpool(TOOL_FUNCTIONS[function_name], **args)
                                 
                                 # Second call to Gemini with tool results
                                 follow_up_payload = {
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, Any
 from models.api_response import APIResponse
 from repo.users.user import validate, get_user_info, create_attendee, username_exists
 from utils.file_upload import FileUploadManager
+from utils.concurrency import serialized
 import json
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
@@ -57,11 +59,11 @@ async def login(login_data: LoginRequest):
     User login endpoint that validates credentials using the validate method
     """
     try:
-        is_valid = validate(login_data.username, login_data.password)
+        is_valid = await run_in_threadpool(validate, login_data.username, login_data.password)
         
         if is_valid:
             # Get additional user information from JSON
-            user_info = get_user_info(login_data.username)
+            user_info = await run_in_threadpool(get_user_info, login_data.username)
             
             return APIResponse(
                 success=True,
@@ -92,6 +94,7 @@ async def login(login_data: LoginRequest):
         )
 
 @router.post("/signup", response_model=APIResponse)
+@serialized("users")
 async def signup(
     username: str = Form(...),
     password: str = Form(...),
@@ -112,7 +115,7 @@ async def signup(
     """
     try:
         # Check if username already exists
-        if username_exists(username):
+        if await run_in_threadpool(username_exists, username):
             return APIResponse(
                 success=False,
                 message="Username already exists",
@@ -147,7 +150,7 @@ async def signup(
         }
         
         # Create attendee
-        result = create_attendee(signup_data)
+        result = await run_in_threadpool(create_attendee, signup_data)
         
         if "error" in result:
             return APIResponse(
@@ -1,49 +1,42 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
-import os
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import base64
 import json
-import glob
-from typing import Dict, List, Any, Optional
-from pathlib import Path
+import os
+import threading
+from typing import Dict, List, Any, Iterator, Optional, Tuple
 
-router = APIRouter(prefix="/cctv", tags=["cctv"])
+from repo.cctv.cctv import CameraAnalysis, cctv_cache, cctv_videos
+from utils.playback import PlaybackHub
+from utils.frame_codec import ENCODINGS, encode_frame
+from utils.file_ranges import file_version, serve_file
+from utils.heatmap_raster import RasterCache, encode_png, render_raster
+from utils.point_lod import LodQuery, check_lod
+from utils.pagination import project, FieldsQuery
 
-# Path to the CCTV analysis data
-CCTV_DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'videos')
+router = APIRouter(prefix="/cctv", tags=["cctv"])
 
-def load_cctv_analysis_data() -> Dict[str, Any]:
-    """Load all CCTV analysis data from JSON files"""
-    all_data = {}
+def load_cctv_analysis_data() -> Dict[str, CameraAnalysis]:
+    """Load all CCTV analysis data from the resident camera cache"""
     try:
-        analysis_files = glob.glob(os.path.join(CCTV_DATA_DIR, 'cctv_*', '*_analysis.json'))
-        for file_path in sorted(analysis_files):
-            cctv_id = os.path.basename(os.path.dirname(file_path))
-            with open(file_path, 'r') as f:
-                all_data[cctv_id] = json.load(f)
+        return cctv_cache.all()
     except Exception as e:
         print(f"Error loading CCTV data: {e}")
-    return all_data
-
-def get_latest_analysis(cctv_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Get the latest timestamp data from CCTV analysis"""
-    if not cctv_data:
-        return {}
-    
-    # Get the latest timestamp
-    timestamps = sorted([int(k) for k in cctv_data.keys() if k.isdigit()])
-    if not timestamps:
         return {}
-    
-    latest_timestamp = str(timestamps[-1])
-    return cctv_data.get(latest_timestamp, {})
 
-def get_timestamp_analysis(cctv_data: Dict[str, Any], timestamp_index: int) -> Dict[str, Any]:
-    """Get analysis data for a specific timestamp index"""
-    if not cctv_data:
-        return {}
-    
-    # Get sorted timestamps
-    timestamps = sorted([int(k) for k in cctv_data.keys() if k.isdigit()])
+def load_camera_analysis(cctv_id: str) -> Optional[CameraAnalysis]:
+    """Load a single camera's analysis data, None if the camera has no frames"""
+    camera = cctv_cache.get(cctv_id)
+    return camera if camera and camera.frames else None
+
+def get_latest_analysis(camera: CameraAnalysis, lod: Optional[int] = None) -> Dict[str, Any]:
+    """Get the latest timestamp data from CCTV analysis, heatmap points at a level of detail"""
+    return camera.latest(lod)
+
+def get_timestamp_analysis(camera: CameraAnalysis, timestamp_index: int, lod: Optional[int] = None) -> Dict[str, Any]:
+    """Get analysis data for a specific timestamp index, heatmap points at a level of detail"""
+    timestamps = camera.timestamps
     if not timestamps:
         return {}
     
@@ -51,70 +44,163 @@ def get_timestamp_analysis(cctv_data: Dict[str, Any], timestamp_index: int) -> D
     actual_index = timestamp_index % len(timestamps)
     timestamp_key = str(timestamps[actual_index])
     
-    analysis_data = cctv_data.get(timestamp_key, {})
-    # Add metadata about the cycling
-    analysis_data['timestamp_info'] = {
-        'current_index': actual_index,
-        'total_timestamps': len(timestamps),
-        'timestamp_key': timestamp_key,
-        'progress_percentage': round((actual_index / len(timestamps)) * 100, 1)
-    }
-    
-    return analysis_data
-
-def get_summary_stats(cctv_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Calculate summary statistics from all timestamps"""
-    if not cctv_data:
-        return {
-            "avg_people_count": 0,
-            "max_people_count": 0,
-            "total_timestamps": 0,
-            "high_density_periods": 0,
-            "security_alerts": 0
-        }
-    
-    people_counts = []
-    high_density_count = 0
-    security_alerts = 0
-    
-    for timestamp_data in cctv_data.values():
-        if isinstance(timestamp_data, dict):
-            people_count = timestamp_data.get('people_count', 0)
-            people_counts.append(people_count)
-            
-            density = timestamp_data.get('crowd_density', 'low')
-            if density in ['high', 'very_high']:
-                high_density_count += 1
-            
-            # Check for security alerts
-            if (timestamp_data.get('violence_flag', False) or 
-                timestamp_data.get('weapon_detected', False) or
-                timestamp_data.get('fire_flag', False) or
-                timestamp_data.get('smoke_flag', False)):
-                security_alerts += 1
-    
+    # Build a new response dict, the cached frame is shared
     return {
-        "avg_people_count": round(sum(people_counts) / len(people_counts), 1) if people_counts else 0,
-        "max_people_count": max(people_counts) if people_counts else 0,
-        "total_timestamps": len(people_counts),
-        "high_density_periods": high_density_count,
-        "security_alerts": security_alerts
+        **camera.frame(timestamps[actual_index], lod),
+        'timestamp_info': {
+            'current_index': actual_index,
+            'total_timestamps': len(timestamps),
+            'timestamp_key': timestamp_key,
+            'progress_percentage': round((actual_index / len(timestamps)) * 100, 1)
+        }
     }
 
+def get_summary_stats(camera: CameraAnalysis) -> Dict[str, Any]:
+    """Get the summary statistics precomputed when the camera was loaded"""
+    return camera.summary
+
+# Fields a streamed timeline line can carry, and how each is read from a frame
+TIMELINE_FIELDS = {
+    "people_count": lambda data: data.get('people_count', 0),
+    "crowd_density": lambda data: data.get('crowd_density', 'low'),
+    "flags": lambda data: {
+        "violence": data.get('violence_flag', False),
+        "weapon": data.get('weapon_detected', False),
+        "fire": data.get('fire_flag', False),
+        "smoke": data.get('smoke_flag', False)
+    },
+    "heatmap_points": lambda data: data.get('heatmap_points', [])
+}
+
+def iter_timeline_lines(camera: CameraAnalysis, timestamps: List[int], fields: List[str]) -> Iterator[bytes]:
+    """Yield one NDJSON line per timestamp, encoding each frame only when it is sent"""
+    for i, timestamp in enumerate(timestamps):
+        data = camera.frame(timestamp)
+        line = {"index": i, "timestamp": timestamp}
+        for field in fields:
+            line[field] = TIMELINE_FIELDS[field](data)
+        yield (json.dumps(line, separators=(',', ':')) + "\n").encode()
+
+def build_snapshot(cctv_ids: Optional[List[str]], fields: Optional[str], lod: Optional[int]) -> Dict[str, Any]:
+    """
+    Assemble the current frame of many cameras from the resident cache.
+
+    Args:
+        cctv_ids (list): Cameras in response order, None for every camera
+        fields (str): Comma separated frame fields to keep, None keeps every field
+        lod (int): Heatmap point level of detail, None for the full points
+
+    Returns:
+        dict: One /feeds/{cctv_id} shaped entry per camera, plus the requested ids that have no data
+    """
+    if cctv_ids is None:
+        cctv_ids = cctv_cache.camera_ids()
+    feeds = []
+    missing = []
+    for cctv_id in cctv_ids:
+        camera = load_camera_analysis(cctv_id)
+        if not camera:
+            missing.append(cctv_id)
+            continue
+        current_data = project([get_latest_analysis(camera, lod)], fields)[0]
+        feeds.append({
+            "cctv_id": cctv_id,
+            "name": f"Camera {cctv_id.replace('cctv_', '')}",
+            "current_analysis": current_data,
+            "summary_stats": get_summary_stats(camera),
+            "last_updated": current_data.get('timestamp', 0)
+        })
+    return {"feeds": feeds, "total": len(feeds), "missing": missing}
+
+# Seconds between playback frames, each analysis timestamp covers 2 seconds of video
+PLAYBACK_INTERVAL = 2
+
+class PlaybackFrame:
+    """
+    One camera's playback frame at a tick, shared by every subscriber.
+
+    Each (encoding, lod) event is serialized when a subscriber first asks for
+    it and then reused, so a tick only pays for the variants being watched.
+    """
+
+    def __init__(self, camera: CameraAnalysis, index: int):
+        self.camera = camera
+        self.index = index
+        self.next_index = (index + 1) % len(camera.timestamps)
+        self._events: Dict[Tuple[str, Optional[int]], str] = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str, lod: Optional[int] = None) -> Optional[str]:
+        """Get an event if it was already serialized, None otherwise"""
+        return self._events.get((encoding, lod))
+
+    def event(self, encoding: str, lod: Optional[int] = None) -> str:
+        """
+        Get the event data for an encoding and level of detail, serializing it on first use.
+
+        Returns:
+            str: JSON shaped like the /next response, or a base64 binary frame
+            (see utils/frame_codec.py) tagged with the camera id
+        """
+        with self._lock:
+            data = self._events.get((encoding, lod))
+            if data is None:
+                data = self._events[(encoding, lod)] = self._serialize(encoding, lod)
+        return data
+
+    def _serialize(self, encoding: str, lod: Optional[int]) -> str:
+        cctv_id = self.camera.cctv_id
+        current_analysis = get_timestamp_analysis(self.camera, self.index, lod)
+        if encoding == "binary":
+            binary_frame = {
+                **current_analysis,
+                "timestamp": int(current_analysis["timestamp_info"]["timestamp_key"]),
+                "next_index": self.next_index
+            }
+            return base64.b64encode(encode_frame(binary_frame, cctv_id)).decode()
+        return json.dumps({
+            "cctv_id": cctv_id,
+            "name": f"Camera {cctv_id.replace('cctv_', '')}",
+            "current_analysis": current_analysis,
+            "next_index": self.next_index
+        })
+
+def build_playback_frame(cctv_id: str, index: int) -> Optional[PlaybackFrame]:
+    """Build the frame pushed to playback subscribers, its events are serialized on demand"""
+    camera = load_camera_analysis(cctv_id)
+    if not camera or not camera.timestamps:
+        return None
+    return PlaybackFrame(camera, index)
+
+# One shared producer per camera for every playback subscriber
+cctv_playback = PlaybackHub(build_playback_frame, PLAYBACK_INTERVAL)
+
+# Rendered heatmaps by (camera, data version, timestamp, width, height, format)
+heatmap_rasters = RasterCache(maxsize=512)
+RASTER_FORMATS = ("png", "raw")
+
+def render_camera_heatmap(camera: CameraAnalysis, timestamp: int, width: int, height: int, raster_format: str) -> bytes:
+    """Render a frame's heatmap points as PNG or raw uint8 rows, cached per frame and size"""
+    def render() -> bytes:
+        raster = render_raster(camera.frame(timestamp).get('heatmap_points', []), width, height)
+        return encode_png(raster) if raster_format == "png" else raster.tobytes()
+
+    key = (camera.cctv_id, camera.version, timestamp, width, height, raster_format)
+    return heatmap_rasters.get_or_render(key, render)
+
 @router.get("/feeds")
 async def get_cctv_feeds():
     """Get list of available CCTV feeds"""
     try:
-        all_data = load_cctv_analysis_data()
+        all_data = await run_in_threadpool(load_cctv_analysis_data)
         feeds = []
-        for cctv_id in sorted(all_data.keys()):
+        for cctv_id, camera in all_data.items():
             camera_num = cctv_id.replace('cctv_', '')
-            # Get timeline info for each camera
-            timestamps = sorted([int(k) for k in all_data[cctv_id].keys() if k.isdigit()])
+            timestamps = camera.timestamps
             feeds.append({
                 "id": cctv_id,
                 "name": f"Camera {camera_num}",
-                "status": "active" if all_data[cctv_id] else "inactive",
+                "status": "active" if camera.frames else "inactive",
                 "total_timestamps": len(timestamps),
                 "duration_seconds": len(timestamps) * 2  # 2 seconds per timestamp
             })
@@ -122,23 +208,45 @@ async def get_cctv_feeds():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching CCTV feeds: {str(e)}")
 
+@router.get("/snapshot")
+async def get_cctv_snapshot(
+    ids: Optional[str] = Query(None, description="Comma separated CCTV feed ids, every feed if omitted"),
+    fields: Optional[str] = FieldsQuery,
+    lod: Optional[int] = LodQuery
+):
+    """
+    Get the current analysis of many CCTV feeds in one response.
+
+    Each entry matches the /feeds/{cctv_id} response, so a dashboard refresh
+    needs one request instead of one per camera. Ids without data are listed
+    under missing instead of failing the whole batch.
+    """
+    try:
+        check_lod(lod)
+        cctv_ids = list(dict.fromkeys(name.strip() for name in ids.split(",") if name.strip())) if ids else None
+        return await run_in_threadpool(build_snapshot, cctv_ids, fields, lod)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching CCTV snapshot: {str(e)}")
+
 @router.get("/feeds/{cctv_id}")
-async def get_cctv_feed_data(cctv_id: str, timestamp_index: Optional[int] = None):
+async def get_cctv_feed_data(cctv_id: str, timestamp_index: Optional[int] = None, lod: Optional[int] = LodQuery):
     """Get current analysis data for a specific CCTV feed at a specific timestamp index"""
     try:
-        all_data = load_cctv_analysis_data()
-        cctv_data = all_data.get(cctv_id)
+        check_lod(lod)
+        camera = await run_in_threadpool(load_camera_analysis, cctv_id)
         
-        if not cctv_data:
+        if not camera:
             raise HTTPException(status_code=404, detail=f"CCTV feed {cctv_id} not found")
         
         # If timestamp_index is provided, get that specific timestamp, otherwise get latest
         if timestamp_index is not None:
-            current_data = get_timestamp_analysis(cctv_data, timestamp_index)
+            current_data = get_timestamp_analysis(camera, timestamp_index, lod)
         else:
-            current_data = get_latest_analysis(cctv_data)
+            current_data = get_latest_analysis(camera, lod)
             
-        summary_stats = get_summary_stats(cctv_data)
+        summary_stats = get_summary_stats(camera)
         
         return {
             "cctv_id": cctv_id,
@@ -153,24 +261,24 @@ async def get_cctv_feed_data(cctv_id: str, timestamp_index: Optional[int] = None
         raise HTTPException(status_code=500, detail=f"Error fetching data for {cctv_id}: {str(e)}")
 
 @router.get("/feeds/{cctv_id}/next")
-async def get_next_cctv_timestamp(cctv_id: str, current_index: int = 0):
+async def get_next_cctv_timestamp(cctv_id: str, current_index: int = 0, lod: Optional[int] = LodQuery):
     """Get the next timestamp data for cycling through CCTV analysis"""
     try:
-        all_data = load_cctv_analysis_data()
-        cctv_data = all_data.get(cctv_id)
+        check_lod(lod)
+        camera = await run_in_threadpool(load_camera_analysis, cctv_id)
         
-        if not cctv_data:
+        if not camera:
             raise HTTPException(status_code=404, detail=f"CCTV feed {cctv_id} not found")
         
         # Get the next timestamp index
         next_index = current_index + 1
-        current_data = get_timestamp_analysis(cctv_data, next_index)
+        current_data = get_timestamp_analysis(camera, next_index, lod)
         
         return {
             "cctv_id": cctv_id,
             "name": f"Camera {cctv_id.replace('cctv_', '')}",
             "current_analysis": current_data,
-            "next_index": next_index % len([k for k in cctv_data.keys() if k.isdigit()])
+            "next_index": next_index % len(camera.timestamps)
         }
     except HTTPException:
         raise
@@ -181,22 +289,19 @@ async def get_next_cctv_timestamp(cctv_id: str, current_index: int = 0):
 async def get_cctv_timeline(cctv_id: str, limit: Optional[int] = 100):
     """Get timeline data for a specific CCTV feed"""
     try:
-        all_data = load_cctv_analysis_data()
-        cctv_data = all_data.get(cctv_id)
+        camera = await run_in_threadpool(load_camera_analysis, cctv_id)
         
-        if not cctv_data:
+        if not camera:
             raise HTTPException(status_code=404, detail=f"CCTV feed {cctv_id} not found")
         
-        # Get sorted timestamps
-        timestamps = sorted([int(k) for k in cctv_data.keys() if k.isdigit()])
-        
         # Limit the results
+        timestamps = camera.timestamps
         if limit and len(timestamps) > limit:
             timestamps = timestamps[-limit:]
         
         timeline_data = []
         for i, timestamp in enumerate(timestamps):
-            data = cctv_data[str(timestamp)]
+            data = camera.frame(timestamp)
             timeline_data.append({
                 "index": i,
                 "timestamp": timestamp,
@@ -223,11 +328,159 @@ async def get_cctv_timeline(cctv_id: str, limit: Optional[int] = 100):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching timeline for {cctv_id}: {str(e)}")
 
+@router.get("/feeds/{cctv_id}/window")
+async def get_cctv_window(
+    cctv_id: str,
+    start: Optional[int] = Query(None, description="First timestamp to include"),
+    end: Optional[int] = Query(None, description="Last timestamp to include")
+):
+    """Get the analysis frames of a CCTV feed within a timestamp range"""
+    try:
+        if start is not None and end is not None and start > end:
+            raise HTTPException(status_code=400, detail="start must not be after end")
+
+        camera = await run_in_threadpool(load_camera_analysis, cctv_id)
+        
+        if not camera:
+            raise HTTPException(status_code=404, detail=f"CCTV feed {cctv_id} not found")
+        
+        timestamps = camera.window(start, end)
+        return {
+            "cctv_id": cctv_id,
+            "start": start,
+            "end": end,
+            "frames": [{"timestamp": timestamp, "analysis": camera.frame(timestamp)} for timestamp in timestamps],
+            "total_points": len(timestamps)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching window for {cctv_id}: {str(e)}")
+
+@router.get("/feeds/{cctv_id}/timeline/stream")
+async def stream_cctv_timeline(
+    cctv_id: str,
+    fields: Optional[str] = Query(None, description="Comma separated fields: people_count, crowd_density, flags, heatmap_points"),
+    start: Optional[int] = Query(None, description="First timestamp to include"),
+    end: Optional[int] = Query(None, description="Last timestamp to include")
+):
+    """Stream the full timeline of a CCTV feed as NDJSON, one line per timestamp"""
+    try:
+        selected = [name.strip() for name in fields.split(",") if name.strip()] if fields else list(TIMELINE_FIELDS)
+        unknown = [name for name in selected if name not in TIMELINE_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(unknown)}. Valid fields: {', '.join(TIMELINE_FIELDS)}"
+            )
+
+        camera = await run_in_threadpool(load_camera_analysis, cctv_id)
+        
+        if not camera:
+            raise HTTPException(status_code=404, detail=f"CCTV feed {cctv_id} not found")
+        
+        # The camera object is kept for the whole stream, so a refresh mid-export cannot mix versions
+        return StreamingResponse(
+            iter_timeline_lines(camera, camera.window(start, end), selected),
+            media_type="application/x-ndjson"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error streaming timeline for {cctv_id}: {str(e)}")
+
+@router.get("/feeds/{cctv_id}/heatmap")
+async def get_cctv_heatmap(
+    cctv_id: str,
+    timestamp: Optional[int] = Query(None, description="Timestamp to render, latest if omitted"),
+    width: int = Query(256, ge=8, le=1024, description="Raster width in pixels"),
+    height: int = Query(144, ge=8, le=1024, description="Raster height in pixels"),
+    format: str = Query("png", description="png or raw (uint8 rows, top to bottom)")
+):
+    """Render a CCTV frame's heatmap points into a density raster"""
+    try:
+        if format not in RASTER_FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(RASTER_FORMATS)}")
+
+        camera = await run_in_threadpool(load_camera_analysis, cctv_id)
+        
+        if not camera or not camera.timestamps:
+            raise HTTPException(status_code=404, detail=f"CCTV feed {cctv_id} not found")
+        
+        if timestamp is None:
+            timestamp = camera.timestamps[-1]
+        elif str(timestamp) not in camera.frames:
+            raise HTTPException(status_code=404, detail=f"Timestamp {timestamp} not found for {cctv_id}")
+
+        content = await run_in_threadpool(render_camera_heatmap, camera, timestamp, width, height, format)
+        return Response(
+            content=content,
+            media_type="image/png" if format == "png" else "application/octet-stream",
+            headers={
+                "X-Raster-Width": str(width),
+                "X-Raster-Height": str(height),
+                "X-Timestamp": str(timestamp)
+            }
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rendering heatmap for {cctv_id}: {str(e)}")
+
+@router.get("/playback")
+async def stream_cctv_playback(
+    ids: str = Query(..., description="Comma separated CCTV feed ids"),
+    encoding: str = Query("json", description="Event encoding: json or binary"),
+    lod: Optional[int] = LodQuery
+):
+    """
+    Push analysis frames for one or more CCTV feeds as Server-Sent Events.
+
+    Frames advance on a server-side clock every PLAYBACK_INTERVAL seconds and
+    replace polling /feeds/{cctv_id}/next. With the json encoding each event
+    carries the same body as that endpoint; with binary it carries a base64
+    frame from utils/frame_codec.py. Overview grids can ask for a coarser
+    level of detail of the heatmap points with lod.
+    """
+    try:
+        if encoding not in ENCODINGS:
+            raise HTTPException(status_code=400, detail=f"encoding must be one of {', '.join(ENCODINGS)}")
+        check_lod(lod)
+        cctv_ids = list(dict.fromkeys(name.strip() for name in ids.split(",") if name.strip()))
+        if not cctv_ids:
+            raise HTTPException(status_code=400, detail="At least one CCTV feed id is required")
+        for cctv_id in cctv_ids:
+            camera = await run_in_threadpool(load_camera_analysis, cctv_id)
+            if not camera:
+                raise HTTPException(status_code=404, detail=f"CCTV feed {cctv_id} not found")
+
+        async def events():
+            queue = cctv_playback.subscribe(cctv_ids)
+            try:
+                while True:
+                    _, frame = await queue.get()
+                    data = frame.encoded(encoding, lod)
+                    if data is None:
+                        data = await run_in_threadpool(frame.event, encoding, lod)
+                    yield f"event: frame\ndata: {data}\n\n"
+            finally:
+                cctv_playback.unsubscribe(cctv_ids, queue)
+
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error starting playback: {str(e)}")
+
 @router.get("/analytics/overview")
 async def get_analytics_overview():
     """Get overall analytics across all CCTV feeds"""
     try:
-        all_data = load_cctv_analysis_data()
+        all_data = await run_in_threadpool(load_cctv_analysis_data)
         
         total_cameras = len(all_data)
         total_people = 0
@@ -236,34 +489,20 @@ async def get_analytics_overview():
         
         camera_summaries = []
         
-        for cctv_id, cctv_data in all_data.items():
-            latest_data = get_latest_analysis(cctv_data)
-            summary_stats = get_summary_stats(cctv_data)
-            
-            people_count = latest_data.get('people_count', 0)
-            total_people += people_count
-            
-            # Check for active alerts
-            has_alerts = (latest_data.get('violence_flag', False) or 
-                         latest_data.get('weapon_detected', False) or
-                         latest_data.get('fire_flag', False) or
-                         latest_data.get('smoke_flag', False))
-            
-            if has_alerts:
+        for cctv_id, camera in all_data.items():
+            total_people += camera.people_count
+            if camera.has_alerts:
                 active_alerts += 1
-            
-            # Check density
-            density = latest_data.get('crowd_density', 'low')
-            if density in ['high', 'very_high']:
+            if camera.high_density:
                 high_density_cameras += 1
             
             camera_summaries.append({
                 "cctv_id": cctv_id,
                 "name": f"Camera {cctv_id.replace('cctv_', '')}",
-                "people_count": people_count,
-                "density": density,
-                "has_alerts": has_alerts,
-                "summary_stats": summary_stats
+                "people_count": camera.people_count,
+                "density": camera.density,
+                "has_alerts": camera.has_alerts,
+                "summary_stats": get_summary_stats(camera)
             })
         
         return {
@@ -278,41 +517,26 @@ async def get_analytics_overview():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating analytics overview: {str(e)}") 
 
-@router.get("/videos/{cctv_id}")
-async def get_cctv_video(cctv_id: str):
-    """Serve video file for a specific CCTV camera"""
+@router.api_route("/videos/{cctv_id}", methods=["GET", "HEAD"])
+async def get_cctv_video(cctv_id: str, request: Request):
+    """
+    Serve video file for a specific CCTV camera.
+
+    Supports byte range requests (206) for seeking and ETag/Last-Modified
+    validators so reconnecting players get a 304 instead of the whole file.
+    """
     try:
-        # Map CCTV IDs to their video files (using actual file names)
-        video_map = {
-            'cctv_1': 'cctv_1.mp4',
-            'cctv_2': 'cctv_2.mp4',
-            'cctv_3': 'cctv_3.mp4',
-            'cctv_4': 'cctv_4.mp4',
-            'cctv_5': 'cctv_5.mp4',
-            'cctv_6': 'cctv_6.mp4',
-        }
-        
-        if cctv_id not in video_map:
+        video_path = await run_in_threadpool(cctv_videos.get, cctv_id)
+        if video_path is None:
             raise HTTPException(status_code=404, detail=f"Video not found for camera {cctv_id}")
-        
-        # Construct path to video file
-        # From backend/app/routers/ -> ../data/videos/{cctv_id}/
-        video_file = video_map[cctv_id]
-        base_path = Path(__file__).parent.parent  # backend/app/
-        video_path = base_path / "data" / "videos" / cctv_id / video_file
-        
-        if not video_path.exists():
-            raise HTTPException(status_code=404, detail=f"Video file not found: {video_file}")
-        
-        return FileResponse(
-            path=str(video_path),
-            media_type="video/mp4",
-            headers={
-                "Accept-Ranges": "bytes",
-                "Content-Type": "video/mp4"
-            }
-        )
+
+        try:
+            version = await run_in_threadpool(file_version, video_path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail=f"Video file not found: {os.path.basename(video_path)}")
+
+        return serve_file(request, version, media_type="video/mp4")
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error serving video for {cctv_id}: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error serving video for {cctv_id}: {str(e)}")
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
 import json
 import os
 from models.emergency import (
@@ -12,16 +13,24 @@ from models.emergency import (
     EmergencyData
 )
 from models.api_response import APIResponse
+from repo.storage import open_document
+from utils.concurrency import serialized
+from utils.pagination import paginate, project, LimitQuery, AfterQuery, FieldsQuery, NEXT_CURSOR_HEADER
 
 router = APIRouter(prefix="/emergency", tags=["emergency"])
 
 # Path to the emergency.json file
 EMERGENCY_FILE = os.path.join(os.path.dirname(__file__), "..", "repo", "emergency", "emergency.json")
+emergency_document = open_document(EMERGENCY_FILE)
 
-def load_emergency_data():
-    """Load emergency data from JSON file"""
+def load_emergency_data(for_update: bool = False):
+    """Load emergency data from the shared repository
+
+    Args:
+        for_update: Return a private copy that may be mutated and saved
+    """
     try:
-        if not os.path.exists(EMERGENCY_FILE):
+        if emergency_document.read() is None:
             # Create default emergency data if file doesn't exist
             default_data = {
                 "emergency_contacts": [
@@ -48,14 +57,9 @@ def load_emergency_data():
                     }
                 ]
             }
-            os.makedirs(os.path.dirname(EMERGENCY_FILE), exist_ok=True)
-            with open(EMERGENCY_FILE, 'w') as f:
-                json.dump(default_data, f, indent=2)
-            return default_data
+            emergency_document.write(default_data)
         
-        with open(EMERGENCY_FILE, 'r') as file:
-            data = json.load(file)
-            return data
+        return emergency_document.copy() if for_update else emergency_document.read()
     except json.JSONDecodeError:
         raise HTTPException(status_code=500, detail="Invalid emergency data format")
     except Exception as e:
@@ -64,9 +68,7 @@ def load_emergency_data():
 def save_emergency_data(data: dict):
     """Save emergency data to JSON file"""
     try:
-        os.makedirs(os.path.dirname(EMERGENCY_FILE), exist_ok=True)
-        with open(EMERGENCY_FILE, 'w') as file:
-            json.dump(data, file, indent=2)
+        emergency_document.write(data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving emergency data: {str(e)}")
 
@@ -83,15 +85,36 @@ def get_next_service_id(services: List[dict]) -> int:
     return max(service["id"] for service in services) + 1
 
 @router.get("/", response_model=APIResponse)
-async def get_all_emergency_data():
-    """Get all emergency data (contacts and services)"""
+async def get_all_emergency_data(
+    response: Response,
+    limit: Optional[int] = LimitQuery,
+    after: Optional[str] = AfterQuery,
+    fields: Optional[str] = FieldsQuery
+):
+    """Get all emergency data (contacts and services)
+
+    Contacts and then services are paginated as one sequence with cursor
+    pagination (limit, after) and field projection (fields).
+    """
     try:
-        data = load_emergency_data()
+        data = await run_in_threadpool(load_emergency_data)
+        entries = [(collection, item) for collection in ("emergency_contacts", "nearby_services")
+                   for item in data.get(collection, [])]
+        page, next_cursor = paginate(entries, limit, after, key=lambda entry: [entry[0], entry[1].get("id")])
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        
+        page_data = {"emergency_contacts": [], "nearby_services": []}
+        for collection, item in page:
+            page_data[collection].append(item)
+        
         return APIResponse(
             success=True,
             message="Emergency data retrieved successfully",
-            data=EmergencyData(**data)
+            data={collection: project(items, fields) for collection, items in page_data.items()} if fields else EmergencyData(**page_data)
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load emergency data: {str(e)}")
 
@@ -100,7 +123,7 @@ async def get_all_emergency_data():
 async def get_emergency_contacts():
     """Get all emergency contacts"""
     try:
-        data = load_emergency_data()
+        data = await run_in_threadpool(load_emergency_data)
         contacts = data.get("emergency_contacts", [])
         return APIResponse(
             success=True,
@@ -114,7 +137,7 @@ async def get_emergency_contacts():
 async def get_emergency_contact(contact_id: int):
     """Get a specific emergency contact by ID"""
     try:
-        data = load_emergency_data()
+        data = await run_in_threadpool(load_emergency_data)
         contacts = data.get("emergency_contacts", [])
         contact = next((contact for contact in contacts if contact["id"] == contact_id), None)
         
@@ -132,10 +155,11 @@ async def get_emergency_contact(contact_id: int):
         raise HTTPException(status_code=500, detail=f"Failed to load emergency contact: {str(e)}")
 
 @router.post("/contacts", response_model=APIResponse)
+@serialized("emergency")
 async def create_emergency_contact(contact_data: EmergencyContactCreate):
     """Create a new emergency contact"""
     try:
-        data = load_emergency_data()
+        data = await run_in_threadpool(load_emergency_data, for_update=True)
         contacts = data.get("emergency_contacts", [])
         
         new_contact = {
@@ -145,7 +169,7 @@ async def create_emergency_contact(contact_data: EmergencyContactCreate):
         
         contacts.append(new_contact)
         data["emergency_contacts"] = contacts
-        save_emergency_data(data)
+        await run_in_threadpool(save_emergency_data, data)
         
         return APIResponse(
             success=True,
@@ -156,10 +180,11 @@ async def create_emergency_contact(contact_data: EmergencyContactCreate):
         raise HTTPException(status_code=500, detail=f"Failed to create emergency contact: {str(e)}")
 
 @router.put("/contacts/{contact_id}", response_model=APIResponse)
+@serialized("emergency")
 async def update_emergency_contact(contact_id: int, contact_data: EmergencyContactUpdate):
     """Update an emergency contact"""
     try:
-        data = load_emergency_data()
+        data = await run_in_threadpool(load_emergency_data, for_update=True)
         contacts = data.get("emergency_contacts", [])
         
         # Find the contact to update
@@ -177,7 +202,7 @@ async def update_emergency_contact(contact_id: int, contact_data: EmergencyConta
         contacts[contact_index].update(update_data)
         
         data["emergency_contacts"] = contacts
-        save_emergency_data(data)
+        await run_in_threadpool(save_emergency_data, data)
         
         return APIResponse(
             success=True,
@@ -190,10 +215,11 @@ async def update_emergency_contact(contact_id: int, contact_data: EmergencyConta
         raise HTTPException(status_code=500, detail=f"Failed to update emergency contact: {str(e)}")
 
 @router.delete("/contacts/{contact_id}", response_model=APIResponse)
+@serialized("emergency")
 async def delete_emergency_contact(contact_id: int):
     """Delete an emergency contact"""
     try:
-        data = load_emergency_data()
+        data = await run_in_threadpool(load_emergency_data, for_update=True)
         contacts = data.get("emergency_contacts", [])
         
         # Find and remove the contact
@@ -204,7 +230,7 @@ async def delete_emergency_contact(contact_id: int):
             raise HTTPException(status_code=404, detail="Emergency contact not found")
         
         data["emergency_contacts"] = contacts
-        save_emergency_data(data)
+        await run_in_threadpool(save_emergency_data, data)
         
         return APIResponse(
             success=True,
@@ -220,7 +246,7 @@ async def delete_emergency_contact(contact_id: int):
 async def get_nearby_services():
     """Get all nearby services"""
     try:
-        data = load_emergency_data()
+        data = await run_in_threadpool(load_emergency_data)
         services = data.get("nearby_services", [])
         return APIResponse(
             success=True,
@@ -234,7 +260,7 @@ async def get_nearby_services():
 async def get_nearby_service(service_id: int):
     """Get a specific nearby service by ID"""
     try:
-        data = load_emergency_data()
+        data = await run_in_threadpool(load_emergency_data)
         services = data.get("nearby_services", [])
         service = next((service for service in services if service["id"] == service_id), None)
         
@@ -252,10 +278,11 @@ async def get_nearby_service(service_id: int):
         raise HTTPException(status_code=500, detail=f"Failed to load nearby service: {str(e)}")
 
 @router.post("/services", response_model=APIResponse)
+@serialized("emergency")
 async def create_nearby_service(service_data: NearbyServiceCreate):
     """Create a new nearby service"""
     try:
-        data = load_emergency_data()
+        data = await run_in_threadpool(load_emergency_data, for_update=True)
         services = data.get("nearby_services", [])
         
         new_service = {
@@ -265,7 +292,7 @@ async def create_nearby_service(service_data: NearbyServiceCreate):
         
         services.append(new_service)
         data["nearby_services"] = services
-        save_emergency_data(data)
+        await run_in_threadpool(save_emergency_data, data)
         
         return APIResponse(
             success=True,
@@ -276,10 +303,11 @@ async def create_nearby_service(service_data: NearbyServiceCreate):
         raise HTTPException(status_code=500, detail=f"Failed to create nearby service: {str(e)}")
 
 @router.put("/services/{service_id}", response_model=APIResponse)
+@serialized("emergency")
 async def update_nearby_service(service_id: int, service_data: NearbyServiceUpdate):
     """Update a nearby service"""
     try:
-        data = load_emergency_data()
+        data = await run_in_threadpool(load_emergency_data, for_update=True)
         services = data.get("nearby_services", [])
         
         # Find the service to update
@@ -297,7 +325,7 @@ async def update_nearby_service(service_id: int, service_data: NearbyServiceUpda
         services[service_index].update(update_data)
         
         data["nearby_services"] = services
-        save_emergency_data(data)
+        await run_in_threadpool(save_emergency_data, data)
         
         return APIResponse(
             success=True,
@@ -310,10 +338,11 @@ async def update_nearby_service(service_id: int, service_data: NearbyServiceUpda
         raise HTTPException(status_code=500, detail=f"Failed to update nearby service: {str(e)}")
 
 @router.delete("/services/{service_id}", response_model=APIResponse)
+@serialized("emergency")
 async def delete_nearby_service(service_id: int):
     """Delete a nearby service"""
     try:
-        data = load_emergency_data()
+        data = await run_in_threadpool(load_emergency_data, for_update=True)
         services = data.get("nearby_services", [])
         
         # Find and remove the service
@@ -324,7 +353,7 @@ async def delete_nearby_service(service_id: int):
             raise HTTPException(status_code=404, detail="Nearby service not found")
         
         data["nearby_services"] = services
-        save_emergency_data(data)
+        await run_in_threadpool(save_emergency_data, data)
         
         return APIResponse(
             success=True,
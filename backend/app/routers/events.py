@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from typing import List
-import json
 import os
 from models.event import (
     EventDetails, 
@@ -11,17 +11,23 @@ from models.event import (
     EventData
 )
 from models.api_response import APIResponse
+from repo.storage import open_document
+from utils.concurrency import serialized
 
 router = APIRouter(prefix="/events", tags=["events"])
 
 EVENTS_FILE = os.path.join(os.path.dirname(__file__), "..", "repo", "events", "events.json")
+events_document = open_document(EVENTS_FILE)
 
-def load_events():
-    """Load events data from JSON file"""
+def load_events(for_update: bool = False):
+    """Load events data from the shared repository
+
+    Args:
+        for_update: Return a private copy that may be mutated and saved
+    """
     try:
-        if os.path.exists(EVENTS_FILE):
-            with open(EVENTS_FILE, 'r') as f:
-                return json.load(f)
+        if events_document.read() is not None:
+            return events_document.copy() if for_update else events_document.read()
         else:
             # Create default events file if it doesn't exist
             default_events = {
@@ -53,10 +59,7 @@ def load_events():
 def save_events(events_data):
     """Save events data to JSON file"""
     try:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(EVENTS_FILE), exist_ok=True)
-        with open(EVENTS_FILE, 'w') as f:
-            json.dump(events_data, f, indent=2)
+        events_document.write(events_data)
     except Exception as e:
         print(f"Error saving events: {e}")
         raise HTTPException(status_code=500, detail="Failed to save events data")
@@ -73,7 +76,7 @@ def get_next_schedule_id():
 async def get_events():
     """Get all event data (details and schedule)"""
     try:
-        events_data = load_events()
+        events_data = await run_in_threadpool(load_events)
         return APIResponse(
             success=True,
             message="Events data retrieved successfully",
@@ -86,7 +89,7 @@ async def get_events():
 async def get_event_details():
     """Get event details only"""
     try:
-        events_data = load_events()
+        events_data = await run_in_threadpool(load_events)
         return APIResponse(
             success=True,
             message="Event details retrieved successfully",
@@ -96,10 +99,11 @@ async def get_event_details():
         raise HTTPException(status_code=500, detail=f"Failed to load event details: {str(e)}")
 
 @router.put("/details", response_model=APIResponse)
+@serialized("events")
 async def update_event_details(details: EventDetailsUpdate):
     """Update event details"""
     try:
-        events_data = load_events()
+        events_data = await run_in_threadpool(load_events, for_update=True)
         current_details = events_data.get("event_details", {})
         
         # Update only provided fields
@@ -107,7 +111,7 @@ async def update_event_details(details: EventDetailsUpdate):
         current_details.update(update_data)
         
         events_data["event_details"] = current_details
-        save_events(events_data)
+        await run_in_threadpool(save_events, events_data)
         
         return APIResponse(
             success=True,
@@ -121,7 +125,7 @@ async def update_event_details(details: EventDetailsUpdate):
 async def get_event_schedule():
     """Get event schedule"""
     try:
-        events_data = load_events()
+        events_data = await run_in_threadpool(load_events)
         schedule = events_data.get("event_schedule", [])
         return APIResponse(
             success=True,
@@ -132,20 +136,21 @@ async def get_event_schedule():
         raise HTTPException(status_code=500, detail=f"Failed to load event schedule: {str(e)}")
 
 @router.post("/schedule", response_model=APIResponse)
+@serialized("events")
 async def add_schedule_item(item: ScheduleItemCreate):
     """Add a new schedule item"""
     try:
-        events_data = load_events()
+        events_data = await run_in_threadpool(load_events, for_update=True)
         schedule = events_data.get("event_schedule", [])
         
         new_item = {
-            "id": get_next_schedule_id(),
+            "id": await run_in_threadpool(get_next_schedule_id),
             **item.dict()
         }
         
         schedule.append(new_item)
         events_data["event_schedule"] = schedule
-        save_events(events_data)
+        await run_in_threadpool(save_events, events_data)
         
         return APIResponse(
             success=True,
@@ -156,10 +161,11 @@ async def add_schedule_item(item: ScheduleItemCreate):
         raise HTTPException(status_code=500, detail=f"Failed to add schedule item: {str(e)}")
 
 @router.put("/schedule/{item_id}", response_model=APIResponse)
+@serialized("events")
 async def update_schedule_item(item_id: int, item: ScheduleItemUpdate):
     """Update a schedule item"""
     try:
-        events_data = load_events()
+        events_data = await run_in_threadpool(load_events, for_update=True)
         schedule = events_data.get("event_schedule", [])
         
         # Find the item to update
@@ -177,7 +183,7 @@ async def update_schedule_item(item_id: int, item: ScheduleItemUpdate):
         schedule[item_index].update(update_data)
         
         events_data["event_schedule"] = schedule
-        save_events(events_data)
+        await run_in_threadpool(save_events, events_data)
         
         return APIResponse(
             success=True,
@@ -190,10 +196,11 @@ async def update_schedule_item(item_id: int, item: ScheduleItemUpdate):
         raise HTTPException(status_code=500, detail=f"Failed to update schedule item: {str(e)}")
 
 @router.delete("/schedule/{item_id}", response_model=APIResponse)
+@serialized("events")
 async def delete_schedule_item(item_id: int):
     """Delete a schedule item"""
     try:
-        events_data = load_events()
+        events_data = await run_in_threadpool(load_events, for_update=True)
         schedule = events_data.get("event_schedule", [])
         
         # Find and remove the item
@@ -204,7 +211,7 @@ async def delete_schedule_item(item_id: int):
             raise HTTPException(status_code=404, detail="Schedule item not found")
         
         events_data["event_schedule"] = schedule
-        save_events(events_data)
+        await run_in_threadpool(save_events, events_data)
         
         return APIResponse(
             success=True,
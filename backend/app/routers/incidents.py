@@ -1,5 +1,6 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from typing import List, Dict, Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Response
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Dict, Optional, Tuple
 import json
 import os
 import shutil
@@ -7,58 +8,73 @@ from datetime import datetime
 
 from models.incident import Incident, IncidentCreate, IncidentUpdate, IncidentStatus, ReporterType, IncidentPriority, IncidentType
 from models.api_response import APIResponse
+from repo.storage import open_document
+from repo.incidents.incident import incident_store
+from utils.concurrency import serialized
+from utils.pagination import project, LimitQuery, AfterQuery, FieldsQuery, NEXT_CURSOR_HEADER
 
 router = APIRouter(prefix="/incidents", tags=["incidents"])
 
-# Path to the incidents.json file
-INCIDENTS_FILE = "app/repo/incidents/incidents.json"
 # Path to store incident images
 INCIDENT_IMAGES_DIR = "app/data/incidents"
 # Path to zones.json file
 ZONES_FILE = "app/repo/zones/zones.json"
+zones_document = open_document(ZONES_FILE)
 
-def load_incidents() -> Dict[str, List[dict]]:
-    """Load incidents from JSON file"""
+def load_incidents(status: Optional[str] = None, priority: Optional[str] = None,
+                   zone_id: Optional[int] = None) -> List[dict]:
+    """Load incidents from the incident store, optionally filtered by status, priority and zone
+
+    The returned incidents may be shared and must not be mutated; changes go
+    through save_incident() and remove_incident().
+    """
     try:
-        if not os.path.exists(INCIDENTS_FILE):
-            # Create default structure if file doesn't exist
-            default_incidents = {
-                "reported": [],
-                "assigned": [],
-                "resolved": []
-            }
-            os.makedirs(os.path.dirname(INCIDENTS_FILE), exist_ok=True)
-            with open(INCIDENTS_FILE, 'w') as f:
-                json.dump(default_incidents, f, indent=2)
-            return default_incidents
-        
-        with open(INCIDENTS_FILE, 'r') as file:
-            data = json.load(file)
-            return {
-                "reported": data.get("reported", []),
-                "assigned": data.get("assigned", []),
-                "resolved": data.get("resolved", [])
-            }
+        return incident_store.query(status, priority, zone_id=zone_id)
     except json.JSONDecodeError:
         raise HTTPException(status_code=500, detail="Invalid incidents data format")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading incidents: {str(e)}")
 
-def save_incidents(incidents: Dict[str, List[dict]]):
-    """Save incidents to JSON file"""
+def load_incident_page(status: Optional[str] = None, priority: Optional[str] = None,
+                       zone_id: Optional[int] = None, limit: Optional[int] = None,
+                       after: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """Load a page of incidents from the incident store, which does the paging"""
     try:
-        os.makedirs(os.path.dirname(INCIDENTS_FILE), exist_ok=True)
-        with open(INCIDENTS_FILE, 'w') as file:
-            json.dump(incidents, file, indent=2)
+        return incident_store.page(status, priority, zone_id=zone_id, limit=limit, after=after)
+    except HTTPException:
+        raise
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=500, detail="Invalid incidents data format")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading incidents: {str(e)}")
+
+def find_incident(incident_id: int) -> Optional[dict]:
+    """Find an incident by ID in the incident store"""
+    try:
+        return incident_store.get(incident_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading incidents: {str(e)}")
+
+def store_new_incident(incident: dict) -> dict:
+    """Store a new incident under the next id, returning it with its id"""
+    try:
+        return incident_store.create(incident)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving incidents: {str(e)}")
 
-def get_next_id(incidents: Dict[str, List[dict]]) -> int:
-    """Get the next available ID for a new incident"""
-    all_incidents = incidents["reported"] + incidents["assigned"] + incidents["resolved"]
-    if not all_incidents:
-        return 1
-    return max(incident["id"] for incident in all_incidents) + 1
+def save_incident(incident: dict):
+    """Store a created or updated incident"""
+    try:
+        incident_store.put(incident)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error saving incidents: {str(e)}")
+
+def remove_incident(incident_id: int):
+    """Delete an incident from the incident store"""
+    try:
+        incident_store.delete(incident_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error saving incidents: {str(e)}")
 
 def save_incident_image(file: UploadFile, incident_id: int) -> str:
     """Save uploaded image for an incident"""
@@ -84,78 +100,99 @@ def save_incident_image(file: UploadFile, incident_id: int) -> str:
         raise HTTPException(status_code=500, detail=f"Error saving image: {str(e)}")
 
 def load_zones() -> List[dict]:
-    """Load zones from JSON file"""
+    """Load zones from the shared JSON repository"""
     try:
-        if not os.path.exists(ZONES_FILE):
+        data = zones_document.read()
+        if data is None:
             return []
         
-        with open(ZONES_FILE, 'r') as file:
-            data = json.load(file)
-            return data.get("zones", [])
+        return data.get("zones", [])
     except json.JSONDecodeError:
         raise HTTPException(status_code=500, detail="Invalid zones data format")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading zones: {str(e)}")
 
+def is_enum_value(enum_type, value) -> bool:
+    """Check a raw value against an enum's values, `value in Enum` raises TypeError before Python 3.12"""
+    return value in enum_type._value2member_map_
+
 def validate_zone_id(zone_id: int) -> bool:
     """Validate if zone ID exists"""
     zones = load_zones()
     return any(zone["id"] == zone_id for zone in zones)
 
-def find_incident_by_id(incidents: Dict[str, List[dict]], incident_id: int) -> tuple:
-    """Find incident by ID and return (status, incident, index)"""
-    for status in ["reported", "assigned", "resolved"]:
-        for i, incident in enumerate(incidents[status]):
-            if incident["id"] == incident_id:
-                return status, incident, i
-    return None, None, None
-
 @router.get("/", response_model=APIResponse)
-async def get_all_incidents():
-    """Get all incidents across all statuses"""
-    incidents = load_incidents()
-    all_incidents = incidents["reported"] + incidents["assigned"] + incidents["resolved"]
+async def get_all_incidents(
+    response: Response,
+    zone_id: Optional[int] = None,
+    priority: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: Optional[int] = LimitQuery,
+    after: Optional[str] = AfterQuery,
+    fields: Optional[str] = FieldsQuery
+):
+    """Get all incidents across all statuses, optionally filtered by zone, priority and status
+
+    Supports cursor pagination (limit, after) and field projection (fields).
+    """
+    if priority is not None and not is_enum_value(IncidentPriority, priority):
+        raise HTTPException(status_code=400, detail="Invalid incident priority")
+    
+    if status is not None:
+        if not is_enum_value(IncidentStatus, status.upper()):
+            raise HTTPException(status_code=400, detail="Invalid incident status")
+        status = status.lower()
+    
+    page, next_cursor = await run_in_threadpool(load_incident_page, status, priority, zone_id, limit, after)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return APIResponse(
         success=True,
         message="All incidents retrieved successfully",
-        data=all_incidents
+        data=project(page, fields)
     )
 
 @router.get("/reported", response_model=APIResponse)
 async def get_reported_incidents():
     """Get all reported incidents"""
-    incidents = load_incidents()
+    incidents = await run_in_threadpool(load_incidents, "reported")
     return APIResponse(
         success=True,
         message="Reported incidents retrieved successfully",
-        data=incidents["reported"]
+        data=incidents
     )
 
 @router.get("/assigned", response_model=APIResponse)
 async def get_assigned_incidents():
     """Get all assigned incidents"""
-    incidents = load_incidents()
+    incidents = await run_in_threadpool(load_incidents, "assigned")
     return APIResponse(
         success=True,
         message="Assigned incidents retrieved successfully",
-        data=incidents["assigned"]
+        data=incidents
     )
 
 @router.get("/resolved", response_model=APIResponse)
-async def get_resolved_incidents():
-    """Get all resolved incidents"""
-    incidents = load_incidents()
+async def get_resolved_incidents(
+    response: Response,
+    limit: Optional[int] = LimitQuery,
+    after: Optional[str] = AfterQuery,
+    fields: Optional[str] = FieldsQuery
+):
+    """Get all resolved incidents, with optional cursor pagination and field projection"""
+    page, next_cursor = await run_in_threadpool(load_incident_page, "resolved", None, None, limit, after)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return APIResponse(
         success=True,
         message="Resolved incidents retrieved successfully",
-        data=incidents["resolved"]
+        data=project(page, fields)
     )
 
 @router.get("/{incident_id}", response_model=APIResponse)
 async def get_incident(incident_id: int):
     """Get a specific incident by ID"""
-    incidents = load_incidents()
-    status, incident, _ = find_incident_by_id(incidents, incident_id)
+    incident = await run_in_threadpool(find_incident, incident_id)
     
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
@@ -167,6 +204,7 @@ async def get_incident(incident_id: int):
     )
 
 @router.post("/", response_model=APIResponse)
+@serialized("incidents")
 async def create_incident(
     reporter: str = Form(...),
     reporter_name: str = Form(...),
@@ -179,35 +217,24 @@ async def create_incident(
     is_broadcast: bool = Form(False)
 ):
     """Create a new incident with optional image upload"""
-    incidents = load_incidents()
-    
     # Validate enums
-    if reporter not in ReporterType:
+    if not is_enum_value(ReporterType, reporter):
         raise HTTPException(status_code=400, detail="Invalid reporter type")
     
-    if incident_priority not in IncidentPriority:
+    if not is_enum_value(IncidentPriority, incident_priority):
         raise HTTPException(status_code=400, detail="Invalid incident priority")
     
-    if incident_type not in IncidentType:
+    if not is_enum_value(IncidentType, incident_type):
         raise HTTPException(status_code=400, detail="Invalid incident type")
     
     # Validate zone_id if provided and not broadcasting
     if not is_broadcast and zone_id is not None:
-        if not validate_zone_id(zone_id):
+        if not await run_in_threadpool(validate_zone_id, zone_id):
             raise HTTPException(status_code=400, detail="Invalid zone ID")
     elif is_broadcast:
         zone_id = None  # Set zone_id to None when broadcasting
     
-    # Get next ID for the incident
-    incident_id = get_next_id(incidents)
-    
-    # Handle image upload if provided
-    image_path = None
-    if additional_image:
-        image_path = save_incident_image(additional_image, incident_id)
-    
     new_incident = {
-        "id": incident_id,
         "reporter": reporter,
         "reporter_name": reporter_name,
         "incident_priority": incident_priority,
@@ -218,14 +245,19 @@ async def create_incident(
         "updated_at": datetime.utcnow().isoformat() + "Z",
         "incident_summary": incident_summary,
         "incident_details": incident_details,
-        "additional_image": image_path,
+        "additional_image": None,
         "zone_id": zone_id,
         "is_broadcast": is_broadcast
     }
     
-    # Add to reported incidents
-    incidents["reported"].append(new_incident)
-    save_incidents(incidents)
+    # Add to reported incidents, the store assigns the id atomically
+    new_incident = await run_in_threadpool(store_new_incident, new_incident)
+    
+    # Handle image upload if provided, its file is named after the id
+    if additional_image:
+        image_path = await run_in_threadpool(save_incident_image, additional_image, new_incident["id"])
+        new_incident = {**new_incident, "additional_image": image_path}
+        await run_in_threadpool(save_incident, new_incident)
     
     return APIResponse(
         success=True,
@@ -234,10 +266,10 @@ async def create_incident(
     )
 
 @router.put("/{incident_id}", response_model=APIResponse)
+@serialized("incidents")
 async def update_incident(incident_id: int, incident_data: IncidentUpdate):
     """Update an existing incident"""
-    incidents = load_incidents()
-    status, incident, index = find_incident_by_id(incidents, incident_id)
+    incident = await run_in_threadpool(find_incident, incident_id)
     
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
@@ -245,28 +277,17 @@ async def update_incident(incident_id: int, incident_data: IncidentUpdate):
     # Update only provided fields
     update_data = incident_data.dict(exclude_unset=True)
     
-    # Handle status changes
+    # Handle status changes, the store moves the incident to the new status list
     if "status" in update_data:
         new_status = update_data["status"]
-        if new_status not in IncidentStatus:
+        if not is_enum_value(IncidentStatus, new_status):
             raise HTTPException(status_code=400, detail="Invalid incident status")
-        
-        # Remove from current status list
-        incidents[status.lower()].pop(index)
-        
-        # Add to new status list
-        incident["status"] = new_status
-        incidents[new_status.lower()].append(incident)
-        status = new_status.lower()
-    
-    # Update other fields
-    for field, value in update_data.items():
-        if field != "status":
-            incident[field] = value
     
+    # Update fields on a new copy, stored incidents are shared
+    incident = {**incident, **update_data}
     incident["updated_at"] = datetime.utcnow().isoformat() + "Z"
     
-    save_incidents(incidents)
+    await run_in_threadpool(save_incident, incident)
     
     return APIResponse(
         success=True,
@@ -275,17 +296,16 @@ async def update_incident(incident_id: int, incident_data: IncidentUpdate):
     )
 
 @router.delete("/{incident_id}", response_model=APIResponse)
+@serialized("incidents")
 async def delete_incident(incident_id: int):
     """Delete an incident"""
-    incidents = load_incidents()
-    status, incident, index = find_incident_by_id(incidents, incident_id)
+    incident = await run_in_threadpool(find_incident, incident_id)
     
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
     
     # Remove from current status list
-    incidents[status].pop(index)
-    save_incidents(incidents)
+    await run_in_threadpool(remove_incident, incident_id)
     
     return APIResponse(
         success=True,
@@ -294,10 +314,10 @@ async def delete_incident(incident_id: int):
     )
 
 @router.post("/{incident_id}/assign", response_model=APIResponse)
+@serialized("incidents")
 async def assign_incident(incident_id: int, resolver_data: dict):
     """Assign an incident to a resolver"""
-    incidents = load_incidents()
-    status, incident, index = find_incident_by_id(incidents, incident_id)
+    incident = await run_in_threadpool(find_incident, incident_id)
     
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
@@ -305,17 +325,14 @@ async def assign_incident(incident_id: int, resolver_data: dict):
     if incident["status"] != "REPORTED":
         raise HTTPException(status_code=400, detail="Only reported incidents can be assigned")
     
-    # Remove from reported list
-    incidents["reported"].pop(index)
-    
-    # Update incident
-    incident["status"] = "ASSIGNED"
-    incident["resolver"] = resolver_data.get("resolver")
-    incident["updated_at"] = datetime.utcnow().isoformat() + "Z"
-    
-    # Add to assigned list
-    incidents["assigned"].append(incident)
-    save_incidents(incidents)
+    # Update incident, the store moves it from the reported to the assigned list
+    incident = {
+        **incident,
+        "status": "ASSIGNED",
+        "resolver": resolver_data.get("resolver"),
+        "updated_at": datetime.utcnow().isoformat() + "Z"
+    }
+    await run_in_threadpool(save_incident, incident)
     
     return APIResponse(
         success=True,
@@ -324,10 +341,10 @@ async def assign_incident(incident_id: int, resolver_data: dict):
     )
 
 @router.post("/{incident_id}/resolve", response_model=APIResponse)
+@serialized("incidents")
 async def resolve_incident(incident_id: int):
     """Mark an incident as resolved"""
-    incidents = load_incidents()
-    status, incident, index = find_incident_by_id(incidents, incident_id)
+    incident = await run_in_threadpool(find_incident, incident_id)
     
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
@@ -335,16 +352,13 @@ async def resolve_incident(incident_id: int):
     if incident["status"] != "ASSIGNED":
         raise HTTPException(status_code=400, detail="Only assigned incidents can be resolved")
     
-    # Remove from assigned list
-    incidents["assigned"].pop(index)
-    
-    # Update incident
-    incident["status"] = "RESOLVED"
-    incident["updated_at"] = datetime.utcnow().isoformat() + "Z"
-    
-    # Add to resolved list
-    incidents["resolved"].append(incident)
-    save_incidents(incidents)
+    # Update incident, the store moves it from the assigned to the resolved list
+    incident = {
+        **incident,
+        "status": "RESOLVED",
+        "updated_at": datetime.utcnow().isoformat() + "Z"
+    }
+    await run_in_threadpool(save_incident, incident)
     
     return APIResponse(
         success=True,
@@ -355,7 +369,7 @@ async def resolve_incident(incident_id: int):
 @router.get("/zones/available", response_model=APIResponse)
 async def get_available_zones():
     """Get available zones for incident assignment"""
-    zones = load_zones()
+    zones = await run_in_threadpool(load_zones)
     return APIResponse(
         success=True,
         message="Available zones retrieved successfully",
@@ -365,28 +379,41 @@ async def get_available_zones():
 @router.get("/stats/summary", response_model=APIResponse)
 async def get_incident_stats():
     """Get incident statistics"""
-    incidents = load_incidents()
+    try:
+        # Counters maintained by the store on every mutation
+        counts = await run_in_threadpool(incident_store.counts)
+        zone_counts = await run_in_threadpool(incident_store.zone_counts)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading incidents: {str(e)}")
     
     stats = {
-        "total_incidents": len(incidents["reported"]) + len(incidents["assigned"]) + len(incidents["resolved"]),
-        "reported_count": len(incidents["reported"]),
-        "assigned_count": len(incidents["assigned"]),
-        "resolved_count": len(incidents["resolved"]),
+        "total_incidents": sum(counts.values()),
+        "reported_count": 0,
+        "assigned_count": 0,
+        "resolved_count": 0,
         "critical_count": 0,
         "moderate_count": 0,
-        "general_count": 0
+        "general_count": 0,
+        "type_counts": {},
+        "zone_counts": {}
     }
     
-    # Count by priority
-    all_incidents = incidents["reported"] + incidents["assigned"] + incidents["resolved"]
-    for incident in all_incidents:
-        priority = incident.get("incident_priority", "GENERAL")
+    # Fold the (status, priority, type) counters into the totals
+    for (status, priority, incident_type), count in counts.items():
+        stats[f"{status}_count"] += count
         if priority == "CRITICAL":
-            stats["critical_count"] += 1
+            stats["critical_count"] += count
         elif priority == "MODERATE":
-            stats["moderate_count"] += 1
+            stats["moderate_count"] += count
         else:
-            stats["general_count"] += 1
+            stats["general_count"] += count
+        if incident_type is not None:
+            stats["type_counts"][incident_type] = stats["type_counts"].get(incident_type, 0) + count
+    
+    # Per zone status counts, broadcast incidents have no zone
+    for (zone_id, status), count in zone_counts.items():
+        if zone_id is not None:
+            stats["zone_counts"].setdefault(zone_id, {})[status] = count
     
     return APIResponse(
         success=True,
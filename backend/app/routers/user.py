@@ -1,43 +1,32 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Response
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional
 import json
 import os
 import shutil
 
-router = APIRouter(prefix="/users", tags=["users"])
+from repo.users.user import user_store, staff_zone_index, get_zones, resolve_zone_id
+from utils.concurrency import serialized
+from utils.pagination import project, LimitQuery, AfterQuery, FieldsQuery, NEXT_CURSOR_HEADER
 
-# Path to the users.json file
-USERS_FILE = "app/repo/users/users.json"
-# Path to the zones.json file
-ZONES_FILE = "app/repo/zones/zones.json"
+router = APIRouter(prefix="/users", tags=["users"])
 # Path to attendees data directory
 ATTENDEES_DATA_DIR = "app/data/attendees"
 
+def save_upload(upload: UploadFile, file_path: str):
+    """Copy an uploaded file to disk, called from the threadpool"""
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(upload.file, buffer)
+
 @router.get("/{username}/details")
 async def get_user_details(username: str):
     """
     Get user details by username
     """
     try:
-        # Check if users.json file exists
-        if not os.path.exists(USERS_FILE):
-            raise HTTPException(status_code=404, detail="Users data not found")
-        
-        # Read users data from JSON file
-        with open(USERS_FILE, 'r') as file:
-            users_data = json.load(file)
-        
-        # Find user by username across all user types
-        user = None
-        for user_type in ["admins", "staff", "attendees"]:
-            if user_type in users_data:
-                for user_data in users_data[user_type]:
-                    if user_data.get("username") == username:
-                        user = user_data
-                        user["user_type"] = user_type
-                        break
-                if user:
-                    break
+        # Find user by username in the user store
+        entry = await run_in_threadpool(user_store.get, username)
+        user = {**entry[1], "user_type": entry[0]} if entry else None
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -105,6 +94,7 @@ async def get_user_details(username: str):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.post("/{username}/family-members")
+@serialized("users")
 async def add_family_member(
     username: str,
     first_name: str = Form(...),
@@ -116,22 +106,9 @@ async def add_family_member(
     Add a family member to an attendee
     """
     try:
-        # Check if users.json file exists
-        if not os.path.exists(USERS_FILE):
-            raise HTTPException(status_code=404, detail="Users data not found")
-        
-        # Read users data from JSON file
-        with open(USERS_FILE, 'r') as file:
-            users_data = json.load(file)
-        
         # Find the attendee
-        attendee = None
-        attendee_index = None
-        for i, user_data in enumerate(users_data["attendees"]):
-            if user_data.get("username") == username:
-                attendee = user_data
-                attendee_index = i
-                break
+        entry = await run_in_threadpool(user_store.get, username)
+        attendee = entry[1] if entry and entry[0] == "attendees" else None
         
         if not attendee:
             raise HTTPException(status_code=404, detail="Attendee not found")
@@ -156,8 +133,7 @@ async def add_family_member(
             photo_path = f"data/attendees/{photo_filename}"
             photo_filepath = os.path.join(ATTENDEES_DATA_DIR, photo_filename)
             
-            with open(photo_filepath, "wb") as buffer:
-                shutil.copyfileobj(photo.file, buffer)
+            await run_in_threadpool(save_upload, photo, photo_filepath)
         
         # Create family member data
         family_member_data = {
@@ -169,19 +145,11 @@ async def add_family_member(
             "created_at": attendee.get("created_at")  # Use same creation date as attendee
         }
         
-        # Initialize family_members array if it doesn't exist
-        if "family_members" not in attendee:
-            attendee["family_members"] = []
-        
-        # Add family member to attendee
-        attendee["family_members"].append(family_member_data)
-        
-        # Update the users data
-        users_data["attendees"][attendee_index] = attendee
+        # Add family member to a new copy of the attendee, stored records are shared
+        attendee = {**attendee, "family_members": attendee.get("family_members", []) + [family_member_data]}
         
-        # Save updated data back to file
-        with open(USERS_FILE, 'w') as file:
-            json.dump(users_data, file, indent=2)
+        # Save the updated attendee
+        await run_in_threadpool(user_store.update, username, attendee)
         
         return {
             "success": True,
@@ -197,27 +165,15 @@ async def add_family_member(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.delete("/{username}/family-members/{family_username}")
+@serialized("users")
 async def remove_family_member(username: str, family_username: str):
     """
     Remove a family member from an attendee
     """
     try:
-        # Check if users.json file exists
-        if not os.path.exists(USERS_FILE):
-            raise HTTPException(status_code=404, detail="Users data not found")
-        
-        # Read users data from JSON file
-        with open(USERS_FILE, 'r') as file:
-            users_data = json.load(file)
-        
         # Find the attendee
-        attendee = None
-        attendee_index = None
-        for i, user_data in enumerate(users_data["attendees"]):
-            if user_data.get("username") == username:
-                attendee = user_data
-                attendee_index = i
-                break
+        entry = await run_in_threadpool(user_store.get, username)
+        attendee = entry[1] if entry and entry[0] == "attendees" else None
         
         if not attendee:
             raise HTTPException(status_code=404, detail="Attendee not found")
@@ -243,15 +199,13 @@ async def remove_family_member(username: str, family_username: str):
             if os.path.exists(photo_filepath):
                 os.remove(photo_filepath)
         
-        # Remove family member from array
-        attendee["family_members"].pop(family_member_index)
+        # Remove family member from a new copy of the attendee, stored records are shared
+        family_members = list(attendee["family_members"])
+        family_members.pop(family_member_index)
+        attendee = {**attendee, "family_members": family_members}
         
-        # Update the users data
-        users_data["attendees"][attendee_index] = attendee
-        
-        # Save updated data back to file
-        with open(USERS_FILE, 'w') as file:
-            json.dump(users_data, file, indent=2)
+        # Save the updated attendee
+        await run_in_threadpool(user_store.update, username, attendee)
         
         return {
             "success": True,
@@ -267,33 +221,35 @@ async def remove_family_member(username: str, family_username: str):
 
 # Staff Management Endpoints
 @router.get("/staff")
-async def get_all_staff():
+async def get_all_staff(
+    response: Response,
+    limit: Optional[int] = LimitQuery,
+    after: Optional[str] = AfterQuery,
+    fields: Optional[str] = FieldsQuery
+):
     """
-    Get all staff members
+    Get all staff members, with optional cursor pagination and field projection
     """
     try:
-        # Check if users.json file exists
-        if not os.path.exists(USERS_FILE):
-            raise HTTPException(status_code=404, detail="Users data not found")
-        
-        # Read users data from JSON file
-        with open(USERS_FILE, 'r') as file:
-            users_data = json.load(file)
-        
         # Return all staff members
-        staff_members = users_data.get("staff", [])
+        page, next_cursor = await run_in_threadpool(user_store.page, "staff", limit, after)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         
         return {
             "success": True,
-            "data": staff_members
+            "data": project(page, fields)
         }
         
+    except HTTPException:
+        raise
     except json.JSONDecodeError:
         raise HTTPException(status_code=500, detail="Invalid users data format")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.post("/staff")
+@serialized("users")
 async def add_staff(
     username: str = Form(...),
     first_name: str = Form(...),
@@ -310,21 +266,14 @@ async def add_staff(
     Add a new staff member
     """
     try:
-        # Check if users.json file exists
-        if not os.path.exists(USERS_FILE):
-            raise HTTPException(status_code=404, detail="Users data not found")
-        
-        # Read users data from JSON file
-        with open(USERS_FILE, 'r') as file:
-            users_data = json.load(file)
-        
         # Check if staff member already exists
-        for staff in users_data.get("staff", []):
-            if staff.get("username") == username:
-                raise HTTPException(status_code=400, detail="Staff member already exists")
+        entry = await run_in_threadpool(user_store.get, username)
+        if entry:
+            detail = "Staff member already exists" if entry[0] == "staff" else "Username already exists"
+            raise HTTPException(status_code=400, detail=detail)
         
         # Generate unique ID for the staff member
-        existing_staff = users_data.get("staff", [])
+        existing_staff = await run_in_threadpool(user_store.query, "staff")
         max_id = max([staff.get("id", 0) for staff in existing_staff]) if existing_staff else 0
         new_id = max_id + 1
         
@@ -341,8 +290,10 @@ async def add_staff(
             file_path = f"{staff_data_dir}/{username}{file_extension}"
             
             # Save the uploaded file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(profile_photo.file, buffer)
+            await run_in_threadpool(save_upload, profile_photo, file_path)
+        
+        # Normalize the assigned zone to a zone id for dispatch
+        assigned_zone_id = resolve_zone_id(assigned_zone, await run_in_threadpool(get_zones))
         
         # Create staff member data
         staff_member = {
@@ -362,17 +313,12 @@ async def add_staff(
             "created_at": "2025-01-27T00:00:00.000Z",
             "updated_at": "2025-01-27T00:00:00.000Z"
         }
-        
-        # Initialize staff array if it doesn't exist
-        if "staff" not in users_data:
-            users_data["staff"] = []
+        # Ambiguous or unknown zones keep only the free text and are matched by name
+        if assigned_zone_id is not None:
+            staff_member["assigned_zone_id"] = assigned_zone_id
         
         # Add staff member
-        users_data["staff"].append(staff_member)
-        
-        # Save updated data back to file
-        with open(USERS_FILE, 'w') as file:
-            json.dump(users_data, file, indent=2)
+        await run_in_threadpool(user_store.add, "staff", staff_member)
         
         return {
             "success": True,
@@ -388,6 +334,7 @@ async def add_staff(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.put("/staff/{username}")
+@serialized("users")
 async def update_staff(
     username: str,
     new_username: str = Form(...),
@@ -405,31 +352,16 @@ async def update_staff(
     Update a staff member
     """
     try:
-        # Check if users.json file exists
-        if not os.path.exists(USERS_FILE):
-            raise HTTPException(status_code=404, detail="Users data not found")
-        
-        # Read users data from JSON file
-        with open(USERS_FILE, 'r') as file:
-            users_data = json.load(file)
-        
         # Find the staff member
-        staff = None
-        staff_index = None
-        for i, staff_data in enumerate(users_data.get("staff", [])):
-            if staff_data.get("username") == username:
-                staff = staff_data
-                staff_index = i
-                break
+        entry = await run_in_threadpool(user_store.get, username)
+        staff = entry[1] if entry and entry[0] == "staff" else None
         
         if not staff:
             raise HTTPException(status_code=404, detail="Staff member not found")
         
         # Check if new username already exists (if username is being changed)
-        if new_username != username:
-            for staff_data in users_data.get("staff", []):
-                if staff_data.get("username") == new_username:
-                    raise HTTPException(status_code=400, detail="Username already exists")
+        if new_username != username and await run_in_threadpool(user_store.get, new_username):
+            raise HTTPException(status_code=400, detail="Username already exists")
         
         # Handle profile photo upload
         profile_photo_path = staff.get("profile_photo")
@@ -444,8 +376,10 @@ async def update_staff(
             file_path = f"{staff_data_dir}/{new_username}{file_extension}"
             
             # Save the uploaded file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(profile_photo.file, buffer)
+            await run_in_threadpool(save_upload, profile_photo, file_path)
+        
+        # Normalize the assigned zone to a zone id for dispatch
+        assigned_zone_id = resolve_zone_id(assigned_zone, await run_in_threadpool(get_zones))
         
         # Update staff member data
         updated_staff = {
@@ -462,13 +396,13 @@ async def update_staff(
             "profile_photo": profile_photo_path,
             "updated_at": "2025-01-27T00:00:00.000Z"
         }
+        # Ambiguous or unknown zones keep only the free text and are matched by name
+        updated_staff.pop("assigned_zone_id", None)
+        if assigned_zone_id is not None:
+            updated_staff["assigned_zone_id"] = assigned_zone_id
         
-        # Update the users data
-        users_data["staff"][staff_index] = updated_staff
-        
-        # Save updated data back to file
-        with open(USERS_FILE, 'w') as file:
-            json.dump(users_data, file, indent=2)
+        # Save the updated staff member
+        await run_in_threadpool(user_store.update, username, updated_staff)
         
         return {
             "success": True,
@@ -484,27 +418,15 @@ async def update_staff(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.delete("/staff/{username}")
+@serialized("users")
 async def delete_staff(username: str):
     """
     Delete a staff member
     """
     try:
-        # Check if users.json file exists
-        if not os.path.exists(USERS_FILE):
-            raise HTTPException(status_code=404, detail="Users data not found")
-        
-        # Read users data from JSON file
-        with open(USERS_FILE, 'r') as file:
-            users_data = json.load(file)
-        
         # Find the staff member
-        staff = None
-        staff_index = None
-        for i, staff_data in enumerate(users_data.get("staff", [])):
-            if staff_data.get("username") == username:
-                staff = staff_data
-                staff_index = i
-                break
+        entry = await run_in_threadpool(user_store.get, username)
+        staff = entry[1] if entry and entry[0] == "staff" else None
         
         if not staff:
             raise HTTPException(status_code=404, detail="Staff member not found")
@@ -521,12 +443,8 @@ async def delete_staff(username: str):
                 # Log the error but don't fail the deletion
                 print(f"Error deleting profile photo: {e}")
         
-        # Remove staff member from array
-        users_data["staff"].pop(staff_index)
-        
-        # Save updated data back to file
-        with open(USERS_FILE, 'w') as file:
-            json.dump(users_data, file, indent=2)
+        # Remove staff member
+        await run_in_threadpool(user_store.remove, username)
         
         return {
             "success": True,
@@ -548,56 +466,16 @@ async def get_available_staff(zone_id: Optional[int] = None):
     - If zone_id is not provided: returns all staff members (for broadcast incidents)
     """
     try:
-        # Check if users.json file exists
-        if not os.path.exists(USERS_FILE):
-            raise HTTPException(status_code=404, detail="Users data not found")
-        
-        # Read users data from JSON file
-        with open(USERS_FILE, 'r') as file:
-            users_data = json.load(file)
-        
-        # Get all staff members
-        all_staff = users_data.get("staff", [])
-        
         if zone_id is not None:
-            # Load zones from zones.json to get zone names
+            # Look the zone up in the zone_id -> staff assignment index
             try:
-                if os.path.exists(ZONES_FILE):
-                    with open(ZONES_FILE, 'r') as file:
-                        zones_data = json.load(file)
-                        zones = zones_data.get("zones", [])
-                        
-                        # Find the zone with the given zone_id
-                        target_zone = None
-                        for zone in zones:
-                            if zone.get("id") == zone_id:
-                                target_zone = zone
-                                break
-                        
-                        if target_zone:
-                            zone_name = target_zone.get("name", "")
-                            # Create possible zone name variations for matching
-                            possible_zone_names = [
-                                zone_name,
-                                f"Zone {zone_id}",
-                                zone_name.lower(),
-                                zone_name.upper()
-                            ]
-                            
-                            filtered_staff = []
-                            for staff in all_staff:
-                                assigned_zone = staff.get("assigned_zone", "")
-                                # Check if the assigned_zone matches any of the possible zone names
-                                if any(zone_name.lower() in assigned_zone.lower() or assigned_zone.lower() in zone_name.lower() for zone_name in possible_zone_names):
-                                    filtered_staff.append(staff)
-                        else:
-                            # Zone not found, return empty list
-                            filtered_staff = []
-                else:
-                    # Zones file not found, return empty list
-                    filtered_staff = []
+                filtered_staff = await run_in_threadpool(staff_zone_index.staff_for_zone, zone_id)
             except Exception as e:
                 # Error loading zones, return empty list
+                filtered_staff = None
+            
+            # Zone not found, return empty list
+            if filtered_staff is None:
                 filtered_staff = []
             
             return {
@@ -611,7 +489,7 @@ async def get_available_staff(zone_id: Optional[int] = None):
             return {
                 "success": True,
                 "message": "All available staff members retrieved successfully",
-                "data": all_staff,
+                "data": await run_in_threadpool(user_store.query, "staff"),
                 "zone_id": None
             }
         
@@ -1,21 +1,31 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
 import json
 import os
 import random
 from datetime import datetime
 
 from models.zone import Zone, ZoneCreate, ZoneUpdate, ZoneType
+from repo.storage import open_document
+from utils.concurrency import serialized
+from utils.pagination import paginate, project, LimitQuery, AfterQuery, FieldsQuery, NEXT_CURSOR_HEADER
 
 router = APIRouter(prefix="/zones", tags=["zones"])
 
 # Path to the zones.json file
 ZONES_FILE = "app/repo/zones/zones.json"
+zones_document = open_document(ZONES_FILE)
 
-def load_zones():
-    """Load zones from JSON file"""
+def load_zones(for_update: bool = False):
+    """Load zones from the shared repository
+
+    Args:
+        for_update: Return a private copy that may be mutated and saved
+    """
     try:
-        if not os.path.exists(ZONES_FILE):
+        if zones_document.read() is None:
             # Create default zones if file doesn't exist
             default_zones = {
                 "zones": [
@@ -36,14 +46,10 @@ def load_zones():
                     }
                 ]
             }
-            os.makedirs(os.path.dirname(ZONES_FILE), exist_ok=True)
-            with open(ZONES_FILE, 'w') as f:
-                json.dump(default_zones, f, indent=2)
-            return default_zones["zones"]
+            zones_document.write(default_zones)
         
-        with open(ZONES_FILE, 'r') as file:
-            data = json.load(file)
-            return data.get("zones", [])
+        data = zones_document.copy() if for_update else zones_document.read()
+        return data.get("zones", [])
     except json.JSONDecodeError:
         raise HTTPException(status_code=500, detail="Invalid zones data format")
     except Exception as e:
@@ -52,9 +58,7 @@ def load_zones():
 def save_zones(zones: List[dict]):
     """Save zones to JSON file"""
     try:
-        os.makedirs(os.path.dirname(ZONES_FILE), exist_ok=True)
-        with open(ZONES_FILE, 'w') as file:
-            json.dump({"zones": zones}, file, indent=2)
+        zones_document.write({"zones": zones})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving zones: {str(e)}")
 
@@ -78,10 +82,21 @@ def generate_crowd_count(max_capacity: int) -> int:
     return random.randint(0, max_count)
 
 @router.get("/", response_model=List[Zone])
-async def get_all_zones():
-    """Get all zones"""
-    zones = load_zones()
-    return zones
+async def get_all_zones(
+    response: Response,
+    limit: Optional[int] = LimitQuery,
+    after: Optional[str] = AfterQuery,
+    fields: Optional[str] = FieldsQuery
+):
+    """Get all zones, with optional cursor pagination and field projection"""
+    zones = await run_in_threadpool(load_zones)
+    page, next_cursor = paginate(zones, limit, after)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    if fields:
+        # Projected zones no longer match the Zone model
+        return JSONResponse(content=project(page, fields), headers=headers)
+    response.headers.update(headers)
+    return page
 
 @router.get("/types", response_model=List[str])
 async def get_zone_types():
@@ -91,7 +106,7 @@ async def get_zone_types():
 @router.get("/crowd/details")
 async def get_all_zones_crowd_details():
     """Get crowd details for all zones with random count generation"""
-    zones = load_zones()
+    zones = await run_in_threadpool(load_zones)
     
     crowd_details = []
     for zone in zones:
@@ -113,7 +128,7 @@ async def get_all_zones_crowd_details():
 @router.get("/{zone_id}", response_model=Zone)
 async def get_zone(zone_id: int):
     """Get a specific zone by ID"""
-    zones = load_zones()
+    zones = await run_in_threadpool(load_zones)
     zone = next((zone for zone in zones if zone["id"] == zone_id), None)
     
     if not zone:
@@ -124,7 +139,7 @@ async def get_zone(zone_id: int):
 @router.get("/{zone_id}/details")
 async def get_zone_crowd_details(zone_id: int):
     """Get crowd details for a specific zone with random count generation"""
-    zones = load_zones()
+    zones = await run_in_threadpool(load_zones)
     zone = next((zone for zone in zones if zone["id"] == zone_id), None)
     
     if not zone:
@@ -142,9 +157,10 @@ async def get_zone_crowd_details(zone_id: int):
     }
 
 @router.post("/", response_model=Zone)
+@serialized("zones")
 async def create_zone(zone_data: ZoneCreate):
     """Create a new zone"""
-    zones = load_zones()
+    zones = await run_in_threadpool(load_zones, for_update=True)
     
     # Validate zone type
     if zone_data.zoneType not in ZoneType:
@@ -188,14 +204,15 @@ async def create_zone(zone_data: ZoneCreate):
     }
     
     zones.append(new_zone)
-    save_zones(zones)
+    await run_in_threadpool(save_zones, zones)
     
     return new_zone
 
 @router.put("/{zone_id}", response_model=Zone)
+@serialized("zones")
 async def update_zone(zone_id: int, zone_data: ZoneUpdate):
     """Update an existing zone"""
-    zones = load_zones()
+    zones = await run_in_threadpool(load_zones, for_update=True)
     zone_index = next((i for i, zone in enumerate(zones) if zone["id"] == zone_id), None)
     
     if zone_index is None:
@@ -240,14 +257,15 @@ async def update_zone(zone_id: int, zone_data: ZoneUpdate):
     
     zone["updatedAt"] = datetime.utcnow().isoformat() + "Z"
     
-    save_zones(zones)
+    await run_in_threadpool(save_zones, zones)
     
     return zone
 
 @router.delete("/{zone_id}")
+@serialized("zones")
 async def delete_zone(zone_id: int):
     """Delete a zone"""
-    zones = load_zones()
+    zones = await run_in_threadpool(load_zones)
     zone = next((zone for zone in zones if zone["id"] == zone_id), None)
     
     if not zone:
@@ -255,6 +273,6 @@ async def delete_zone(zone_id: int):
     
     # Remove the zone
     zones = [z for z in zones if z["id"] != zone_id]
-    save_zones(zones)
+    await run_in_threadpool(save_zones, zones)
     
     return {"success": True, "message": f"Zone '{zone['name']}' deleted successfully"} 
\ No newline at end of file
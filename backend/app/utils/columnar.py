@@ -0,0 +1,149 @@
+"""
+Reader of the columnar on-disk format of CCTV analysis frames.
+
+Same format as agents/video_processor/heatmap/columnar.py, which writes it
+from the preprocessor and documents the layout; keep the two in step,
+utils/test_heatmap_formats.py reads the writer's output with both.
+
+A `{cctv_id}_analysis.columns` directory holds one .npy array per column
+(timestamps, people_count, density codes, flag bits and the heatmap points
+as offsets plus x/y/value arrays, and the same for each level of detail
+of utils/point_lod.py), the remaining fields of each frame in
+attributes.json and the field layout in meta.json. The `.columns` path is
+a symlink the writer atomically replaces to point at a new versioned
+directory.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from utils.point_lod import MERGED_VALUE
+
+FORMAT_VERSION = 1
+COLUMNS_SUFFIX = '.columns'
+META_FILE = 'meta.json'
+ATTRIBUTES_FILE = 'attributes.json'
+COORDINATE_DECIMALS = 6
+
+# Assembled frames kept per directory
+FRAME_CACHE_SIZE = 256
+
+def columns_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """Identity of the current version of a columnar directory, None if there is none"""
+    try:
+        stat = os.stat(os.path.join(path, META_FILE))
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+class ColumnarFrames(Mapping):
+    """
+    Read-only mapping of timestamp string to frame over a columnar directory.
+
+    Columns are memory-mapped, so loading costs a few small reads however
+    long the recording. Frames are assembled on access and only the most
+    recently used FRAME_CACHE_SIZE are kept, so reading every frame does not
+    rebuild the whole JSON-sized structure in memory.
+    """
+
+    def __init__(self, path: str):
+        # Resolved once so every file comes from the same version
+        self.path = os.path.realpath(path)
+        with open(os.path.join(path, META_FILE), 'r') as f:
+            self.meta: Dict[str, Any] = json.load(f)
+        if self.meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar format version {self.meta.get('format_version')} in {path}")
+        with open(os.path.join(path, ATTRIBUTES_FILE), 'r') as f:
+            self.attributes: List[dict] = json.load(f)
+
+        self.columns: List[str] = self.meta['columns']
+        self.timestamps = self._load('timestamps')
+        self.people_count = self._load('people_count') if 'people_count' in self.columns else None
+        self.density = self._load('density') if 'crowd_density' in self.columns else None
+        self.flags = self._load('flags') if self.meta['flag_fields'] else None
+        # Ragged (offsets, x, y, value) point arrays by level of detail, None for the full points
+        self.point_levels: Dict[Optional[int], Tuple[np.ndarray, ...]] = {}
+        if 'heatmap_points' in self.columns:
+            # Levels merged under another value rule are left out and rebuilt by the readers
+            stored = self.meta.get('lod_grids', []) if self.meta.get('lod_value') == MERGED_VALUE else []
+            levels = [(None, 'point')] + [(grid, f'lod{grid}') for grid in stored]
+            for grid, prefix in levels:
+                self.point_levels[grid] = tuple(self._load(f'{prefix}_{name}') for name in ('offsets', 'x', 'y', 'value'))
+
+        self._index = {str(int(timestamp)): i for i, timestamp in enumerate(self.timestamps)}
+        self._frames: "OrderedDict[int, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+
+    def __getitem__(self, key: str) -> dict:
+        index = self._index[key]
+        with self._lock:
+            frame = self._frames.get(index)
+            if frame is not None:
+                self._frames.move_to_end(index)
+                return frame
+        frame = self.frame(index)
+        with self._lock:
+            self._frames[index] = frame
+            while len(self._frames) > FRAME_CACHE_SIZE:
+                self._frames.popitem(last=False)
+        return frame
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def points(self, index: int, lod: Optional[int] = None) -> Optional[List[dict]]:
+        """
+        Heatmap points of the frame at an index, as the JSON dicts.
+
+        Args:
+            index (int): Frame index in timestamp order
+            lod (int): Grid size of a stored level of detail, None for the full points
+
+        Returns:
+            list: The points, None if the level is not stored
+        """
+        if lod not in self.point_levels:
+            return None
+        offsets, point_x, point_y, point_value = self.point_levels[lod]
+        start, end = int(offsets[index]), int(offsets[index + 1])
+        xs = point_x[start:end].tolist()
+        ys = point_y[start:end].tolist()
+        values = point_value[start:end].tolist()
+        return [{'x': round(x, COORDINATE_DECIMALS), 'y': round(y, COORDINATE_DECIMALS), 'value': value}
+                for x, y, value in zip(xs, ys, values)]
+
+    def frame(self, index: int) -> dict:
+        """Assemble the frame at an index, fields in their original order"""
+        values = dict(self.attributes[index])
+        if self.people_count is not None:
+            values['people_count'] = int(self.people_count[index])
+        if self.density is not None:
+            values['crowd_density'] = self.meta['density_levels'][self.density[index]]
+        if self.flags is not None:
+            bits = int(self.flags[index])
+            for bit, field in enumerate(self.meta['flag_fields']):
+                values[field] = bool(bits >> bit & 1)
+        if 'heatmap_points' in self.columns:
+            values['heatmap_points'] = self.points(index)
+
+        frame = {field: values.pop(field) for field in self.meta['field_order'] if field in values}
+        frame.update(values)
+        return frame
+
+def load_columns(path: str) -> ColumnarFrames:
+    """Open a columnar directory as a mapping of timestamp string to frame"""
+    return ColumnarFrames(path)
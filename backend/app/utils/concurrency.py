@@ -0,0 +1,36 @@
+import asyncio
+import functools
+from typing import Dict
+
+_locks: Dict[str, asyncio.Lock] = {}
+
+def resource_lock(resource: str) -> asyncio.Lock:
+    """
+    Get the lock serializing read-modify-write cycles on a resource.
+
+    Args:
+        resource (str): Resource name, e.g. "zones" or "incidents"
+
+    Returns:
+        asyncio.Lock: The lock shared by every endpoint writing the resource
+    """
+    lock = _locks.get(resource)
+    if lock is None:
+        lock = _locks[resource] = asyncio.Lock()
+    return lock
+
+def serialized(resource: str):
+    """
+    Run an endpoint while holding the resource's lock.
+
+    Endpoints that read a resource, modify it and save it back are wrapped so
+    concurrent requests in this worker cannot interleave and lose updates.
+    Read-only endpoints do not take the lock.
+    """
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            async with resource_lock(resource):
+                return await endpoint(*args, **kwargs)
+        return wrapper
+    return decorator
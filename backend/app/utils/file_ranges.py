@@ -0,0 +1,203 @@
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Mapping, NamedTuple, Optional, Tuple
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+class FileVersion(NamedTuple):
+    """A file's size and validators at the time it was stat'ed"""
+    path: str
+    size: int
+    etag: str
+    last_modified: str
+    mtime: int
+
+def file_version(path: str) -> FileVersion:
+    """
+    Stat a file and derive its validators.
+
+    The ETag is strong: it changes with the file's size, modification time
+    or inode, which is what a preprocessor replacing the file changes.
+    """
+    stat_result = os.stat(path)
+    etag = f'"{stat_result.st_ino:x}-{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+    return FileVersion(
+        path=path,
+        size=stat_result.st_size,
+        etag=etag,
+        last_modified=formatdate(stat_result.st_mtime, usegmt=True),
+        mtime=int(stat_result.st_mtime)
+    )
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single byte range such as "bytes=0-1023", "bytes=1024-" or "bytes=-500".
+
+    Args:
+        header (str): Range request header
+        size (int): File size in bytes
+
+    Returns:
+        tuple: Inclusive (start, end) offsets, None to serve the whole file
+            (malformed or multi-range requests, which the client then gets as a 200)
+
+    Raises:
+        ValueError: If the range lies outside the file (416)
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    first, sep, last = ranges.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        start = int(first) if first.strip() else None
+        end = int(last) if last.strip() else None
+    except ValueError:
+        return None
+
+    if start is None:
+        # Suffix range, the last `end` bytes
+        if end is None:
+            return None
+        if end <= 0 or size == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - end, 0), size - 1
+    if end is not None and start > end:
+        return None
+    if start >= size:
+        raise ValueError(f"Range starts past the end of the file ({size} bytes)")
+    return start, size - 1 if end is None else min(end, size - 1)
+
+def _matches_etag(header: str, etag: str) -> bool:
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+def _not_modified_since(header: str, mtime: int) -> bool:
+    try:
+        return mtime <= int(parsedate_to_datetime(header).timestamp())
+    except (TypeError, ValueError):
+        return False
+
+def is_not_modified(headers: Mapping[str, str], version: FileVersion) -> bool:
+    """Check a request's If-None-Match, or failing that If-Modified-Since, against a file"""
+    if "if-none-match" in headers:
+        return _matches_etag(headers["if-none-match"], version.etag)
+    if "if-modified-since" in headers:
+        return _not_modified_since(headers["if-modified-since"], version.mtime)
+    return False
+
+def range_applies(headers: Mapping[str, str], version: FileVersion) -> bool:
+    """Check If-Range, a Range is only honoured if the client's copy is still current"""
+    if_range = headers.get("if-range")
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        return if_range == version.etag
+    return if_range == version.last_modified
+
+class FileRangeResponse(Response):
+    """
+    Streams the bytes start..end (inclusive) of a file.
+
+    Uses the ASGI zero-copy send extension when the server offers it, so
+    the kernel copies the file to the socket; otherwise reads it in chunks.
+    uvicorn, which serves this app, does not offer the extension, so there
+    every response goes through chunked reads of chunk_size bytes. Zero-copy
+    needs an ASGI server that implements the extension, or a reverse proxy
+    serving the videos directory itself.
+    """
+    chunk_size = 256 * 1024
+
+    def __init__(
+        self,
+        path: str,
+        start: int,
+        end: int,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None
+    ):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers["content-length"] = str(max(end - start + 1, 0))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        remaining = self.end - self.start + 1
+        if scope["method"].upper() == "HEAD" or remaining <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file.fileno(),
+                    "offset": self.start,
+                    "count": remaining,
+                    "more_body": False
+                })
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # File shrank while streaming, end the response rather than hang
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+def serve_file(request: Request, version: FileVersion, media_type: str, cache_control: str = "no-cache") -> Response:
+    """
+    Serve a file honouring conditional and byte range requests.
+
+    Returns a 304 when the client's copy is current, a 206 for a satisfiable
+    single Range, a 416 for an unsatisfiable one and the whole file otherwise.
+
+    Args:
+        request (Request): The incoming request
+        version (FileVersion): The file to serve, from file_version()
+        media_type (str): Content type of the file
+        cache_control (str): Cache-Control header, no-cache makes clients revalidate with the validators
+
+    Returns:
+        Response: The response to send
+    """
+    headers = {
+        "accept-ranges": "bytes",
+        "etag": version.etag,
+        "last-modified": version.last_modified,
+        "cache-control": cache_control
+    }
+
+    if is_not_modified(request.headers, version):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if "range" in request.headers and range_applies(request.headers, version):
+        try:
+            byte_range = parse_range(request.headers["range"], version.size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{version.size}"})
+
+    if byte_range is None:
+        return FileRangeResponse(version.path, 0, version.size - 1, headers=headers, media_type=media_type)
+
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{version.size}"
+    return FileRangeResponse(version.path, start, end, status_code=206, headers=headers, media_type=media_type)
@@ -3,6 +3,7 @@ import shutil
 from pathlib import Path
 from fastapi import UploadFile
 import uuid
+from fastapi.concurrency import run_in_threadpool
 
 class FileUploadManager:
     def __init__(self):
@@ -33,15 +34,8 @@ class FileUploadManager:
             filename = f"{username}{file_extension}"
             file_path = self.base_path / filename
             
-            # Save the file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            # Try to optimize image if Pillow is available
-            try:
-                self._optimize_image(file_path)
-            except ImportError:
-                print("Pillow not available, skipping image optimization")
+            # Save and optimize the file off the event loop
+            await run_in_threadpool(self._write_photo, file, file_path)
             
             # Return relative path for storage in JSON
             return f"data/attendees/{filename}"
@@ -49,7 +43,20 @@ class FileUploadManager:
         except Exception as e:
             print(f"Error saving profile photo: {str(e)}")
             raise e
-    
+
+    def _write_photo(self, file: UploadFile, file_path: Path):
+        """
+        Write an uploaded photo to disk and optimize it, runs in the threadpool
+        """
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+
+        # Try to optimize image if Pillow is available
+        try:
+            self._optimize_image(file_path)
+        except ImportError:
+            print("Pillow not available, skipping image optimization")
+
     def _optimize_image(self, file_path: Path):
         """
         Optimize image for web use (optional - requires Pillow)
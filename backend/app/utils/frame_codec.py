@@ -0,0 +1,220 @@
+"""
+Compact binary encoding of CCTV analysis frames.
+
+Same format as agents/video_processor/heatmap/frame_codec.py, which the
+heatmap dashboards ship separately; keep the two in step,
+utils/test_heatmap_formats.py decodes each side's frames with the other.
+
+Frame layout, little-endian:
+
+    uint8   format version (1)
+    uint8   frame kind (0 = full frame)
+    uint8   camera id length, then the UTF-8 camera id (empty when untagged)
+    uint32  timestamp
+    uint32  people_count
+    uint16  flag bits, bit i set when FLAG_FIELDS[i] is true
+    uint8   crowd density, index into DENSITY_LEVELS (255 = missing or unknown)
+    uint16  number of heatmap points, then for each point
+            uint16 x, uint16 y (0..1 scaled to 0..65535), uint8 value
+    rest    MessagePack map of every other field of the frame
+"""
+import struct
+
+FORMAT_VERSION = 1
+FULL_FRAME = 0
+
+FLAG_FIELDS = ('violence_flag', 'fire_flag', 'smoke_flag', 'weapon_detected',
+               'suspicious_behavior', 'emergency_evacuation')
+DENSITY_LEVELS = ('low', 'medium', 'high', 'very_high')
+UNKNOWN_DENSITY = 255
+
+FIXED_FIELDS = frozenset(FLAG_FIELDS + ('timestamp', 'people_count', 'crowd_density', 'heatmap_points'))
+
+_HEADER = struct.Struct('<IIHBH')
+_POINT = struct.Struct('<HHB')
+COORDINATE_SCALE = 65535
+
+ENCODINGS = ('json', 'binary')
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def pack_msgpack(value, out):
+    """Append the MessagePack encoding of a JSON-like value to a bytearray"""
+    if value is None:
+        out.append(0xc0)
+    elif value is True:
+        out.append(0xc3)
+    elif value is False:
+        out.append(0xc2)
+    elif isinstance(value, int):
+        if 0 <= value < 0x80:
+            out.append(value)
+        elif -32 <= value < 0:
+            out += struct.pack('b', value)
+        elif -(1 << 63) <= value < (1 << 63):
+            out += b'\xd3' + struct.pack('>q', value)
+        else:
+            pack_msgpack(float(value), out)
+    elif isinstance(value, float):
+        out += b'\xcb' + struct.pack('>d', value)
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        if len(data) < 32:
+            out.append(0xa0 | len(data))
+        elif len(data) < 0x100:
+            out += b'\xd9' + struct.pack('>B', len(data))
+        elif len(data) < 0x10000:
+            out += b'\xda' + struct.pack('>H', len(data))
+        else:
+            out += b'\xdb' + struct.pack('>I', len(data))
+        out += data
+    elif isinstance(value, (list, tuple)):
+        if len(value) < 16:
+            out.append(0x90 | len(value))
+        elif len(value) < 0x10000:
+            out += b'\xdc' + struct.pack('>H', len(value))
+        else:
+            out += b'\xdd' + struct.pack('>I', len(value))
+        for item in value:
+            pack_msgpack(item, out)
+    elif isinstance(value, dict):
+        if len(value) < 16:
+            out.append(0x80 | len(value))
+        elif len(value) < 0x10000:
+            out += b'\xde' + struct.pack('>H', len(value))
+        else:
+            out += b'\xdf' + struct.pack('>I', len(value))
+        for key, item in value.items():
+            pack_msgpack(str(key), out)
+            pack_msgpack(item, out)
+    else:
+        pack_msgpack(str(value), out)
+    return out
+
+
+def unpack_msgpack(data, offset=0):
+    """Decode one MessagePack value written by pack_msgpack, returns (value, next offset)"""
+    code = data[offset]
+    offset += 1
+    if code < 0x80:
+        return code, offset
+    if code >= 0xe0:
+        return code - 0x100, offset
+    if 0xa0 <= code <= 0xbf or code in (0xd9, 0xda, 0xdb):
+        if code <= 0xbf:
+            length = code & 0x1f
+        else:
+            size = {0xd9: 1, 0xda: 2, 0xdb: 4}[code]
+            length = int.from_bytes(data[offset:offset + size], 'big')
+            offset += size
+        return bytes(data[offset:offset + length]).decode('utf-8'), offset + length
+    if 0x90 <= code <= 0x9f or code in (0xdc, 0xdd):
+        if code <= 0x9f:
+            length = code & 0x0f
+        else:
+            size = 2 if code == 0xdc else 4
+            length = int.from_bytes(data[offset:offset + size], 'big')
+            offset += size
+        items = []
+        for _ in range(length):
+            item, offset = unpack_msgpack(data, offset)
+            items.append(item)
+        return items, offset
+    if 0x80 <= code <= 0x8f or code in (0xde, 0xdf):
+        if code <= 0x8f:
+            length = code & 0x0f
+        else:
+            size = 2 if code == 0xde else 4
+            length = int.from_bytes(data[offset:offset + size], 'big')
+            offset += size
+        result = {}
+        for _ in range(length):
+            key, offset = unpack_msgpack(data, offset)
+            result[key], offset = unpack_msgpack(data, offset)
+        return result, offset
+    if code == 0xc0:
+        return None, offset
+    if code in (0xc2, 0xc3):
+        return code == 0xc3, offset
+    if code == 0xd3:
+        return struct.unpack_from('>q', data, offset)[0], offset + 8
+    if code == 0xcb:
+        return struct.unpack_from('>d', data, offset)[0], offset + 8
+    raise ValueError(f'Unsupported MessagePack type 0x{code:02x}')
+
+
+def encode_frame(frame, cctv_id=''):
+    """
+    Encode an analysis frame in the binary layout above.
+
+    Args:
+        frame (dict): Analysis frame, with the timestamp injected
+        cctv_id (str): Camera tag for multiplexed sockets, empty for single-camera streams
+
+    Returns:
+        bytes: The encoded frame
+    """
+    tag = cctv_id.encode('utf-8')
+    flags = 0
+    for bit, field in enumerate(FLAG_FIELDS):
+        if frame.get(field):
+            flags |= 1 << bit
+    density = frame.get('crowd_density')
+    density_code = DENSITY_LEVELS.index(density) if density in DENSITY_LEVELS else UNKNOWN_DENSITY
+    points = frame.get('heatmap_points') or []
+
+    out = bytearray((FORMAT_VERSION, FULL_FRAME, len(tag)))
+    out += tag
+    out += _HEADER.pack(
+        _clamp(int(frame.get('timestamp', 0)), 0, 0xffffffff),
+        _clamp(int(frame.get('people_count', 0)), 0, 0xffffffff),
+        flags,
+        density_code,
+        len(points)
+    )
+    for point in points:
+        out += _POINT.pack(
+            _clamp(round(point.get('x', 0) * COORDINATE_SCALE), 0, COORDINATE_SCALE),
+            _clamp(round(point.get('y', 0) * COORDINATE_SCALE), 0, COORDINATE_SCALE),
+            _clamp(round(point.get('value', 0)), 0, 255)
+        )
+    pack_msgpack({key: value for key, value in frame.items() if key not in FIXED_FIELDS}, out)
+    return bytes(out)
+
+
+def decode_frame(data):
+    """
+    Decode a frame written by encode_frame.
+
+    Returns:
+        tuple: (cctv_id, frame dict), coordinates come back quantized
+    """
+    version, kind, tag_length = data[0], data[1], data[2]
+    if version != FORMAT_VERSION or kind != FULL_FRAME:
+        raise ValueError(f'Unsupported frame version {version} kind {kind}')
+    offset = 3
+    cctv_id = bytes(data[offset:offset + tag_length]).decode('utf-8')
+    offset += tag_length
+    timestamp, people_count, flags, density_code, point_count = _HEADER.unpack_from(data, offset)
+    offset += _HEADER.size
+
+    points = []
+    for _ in range(point_count):
+        x, y, value = _POINT.unpack_from(data, offset)
+        offset += _POINT.size
+        points.append({'x': x / COORDINATE_SCALE, 'y': y / COORDINATE_SCALE, 'value': value})
+
+    frame, _ = unpack_msgpack(data, offset)
+    frame.update({
+        'timestamp': timestamp,
+        'people_count': people_count,
+        'heatmap_points': points,
+    })
+    for bit, field in enumerate(FLAG_FIELDS):
+        frame[field] = bool(flags & (1 << bit))
+    if density_code < len(DENSITY_LEVELS):
+        frame['crowd_density'] = DENSITY_LEVELS[density_code]
+    return cctv_id, frame
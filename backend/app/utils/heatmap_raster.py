@@ -0,0 +1,82 @@
+import io
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, List
+
+import numpy as np
+
+# Gaussian splat width as a fraction of the larger raster side
+SPLAT_SIGMA = 0.03
+
+# Point value mapped to full intensity, matches the max the dashboards give heatmap.js
+VALUE_SCALE = 100
+
+def render_raster(points: List[dict], width: int, height: int, sigma: float = SPLAT_SIGMA) -> np.ndarray:
+    """
+    Render heatmap points into a density raster by Gaussian splatting.
+
+    The Gaussian kernel is separable, so the raster is the product of one
+    (points x height) and one (points x width) kernel matrix instead of a
+    per-pixel loop.
+
+    Args:
+        points (list): Heatmap points with x, y in 0..1 and a value
+        width (int): Raster width in pixels
+        height (int): Raster height in pixels
+        sigma (float): Kernel width as a fraction of the larger raster side
+
+    Returns:
+        np.ndarray: uint8 raster of shape (height, width)
+    """
+    if not points:
+        return np.zeros((height, width), dtype=np.uint8)
+
+    xs = np.array([point.get('x', 0) for point in points], dtype=np.float32) * width
+    ys = np.array([point.get('y', 0) for point in points], dtype=np.float32) * height
+    values = np.array([point.get('value', 0) for point in points], dtype=np.float32)
+    sigma_pixels = max(sigma * max(width, height), 1.0)
+
+    columns = np.arange(width, dtype=np.float32) + 0.5
+    rows = np.arange(height, dtype=np.float32) + 0.5
+    kernel_x = np.exp(-((columns[None, :] - xs[:, None]) ** 2) / (2 * sigma_pixels ** 2))
+    kernel_y = np.exp(-((rows[None, :] - ys[:, None]) ** 2) / (2 * sigma_pixels ** 2))
+
+    density = (kernel_y * values[:, None]).T @ kernel_x
+    return (np.clip(density / VALUE_SCALE, 0.0, 1.0) * 255).astype(np.uint8)
+
+def encode_png(raster: np.ndarray) -> bytes:
+    """Encode a uint8 raster as a grayscale PNG"""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(raster).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+class RasterCache:
+    """Least recently used cache of rendered rasters"""
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key: Hashable, render: Callable[[], bytes]) -> bytes:
+        """
+        Get a cached raster, rendering and caching it on a miss.
+
+        Args:
+            key: Identifies the raster, e.g. (camera, data version, timestamp, size, format)
+            render (callable): Produces the raster bytes on a miss
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        data = render()
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return data
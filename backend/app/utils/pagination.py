@@ -0,0 +1,123 @@
+import base64
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Query
+
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Query parameters shared by the paginated list endpoints
+LimitQuery = Query(None, ge=1, le=1000, description="Maximum number of items to return")
+AfterQuery = Query(None, description="Cursor from the X-Next-Cursor header of the previous page")
+FieldsQuery = Query(None, description="Comma separated list of fields to return for each item")
+
+# Number of collections whose key -> position map is kept between pages
+POSITION_CACHE_SIZE = 32
+
+# id(list) -> (list, key -> position), least recently used first
+_position_maps: "OrderedDict[int, Tuple[List[Any], Dict[Any, int]]]" = OrderedDict()
+_position_lock = threading.Lock()
+
+def encode_cursor(position: int, key: Any) -> str:
+    """Encode the position and key of the last item of a page as an opaque cursor"""
+    raw = json.dumps({"i": position, "k": key}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[int, Any]:
+    """Decode a cursor from encode_cursor(), raising a 400 if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return int(data["i"]), data["k"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _hashable(key: Any) -> Any:
+    return tuple(_hashable(part) for part in key) if isinstance(key, list) else key
+
+def find_position(items: List[Any], wanted: Any, key: Callable[[Any], Any]) -> Optional[int]:
+    """
+    Find the position of the item with a key.
+
+    The key -> position map is built once per collection and kept while the
+    same list is paginated again, which is the case for the shared lists
+    the stores hand out until the next write.
+
+    Returns:
+        int: Position of the first item with the key, None if there is none
+    """
+    with _position_lock:
+        cached = _position_maps.get(id(items))
+        if cached is not None and cached[0] is items and len(cached[1]) <= len(items):
+            _position_maps.move_to_end(id(items))
+            positions = cached[1]
+        else:
+            positions = None
+    if positions is None:
+        positions = {}
+        for index, item in enumerate(items):
+            positions.setdefault(_hashable(key(item)), index)
+        with _position_lock:
+            _position_maps[id(items)] = (items, positions)
+            while len(_position_maps) > POSITION_CACHE_SIZE:
+                _position_maps.popitem(last=False)
+
+    position = positions.get(_hashable(wanted))
+    if position is not None and (position >= len(items) or key(items[position]) != wanted):
+        # The list was changed in place since the map was built
+        with _position_lock:
+            _position_maps.pop(id(items), None)
+        return find_position(items, wanted, key)
+    return position
+
+def paginate(
+    items: List[Any],
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
+    key: Callable[[Any], Any] = lambda item: item.get("id")
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Slice a page out of a collection in its stored order.
+
+    The cursor remembers the position and key of the last item returned.
+    If items were inserted or removed before that position since, the page
+    resumes after the item with that key, found with find_position(), or at
+    the same position if the item itself was removed.
+
+    Args:
+        items (list): The whole collection in stored order
+        limit (int): Maximum page size, None returns everything after the cursor
+        after (str): Cursor of the previous page
+        key (callable): Gets the unique key of an item
+
+    Returns:
+        tuple: (page, cursor of the next page or None on the last page)
+    """
+    start = 0
+    if after:
+        position, last_key = decode_cursor(after)
+        if 0 <= position < len(items) and key(items[position]) == last_key:
+            start = position + 1
+        else:
+            found = find_position(items, last_key, key)
+            start = found + 1 if found is not None else min(max(position, 0), len(items))
+
+    end = len(items) if limit is None else min(start + limit, len(items))
+    next_cursor = encode_cursor(end - 1, key(items[end - 1])) if end < len(items) else None
+    return items[start:end], next_cursor
+
+def project(items: List[dict], fields: Optional[str]) -> List[dict]:
+    """
+    Keep only the requested top-level fields of each item.
+
+    Args:
+        items (list): Items to project
+        fields (str): Comma separated field names, None keeps every field
+    """
+    if not fields:
+        return items
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    return [{name: item[name] for name in names if name in item} for item in items]
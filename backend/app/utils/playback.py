@@ -0,0 +1,93 @@
+import asyncio
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+class PlaybackHub:
+    """
+    Server-side playback clock shared by every subscriber of a camera.
+
+    The first subscriber of a camera starts one producer task that builds the
+    next frame on each tick and hands it to every subscriber's queue. The
+    producer stops when the last subscriber leaves, so frames are built once
+    per camera per tick however many clients are watching.
+    """
+
+    def __init__(self, load_frame: Callable[[str, int], Optional[Dict[str, Any]]], interval: float):
+        """
+        Args:
+            load_frame (callable): Builds the frame of a camera at a playback index, runs in the threadpool
+            interval (float): Seconds between frames
+        """
+        self.load_frame = load_frame
+        self.interval = interval
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._producers: Dict[str, asyncio.Task] = {}
+        self._latest: Dict[str, Dict[str, Any]] = {}
+
+    def subscribe(self, cctv_ids: Iterable[str]) -> asyncio.Queue:
+        """
+        Subscribe to one or more cameras.
+
+        Returns:
+            asyncio.Queue: Receives (cctv_id, frame) tuples, starting with each camera's current frame
+        """
+        cctv_ids = list(cctv_ids)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(len(cctv_ids), 1) * 2)
+        for cctv_id in cctv_ids:
+            self._subscribers.setdefault(cctv_id, set()).add(queue)
+            if cctv_id in self._latest:
+                self._offer(queue, (cctv_id, self._latest[cctv_id]))
+            if cctv_id not in self._producers:
+                self._producers[cctv_id] = asyncio.create_task(self._produce(cctv_id))
+        return queue
+
+    def unsubscribe(self, cctv_ids: Iterable[str], queue: asyncio.Queue):
+        """Remove a subscription, stopping producers nobody listens to anymore"""
+        for cctv_id in cctv_ids:
+            subscribers = self._subscribers.get(cctv_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[cctv_id]
+                self._latest.pop(cctv_id, None)
+                producer = self._producers.pop(cctv_id, None)
+                if producer is not None:
+                    producer.cancel()
+
+    async def close(self):
+        """Stop every producer"""
+        producers = list(self._producers.values())
+        self._producers.clear()
+        self._subscribers.clear()
+        self._latest.clear()
+        for producer in producers:
+            producer.cancel()
+        await asyncio.gather(*producers, return_exceptions=True)
+
+    def _offer(self, queue: asyncio.Queue, item: Tuple[str, Dict[str, Any]]):
+        # A slow subscriber drops its oldest pending frame instead of growing without bound
+        if queue.full():
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        queue.put_nowait(item)
+
+    async def _produce(self, cctv_id: str):
+        index = 0
+        while True:
+            try:
+                frame = await run_in_threadpool(self.load_frame, cctv_id, index)
+            except Exception as e:
+                print(f"Error building playback frame for {cctv_id}: {e}")
+                frame = None
+
+            if frame is not None:
+                self._latest[cctv_id] = frame
+                for queue in list(self._subscribers.get(cctv_id, ())):
+                    self._offer(queue, (cctv_id, frame))
+
+            index += 1
+            await asyncio.sleep(self.interval)
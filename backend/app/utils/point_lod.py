@@ -0,0 +1,71 @@
+"""
+Level-of-detail pyramids of heatmap points.
+
+Dense frames carry one heatmap point per person. Views showing many cameras
+at once render each one small, so besides the full points every frame gets
+coarser levels where the points falling in the same cell of an N x N grid
+over the frame are merged into one.
+
+Same levels as agents/video_processor/heatmap/point_lod.py, which the
+preprocessor stores in the columnar files; keep the two in step,
+utils/test_heatmap_formats.py compares them.
+"""
+from typing import List, Optional
+
+from fastapi import HTTPException, Query
+
+# Grid sizes of the aggregated levels, finest first. Full points are level None
+LOD_GRIDS = (32, 8)
+
+# How a merged point's value is derived from its points. Columnar files record
+# it, and levels they stored under another rule are rebuilt instead of read
+MERGED_VALUE = 'max'
+
+COORDINATE_DECIMALS = 4
+
+# Query parameter of the endpoints serving heatmap points
+LodQuery = Query(None, description="Merge heatmap points on an NxN grid, 32 or 8; full points if omitted")
+
+def check_lod(lod: Optional[int]) -> Optional[int]:
+    """Validate a requested level of detail, raising a 400 if it is not one of LOD_GRIDS"""
+    if lod is not None and lod not in LOD_GRIDS:
+        raise HTTPException(status_code=400, detail=f"lod must be one of {', '.join(str(grid) for grid in LOD_GRIDS)}")
+    return lod
+
+def aggregate_points(points: List[dict], grid: int) -> List[dict]:
+    """
+    Merge the heatmap points falling in the same cell of a grid x grid partition.
+
+    Each occupied cell becomes one point at the value-weighted centroid of its
+    points, carrying the largest of their values. Intensity stays on the scale
+    of the full points, so the dashboards' fixed heatmap maximum still shows
+    dense cells as hot rather than saturating every cell.
+
+    Args:
+        points (list): Heatmap points with x, y in 0..1 and a value
+        grid (int): Cells per side
+
+    Returns:
+        list: One point per occupied cell, in row-major cell order
+    """
+    cells = {}
+    for point in points:
+        x, y, value = point.get('x', 0), point.get('y', 0), point.get('value', 0)
+        cell = (min(max(int(y * grid), 0), grid - 1), min(max(int(x * grid), 0), grid - 1))
+        sum_x, sum_y, sum_value, weighted_x, weighted_y, count, max_value = cells.get(cell, (0, 0, 0, 0, 0, 0, 0))
+        cells[cell] = (sum_x + x, sum_y + y, sum_value + value,
+                       weighted_x + x * value, weighted_y + y * value, count + 1, max(max_value, value))
+
+    merged = []
+    for cell in sorted(cells):
+        sum_x, sum_y, sum_value, weighted_x, weighted_y, count, max_value = cells[cell]
+        if sum_value > 0:
+            x, y = weighted_x / sum_value, weighted_y / sum_value
+        else:
+            x, y = sum_x / count, sum_y / count
+        merged.append({
+            'x': round(x, COORDINATE_DECIMALS),
+            'y': round(y, COORDINATE_DECIMALS),
+            'value': max_value
+        })
+    return merged
@@ -0,0 +1,50 @@
+import pytest
+
+from utils.file_ranges import parse_range
+
+SIZE = 1000
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=999-999", (999, 999)),
+    # An end past the file is cut to the last byte
+    ("bytes=900-5000", (900, 999)),
+    ("BYTES = 10-20", (10, 20)),
+])
+def test_ranges(header, expected):
+    assert parse_range(header, SIZE) == expected
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=-100", (900, 999)),
+    ("bytes=-1", (999, 999)),
+    # A suffix longer than the file is the whole file
+    ("bytes=-5000", (0, 999)),
+])
+def test_suffix_ranges(header, expected):
+    assert parse_range(header, SIZE) == expected
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1000-", SIZE),
+    ("bytes=1000-1999", SIZE),
+    ("bytes=-0", SIZE),
+    ("bytes=0-", 0),
+    ("bytes=-10", 0),
+])
+def test_unsatisfiable_ranges(header, size):
+    with pytest.raises(ValueError):
+        parse_range(header, size)
+
+@pytest.mark.parametrize("header", [
+    # Multiple ranges are answered with the whole file
+    "bytes=0-9,20-29",
+    "bytes=-10, 0-1",
+    "items=0-9",
+    "bytes=",
+    "bytes=-",
+    "bytes=5",
+    "bytes=a-b",
+    "bytes=20-10",
+])
+def test_whole_file(header):
+    assert parse_range(header, SIZE) is None
@@ -0,0 +1,89 @@
+"""
+The heatmap formats are implemented twice, here and in the separately
+shipped agents/video_processor/heatmap dashboards. These tests pass each
+side's output through the other side so the copies cannot drift apart.
+"""
+import os
+import sys
+
+import pytest
+
+from utils import columnar, frame_codec, point_lod
+
+HEATMAP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..',
+                                           'agents', 'video_processor', 'heatmap'))
+sys.path.insert(0, HEATMAP_DIR)
+import columnar as agent_columnar  # noqa: E402
+import frame_codec as agent_codec  # noqa: E402
+import point_lod as agent_lod  # noqa: E402
+
+
+def make_frame(timestamp, points=3, **fields):
+    frame = {
+        'timestamp': timestamp,
+        'people_count': 10 + timestamp,
+        'crowd_density': 'high',
+        'violence_flag': timestamp % 2 == 0,
+        'fire_flag': False,
+        'heatmap_points': [{'x': (i + 1) / 7, 'y': (timestamp % 5 + i) / 9, 'value': (40 + 10 * i) % 256}
+                           for i in range(points)],
+        'demographics': {'adults': 7, 'children': [1, 2]},
+        'sentiment': 'calm',
+    }
+    frame.update(fields)
+    return frame
+
+
+FRAMES = [
+    make_frame(1),
+    make_frame(2, points=0, crowd_density='unknown'),
+    make_frame(3, points=40, note=None, ratio=0.25, big=2 ** 40),
+]
+
+
+@pytest.mark.parametrize('frame', FRAMES)
+@pytest.mark.parametrize('cctv_id', ['', 'cctv_1'])
+def test_frame_encoding_is_identical(frame, cctv_id):
+    assert frame_codec.encode_frame(frame, cctv_id) == agent_codec.encode_frame(frame, cctv_id)
+
+
+@pytest.mark.parametrize('frame', FRAMES)
+def test_frames_decode_on_the_other_side(frame):
+    backend_bytes = frame_codec.encode_frame(frame, 'cctv_2')
+    agent_bytes = agent_codec.encode_frame(frame, 'cctv_2')
+    assert agent_codec.decode_frame(backend_bytes) == frame_codec.decode_frame(backend_bytes)
+    assert frame_codec.decode_frame(agent_bytes) == agent_codec.decode_frame(agent_bytes)
+
+
+def test_shared_constants_match():
+    for name in ('FORMAT_VERSION', 'FULL_FRAME', 'FLAG_FIELDS', 'DENSITY_LEVELS', 'UNKNOWN_DENSITY',
+                 'COORDINATE_SCALE', 'ENCODINGS'):
+        assert getattr(frame_codec, name) == getattr(agent_codec, name), name
+    for name in ('FORMAT_VERSION', 'COLUMNS_SUFFIX', 'META_FILE', 'ATTRIBUTES_FILE',
+                 'COORDINATE_DECIMALS', 'FRAME_CACHE_SIZE'):
+        assert getattr(columnar, name) == getattr(agent_columnar, name), name
+    for name in ('LOD_GRIDS', 'MERGED_VALUE', 'COORDINATE_DECIMALS'):
+        assert getattr(point_lod, name) == getattr(agent_lod, name), name
+
+
+@pytest.mark.parametrize('grid', point_lod.LOD_GRIDS)
+def test_level_of_detail_matches(grid):
+    for frame in FRAMES:
+        points = frame['heatmap_points']
+        assert point_lod.aggregate_points(points, grid) == agent_lod.aggregate_points(points, grid)
+
+
+def test_backend_reads_what_the_preprocessor_writes(tmp_path):
+    path = str(tmp_path / f'cctv_1_analysis{columnar.COLUMNS_SUFFIX}')
+    frames = {str(frame['timestamp']): frame for frame in FRAMES}
+    assert agent_columnar.write_columns(frames, path) == []
+
+    written = agent_columnar.load_columns(path)
+    read = columnar.load_columns(path)
+    assert list(read) == list(written) == list(frames)
+    for index, key in enumerate(read):
+        assert read[key] == written[key]
+        assert list(read[key]) == list(written[key])
+        for grid in point_lod.LOD_GRIDS:
+            assert read.points(index, grid) == written.points(index, grid)
+            assert read.points(index, grid) is not None